@@ -0,0 +1,4 @@
+"""
+performance measurements of structed on synthetic corpora of the example specifications,
+run with python -m benchmarks.bench from the root of the repository
+"""
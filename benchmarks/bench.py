@@ -0,0 +1,184 @@
+"""
+throughput, latency and memory of load(), parse() and dict(field) on the corpora,
+results are written as JSON to compare runs across commits:
+
+    python -m benchmarks.bench --frames 1000000 --out before.json
+    python -m benchmarks.bench --frames 1000000 --out after.json
+    python -m benchmarks.bench --compare before.json after.json
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Sequence
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from structed import decode, load, parse, compile, compile_frame, compile_generated
+from benchmarks import corpora
+
+# plans built from a loaded specification, parse() takes any of them
+ENGINES: dict[str, Callable[[Any], Any]] = {
+    "interpreter": lambda spec: spec,
+    "compile": compile,
+    "frame": compile_frame,
+    "codegen": compile_generated,
+}
+# frames kept while measuring peak memory
+MEMORY_SAMPLE = 2000
+
+
+def percentile(ordered: Sequence[int], q: float) -> int:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(func: Callable[[Any], Any], inputs: Sequence, sizes: Sequence[int]) -> dict:
+    """run func on each input, timing every call"""
+    latencies = [0] * len(inputs)
+    clock = time.perf_counter_ns
+    begin = clock()
+    for i, x in enumerate(inputs):
+        t = clock()
+        func(x)
+        latencies[i] = clock() - t
+    elapsed = (clock() - begin) / 1e9
+    latencies.sort()
+    # peak of keeping every result of a sample, like list(parse_many(...)) does
+    sample = inputs[:MEMORY_SAMPLE]
+    tracemalloc.start()
+    kept = [func(x) for x in sample]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return {
+        "count": len(inputs),
+        "seconds": elapsed,
+        "frames_per_s": len(inputs) / elapsed,
+        "mb_per_s": sum(sizes) / elapsed / 1e6,
+        "p50_us": percentile(latencies, 0.5) / 1e3,
+        "p99_us": percentile(latencies, 0.99) / 1e3,
+        "peak_bytes": peak,
+        "peak_bytes_per_frame": peak / len(sample),
+    }
+
+
+def bench_load(path: str, repeat: int) -> dict:
+    with open(path) as fp:
+        text = fp.read()
+    return measure(lambda t: load(decode(t)), [text] * repeat, [len(text)] * repeat)
+
+
+def bench_corpus(name: str, frames: int, seed: int, engines: Sequence[str]) -> list[dict]:
+    path = corpora.CORPORA[name][0]
+    with open(path) as fp:
+        spec = load(decode(fp.read()))
+    raws = list(corpora.generate(name, frames, seed))
+    sizes = [len(x) for x in raws]
+    results = []
+    for engine in engines:
+        plan = ENGINES[engine](spec)
+        stages = {
+            "parse": lambda raw: parse(plan, raw),
+            "parse+dict": lambda raw: dict(parse(plan, raw)),
+        }
+        for stage, func in stages.items():
+            results.append({"corpus": name, "engine": engine, "stage": stage, **measure(func, raws, sizes)})
+    return results
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=corpora.EXAMPLES
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+        frames: int,
+        seed: int = 0,
+        names: Optional[Sequence[str]] = None,
+        engines: Optional[Sequence[str]] = None,
+        load_repeat: int = 1000
+) -> dict:
+    """every measurement of a run, with what is needed to compare it to others"""
+    corpora.register_dcch_handlers()
+    names = list(corpora.CORPORA) if names is None else names
+    engines = list(ENGINES) if engines is None else engines
+    results = []
+    for path in sorted({corpora.CORPORA[x][0] for x in names}):
+        name = os.path.basename(path)
+        results.append({"corpus": name, "engine": "-", "stage": "load", **bench_load(path, load_repeat)})
+    for name in names:
+        results.extend(bench_corpus(name, frames, seed, engines))
+    return {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "frames": frames,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def key(result: dict) -> tuple[str, str, str]:
+    return result["corpus"], result["engine"], result["stage"]
+
+
+def compare(before: dict, after: dict) -> list[str]:
+    """frames/s and p99 of after relative to before, for the measurements in both"""
+    old = {key(x): x for x in before["results"]}
+    lines = [f"{'corpus':<22}{'engine':<13}{'stage':<12}{'frames/s':>12}{'ratio':>8}{'p99 us':>10}{'ratio':>8}"]
+    for x in after["results"]:
+        if key(x) not in old:
+            continue
+        y = old[key(x)]
+        lines.append(
+            f"{x['corpus']:<22}{x['engine']:<13}{x['stage']:<12}"
+            f"{x['frames_per_s']:>12.0f}{x['frames_per_s'] / y['frames_per_s']:>8.2f}"
+            f"{x['p99_us']:>10.1f}{x['p99_us'] / y['p99_us']:>8.2f}"
+        )
+    return lines
+
+
+def report(run_: dict) -> list[str]:
+    lines = [f"{'corpus':<22}{'engine':<13}{'stage':<12}{'frames/s':>12}{'MB/s':>8}"
+             f"{'p50 us':>9}{'p99 us':>9}{'peak/frame':>12}"]
+    for x in run_["results"]:
+        lines.append(
+            f"{x['corpus']:<22}{x['engine']:<13}{x['stage']:<12}{x['frames_per_s']:>12.0f}{x['mb_per_s']:>8.1f}"
+            f"{x['p50_us']:>9.1f}{x['p99_us']:>9.1f}{x['peak_bytes_per_frame']:>12.0f}"
+        )
+    return lines
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=20000, help="frames of a corpus of share 1, e.g. 1000000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--corpus", action="append", choices=list(corpora.CORPORA), help="all by default")
+    parser.add_argument("--engine", action="append", choices=list(ENGINES), help="all by default")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as a, open(args.compare[1]) as b:
+            print("\n".join(compare(json.load(a), json.load(b))))
+        return
+    result = run(args.frames, args.seed, args.corpus, args.engine)
+    print("\n".join(report(result)))
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump(result, fp, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
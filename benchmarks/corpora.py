@@ -0,0 +1,64 @@
+"""
+synthetic frames of the example specifications, the same for the same seed
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from collections.abc import Iterator, Callable
+import importlib.util
+import os
+import random
+
+from structed import add_external_handlers_from
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+UDP_JSON = os.path.join(EXAMPLES, "udp", "udp.json")
+DCCH_JSON = os.path.join(EXAMPLES, "q_gdw_12021_2019_mac", "dcch.json")
+DCCH_HANDLERS = os.path.join(EXAMPLES, "q_gdw_12021_2019_mac", "external_handler.py")
+
+# bytes of an element of @schedule_content by the schedule type in bits 7-5
+SCHEDULE_LENGTHS = {0b000: 4, 0b001: 6, 0b010: 8}
+
+
+def register_dcch_handlers():
+    """the handlers dcch.json refers to"""
+    spec = importlib.util.spec_from_file_location("external_handler", DCCH_HANDLERS)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    add_external_handlers_from(module)
+
+
+def udp(rng: random.Random, payload: tuple[int, int]) -> bytes:
+    """a datagram with a payload of a length in the given range"""
+    data = rng.randbytes(rng.randint(*payload))
+    return rng.randbytes(4) + len(data).to_bytes(2, "big") + rng.randbytes(2) + data
+
+
+def dcch(rng: random.Random, schedules: tuple[int, int]) -> bytes:
+    """a DCCH frame with a number of schedules in the given range, which fit in the one-byte payload length"""
+    payload = bytearray(rng.randbytes(2))
+    for _ in range(rng.randint(*schedules)):
+        kind = rng.choice(list(SCHEDULE_LENGTHS))
+        room = (253 - len(payload)) // SCHEDULE_LENGTHS[kind]
+        if room <= 0:
+            break
+        count = rng.randint(0, min(31, room))
+        payload.append(kind << 5 | count)
+        payload += rng.randbytes(count * SCHEDULE_LENGTHS[kind])
+    return bytes([0x12, len(payload)]) + payload + rng.randbytes(2)
+
+
+# name: (specification, generator of a frame, share of --frames)
+CORPORA: dict[str, tuple[str, Callable[[random.Random], bytes], float]] = {
+    "udp_short": (UDP_JSON, lambda rng: udp(rng, (0, 64)), 1.0),
+    "udp_jumbo": (UDP_JSON, lambda rng: udp(rng, (8000, 9000)), 0.02),
+    "dcch": (DCCH_JSON, lambda rng: dcch(rng, (1, 3)), 1.0),
+    "dcch_long_schedules": (DCCH_JSON, lambda rng: dcch(rng, (20, 40)), 0.2),
+}
+
+
+def generate(name: str, frames: int, seed: int = 0) -> Iterator[bytes]:
+    """frames of a corpus, their count scaled by its share"""
+    _, make, share = CORPORA[name]
+    rng = random.Random(f"{name}:{seed}")
+    for _ in range(max(1, int(frames * share))):
+        yield make(rng)
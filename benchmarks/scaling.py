@@ -0,0 +1,175 @@
+"""
+growth of the cost of load() and parse() with the size of the frame and of the specification,
+fitted as a power of the size and checked against the declared complexity:
+
+    python -m benchmarks.scaling --out scaling.json
+
+exits with 1 if any growth exceeds its bound, e.g. an O(n) operation became O(n^2)
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Sequence
+import argparse
+import gc
+import json
+import math
+import sys
+import time
+import tracemalloc
+
+from structed import decode, load, parse
+from benchmarks.bench import ENGINES
+
+LEAF = {"_length": 1, "_handler": "#bytes2int_b"}
+# exceeding a bound by less is taken as noise
+TOLERANCE = 0.35
+# seconds of a timing, short ones are noisy
+MIN_TIMING = 0.02
+
+
+def payload(n: int) -> tuple[dict, bytes]:
+    """a leaf of n bytes"""
+    spec = {"length": {"_length": 4, "_handler": "#bytes2int_b"}, "data": {"_length": ["#", "length"],
+                                                                        "_handler": "#bytes2hex"}}
+    return spec, n.to_bytes(4, "big") + bytes(n)
+
+
+def elements(n: int) -> tuple[dict, bytes]:
+    """n elements of 2 leaves"""
+    return {"@items": {"_size": "greedy", "a": LEAF, "b": LEAF}}, bytes(2 * n)
+
+
+def fixed_elements(n: int) -> tuple[dict, bytes]:
+    """n elements of a leaf of fixed length, counted by a field"""
+    spec = {"count": {"_length": 4, "_handler": "#bytes2int_b"}, "@items": {"_size": ["#", "count"], **LEAF}}
+    return spec, n.to_bytes(4, "big") + bytes(n)
+
+
+def width(n: int) -> tuple[dict, bytes]:
+    """n children, each of a leaf and a field of variable length depending on it"""
+    spec = {
+        f"f{i}": {"n": LEAF, "v": {"_length": ["#", "n"], "_handler": "#bytes2hex"}} for i in range(n)
+    }
+    return spec, b"\x01\x00" * n
+
+
+def depth(n: int) -> tuple[dict, bytes]:
+    """n nested fields, the innermost depends on a leaf at the top"""
+    node = {"v": {"_length": ["#", "n"], "_handler": "#bytes2hex"}}
+    for i in range(n):
+        node = {f"l{i}": node}
+    return {"n": LEAF, **node}, b"\x01\x00"
+
+
+# name: (make a specification and a frame of size n, sizes, bound of the exponent of time and memory)
+SWEEPS: dict[str, tuple[Callable[[int], tuple[dict, bytes]], tuple[int, ...], float]] = {
+    "payload": (payload, (1 << 14, 1 << 16, 1 << 18, 1 << 20), 1.0),
+    "elements": (elements, (2000, 4000, 8000, 16000), 1.0),
+    "fixed_elements": (fixed_elements, (2000, 8000, 32000, 128000), 1.0),
+    "width": (width, (100, 200, 400, 800), 1.0),
+    "depth": (depth, (50, 100, 200, 400), 1.0),
+}
+
+
+def exponent(sizes: Sequence[int], values: Sequence[float]) -> float:
+    """least squares slope of log(value) over log(size)"""
+    xs = [math.log(x) for x in sizes]
+    ys = [math.log(max(y, 1e-12)) for y in values]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum((x - mx) ** 2 for x in xs)
+
+
+def cost(func: Callable[[], Any], repeat: int) -> tuple[float, int]:
+    """best seconds of a call over a few timings, and peak bytes allocated by one call keeping its result"""
+    # like timeit, collections of the cyclic garbage collector would land in random timings
+    gc.disable()
+    try:
+        number = 1
+        while True:
+            elapsed = timing(func, number)
+            if elapsed >= MIN_TIMING:
+                break
+            number *= 2
+        best = min([elapsed, *(timing(func, number) for _ in range(repeat - 1))]) / number
+    finally:
+        gc.enable()
+    tracemalloc.start()
+    kept = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return best, peak
+
+
+def timing(func: Callable[[], Any], number: int) -> float:
+    t = time.perf_counter()
+    for _ in range(number):
+        func()
+    return time.perf_counter() - t
+
+
+def sweep(name: str, engines: Sequence[str], repeat: int, scale: float) -> list[dict]:
+    make, sizes, bound = SWEEPS[name]
+    sizes = [max(1, int(x * scale)) for x in sizes]
+    # (operation, size) -> (seconds, bytes)
+    costs: dict[tuple[str, int], tuple[float, int]] = {}
+    for n in sizes:
+        spec_dict, raw = make(n)
+        text = json.dumps(spec_dict)
+        costs["load", n] = cost(lambda: load(decode(text)), repeat)
+        spec = load(decode(text))
+        for engine in engines:
+            plan = ENGINES[engine](spec)
+            costs[f"parse/{engine}", n] = cost(lambda: parse(plan, raw), repeat)
+    results = []
+    for operation in ["load", *(f"parse/{x}" for x in engines)]:
+        for i, metric in enumerate(("seconds", "bytes")):
+            values = [costs[operation, n][i] for n in sizes]
+            e = exponent(sizes, values)
+            results.append({
+                "sweep": name, "operation": operation, "metric": metric,
+                "sizes": sizes, "values": values,
+                "exponent": e, "bound": bound, "ok": e <= bound + TOLERANCE,
+            })
+    return results
+
+
+def run(
+        names: Optional[Sequence[str]] = None,
+        engines: Optional[Sequence[str]] = None,
+        repeat: int = 3,
+        scale: float = 1.0
+) -> list[dict]:
+    names = list(SWEEPS) if names is None else names
+    engines = list(ENGINES) if engines is None else engines
+    limit = sys.getrecursionlimit()
+    # nested fields are parsed recursively
+    sys.setrecursionlimit(max(limit, int(20 * max(SWEEPS["depth"][1]) * max(1.0, scale))))
+    try:
+        return [x for name in names for x in sweep(name, engines, repeat, scale)]
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sweep", action="append", choices=list(SWEEPS), help="all by default")
+    parser.add_argument("--engine", action="append", choices=list(ENGINES), help="all by default")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each measurement, the best is kept")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor of the sizes")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.sweep, args.engine, args.repeat, args.scale)
+    for x in results:
+        print(f"{x['sweep']:<16}{x['operation']:<20}{x['metric']:<9}"
+              f"n^{x['exponent']:.2f} (bound n^{x['bound']:.0f}){'' if x['ok'] else '  EXCEEDED'}")
+    if args.out:
+        with open(args.out, "w") as fp:
+            json.dump(results, fp, indent=2)
+    return 0 if all(x["ok"] for x in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
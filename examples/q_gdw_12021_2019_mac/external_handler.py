@@ -1,6 +1,6 @@
 from typing import Any
 
-from structed.handler import bytes2int_b, bytes2hex
+from structed.handler import bytes2int_b, bytes2hex, pure
 from structed.field import LenPolicy
 
 
@@ -10,6 +10,7 @@ REG_ACK = "Registration Success Respond"
 UL_ACK = "Uplink Receive Respond"
 
 
+@pure
 def h_mac_type(x: bytes) -> dict:
     raw = bytes2int_b(x)
     b7_b4 = (raw & 0b11110000) >> 4
@@ -29,6 +30,7 @@ def h_mac_type(x: bytes) -> dict:
     }
 
 
+@pure
 def h_schedule_type(x: bytes) -> dict:
     raw = bytes2int_b(x)
     schedule_type = {
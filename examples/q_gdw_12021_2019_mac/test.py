@@ -1,5 +1,5 @@
 from pprint import pprint
-from structed import decode, parse, load, add_external_handlers_from
+from structed import decode, load, parse_many, BatchStats, add_external_handlers_from
 from structed.handler import hex2bytes
 
 import external_handler as ext
@@ -18,9 +18,8 @@ for key in keys:
     with open(f"raw_{key}.txt", "r") as fp:
         raw_bytes = [hex2bytes(x.strip()) for x in fp]
         spec = load(ipd)
-        for i, raw in enumerate(raw_bytes):
-            # message = load(spec)
-            # message.parse(raw)
-            message = parse(spec, raw)
+        stats = BatchStats()
+        for i, (raw, message) in enumerate(zip(raw_bytes, parse_many(spec, raw_bytes, stats))):
             print(f"Message {i}: {raw}")
             pprint(dict(message), sort_dicts=False)
+        print(stats)
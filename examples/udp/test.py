@@ -1,5 +1,5 @@
 from pprint import pprint
-from structed import decode, parse, load
+from structed import decode, load, parse_many, BatchStats
 from structed.handler import hex2bytes
 
 
@@ -10,9 +10,8 @@ with open("udp.json", "r") as fp:
 with open("raw_bytes.txt", "r") as fp:
     raw_bytes = [hex2bytes(x.strip()) for x in fp]
     spec = load(ipd)
-    for i, raw in enumerate(raw_bytes):
-        # message = load(spec)
-        # message.parse(raw)
-        message = parse(spec, raw)
+    stats = BatchStats()
+    for i, (raw, message) in enumerate(zip(raw_bytes, parse_many(spec, raw_bytes, stats))):
         print(f"Message {i}: {raw}")
         pprint(dict(message), sort_dicts=False)
+    print(stats)
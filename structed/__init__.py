@@ -1,2 +1,14 @@
 from .field import load, parse
 from .json_codec import decode, add_external_handler, add_external_handlers_from
+from .compiler import compile, Plan
+from .batch import parse_many, BatchStats
+from .stream import StreamParser, parse_stream
+from .frame import compile_frame, Frame, FieldView
+from .codegen import compile_generated
+from .filter import Filter
+from .checksum import verify, verify_many
+from .encoder import encode, encode_into, encode_many, Encoder
+from .profile import Profile
+from .quarantine import Quarantine, Status
+from .resync import Scanner
+from .parallel import parse_parallel
@@ -0,0 +1,126 @@
+"""
+asyncio adapters parsing datagrams and streams as they arrive
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Any
+from collections.abc import AsyncIterator
+from concurrent.futures import Executor, ProcessPoolExecutor
+import asyncio
+
+from structed.field import Field, Specification
+from structed.compiler import Plan, compile
+from structed.batch import BatchStats
+from structed.stream import StreamParser
+
+
+def threads(executor: Optional[Executor]):
+    """the plan and the state of a StreamParser cannot be sent to another process"""
+    if isinstance(executor, ProcessPoolExecutor):
+        raise ValueError("A process pool cannot parse for asyncio, use a thread pool or structed.parse_parallel().")
+
+
+class DatagramParser(asyncio.DatagramProtocol):
+    """
+    parse each datagram on arrival and put (field, addr) into a bounded queue,
+    iterate it with `async for field, addr in protocol`.
+    Datagrams arriving while the queue is full are dropped and counted.
+    """
+    def __init__(
+            self,
+            scaffold: Specification | Plan,
+            maxsize: int = 1024,
+            offload_size: Optional[int] = None,
+            executor: Optional[Executor] = None,
+            stats: Optional[BatchStats] = None
+    ):
+        """
+        :param scaffold: loaded specification or compiled plan
+        :param maxsize: most parsed datagrams waiting to be consumed
+        :param offload_size: datagrams larger than this are parsed in the executor,
+            so the event loop never stalls on a huge one; their results may come out of order
+        :param executor: a thread pool, None for the default executor of the loop
+        :param stats: counters to update
+        """
+        threads(executor)
+        self.plan = scaffold if isinstance(scaffold, Plan) else compile(scaffold)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.offload_size = offload_size
+        self.executor = executor
+        self.stats = stats if stats is not None else BatchStats()
+        self.dropped = 0
+        self.closed = asyncio.Event()
+
+    def parse(self, data: bytes) -> Field:
+        return self.plan.op(data, 0, len(data), None, self.plan.spec.name)
+
+    def datagram_received(self, data: bytes, addr: Any):
+        self.stats.frames += 1
+        self.stats.bytes += len(data)
+        if self.offload_size is not None and len(data) > self.offload_size:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self.parse, data)
+            future.add_done_callback(lambda f: self.publish(f, addr))
+            return
+        try:
+            field = self.parse(data)
+        except Exception:
+            self.stats.failures += 1
+            return
+        self.put(field, addr)
+
+    def publish(self, future: asyncio.Future, addr: Any):
+        if future.exception() is not None:
+            self.stats.failures += 1
+            return
+        self.put(future.result(), addr)
+
+    def put(self, field: Field, addr: Any):
+        try:
+            self.queue.put_nowait((field, addr))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self.closed.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> tuple[Field, Any]:
+        while self.queue.empty():
+            if self.closed.is_set():
+                raise StopAsyncIteration
+            get = asyncio.ensure_future(self.queue.get())
+            closed = asyncio.ensure_future(self.closed.wait())
+            done, _ = await asyncio.wait((get, closed), return_when=asyncio.FIRST_COMPLETED)
+            if get in done:
+                closed.cancel()
+                return get.result()
+            get.cancel()
+        return self.queue.get_nowait()
+
+
+async def read_frames(
+        reader: asyncio.StreamReader,
+        scaffold: Specification | Plan,
+        chunk_size: int = 1 << 16,
+        max_frame: int = 1 << 16,
+        offload_size: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        stats: Optional[BatchStats] = None
+) -> AsyncIterator[Field]:
+    """
+    parse the frames of a stream as they arrive, nothing is read until the consumer asks for more
+    :param offload_size: chunks larger than this are parsed in the executor
+    :param executor: a thread pool, None for the default executor of the loop
+    """
+    threads(executor)
+    parser = StreamParser(scaffold, max_frame, stats)
+    loop = asyncio.get_running_loop()
+    while chunk := await reader.read(chunk_size):
+        if offload_size is not None and len(chunk) > offload_size:
+            fields = await loop.run_in_executor(executor, parser.feed, chunk)
+        else:
+            fields = parser.feed(chunk)
+        for field in fields:
+            yield field
@@ -0,0 +1,96 @@
+"""
+parse many frames with the same specification
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Sequence, Iterable, Iterator
+
+from structed.field import Field, Specification
+from structed.compiler import Plan, compile
+from structed.filter import Filter, Rejected
+from structed.profile import Profile
+from structed.quarantine import Status, diagnose
+
+
+class BatchStats:
+    """counters of a batch, updated while the results are consumed"""
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.failures = 0
+        self.corrupted = 0
+        # bytes dropped between frames to resynchronize, see structed.resync
+        self.skipped = 0
+
+    def __repr__(self):
+        return f"BatchStats(frames={self.frames}, bytes={self.bytes}, " \
+               f"failures={self.failures}, corrupted={self.corrupted}, skipped={self.skipped})"
+
+
+def parse_many(
+        scaffold: Specification | Plan,
+        frames: Iterable[Sequence],
+        stats: Optional[BatchStats] = None,
+        skip_errors: bool = False,
+        where: Optional[Filter] = None,
+        verify: bool = False,
+        profile: Optional[Profile] = None,
+        quarantine: Optional[Callable[[Sequence, Status], Any]] = None
+) -> Iterator[Optional[Field] | Status]:
+    """
+    lazily parse each frame, the specification is compiled once for the whole batch
+    :param scaffold: loaded specification or compiled plan
+    :param frames: any iterable of frames, e.g. a generator reading a capture
+    :param stats: counters to update, frames and bytes include failed frames
+    :param skip_errors: yield None for a frame failed to parse instead of raising
+    :param where: only the frames matching it are yielded, the others are aborted
+        as soon as the fields it looks at are parsed, a plan compiled with a filter uses its own
+    :param verify: verify the checksums of each frame, a frame failing any is still yielded,
+        counted in stats.corrupted and flagged, see structed.checksum.failed()
+    :param profile: time each field and handler into it, see structed.profile
+    :param quarantine: called with each frame failed to parse and its status, e.g. a Quarantine,
+        the status is yielded in place of the frame instead of raising, see structed.quarantine
+    """
+    if profile is not None:
+        plan = profile.plan(scaffold.spec if isinstance(scaffold, Plan) else scaffold, where=where)
+    elif where is not None:
+        plan = compile(scaffold.spec if isinstance(scaffold, Plan) else scaffold, where=where)
+    else:
+        plan = scaffold if isinstance(scaffold, Plan) else compile(scaffold)
+    where = plan.where
+    slots = plan.slots
+    mark = plan.mark
+    op = plan.op
+    name = plan.spec.name
+    checks = plan.spec.checks if verify else ()
+    if stats is None:
+        stats = BatchStats()
+
+    for raw in frames:
+        length = len(raw)
+        stats.frames += 1
+        stats.bytes += length
+        try:
+            field = op(raw, 0, length, None, name)
+        except Rejected:
+            where.skips += 1
+            continue
+        except Exception as e:
+            stats.failures += 1
+            if quarantine is not None:
+                status = diagnose(e)
+                quarantine(raw, status)
+                yield status
+                continue
+            if not skip_errors:
+                raise
+            field = None
+        if where is not None and field is not None and not where.count(field, slots, mark):
+            continue
+        if checks and field is not None:
+            failed = tuple(c for c in checks if not c.verify(raw))
+            if failed:
+                stats.corrupted += 1
+                field.failed_checks = failed
+        yield field
@@ -0,0 +1,129 @@
+"""
+on-disk cache of loaded specifications, so a warm start skips decode() and load()
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+import hashlib
+import marshal
+import os
+
+from structed import handler as registry, json_codec
+from structed.common import LenPolicy, SizePolicy, Dependency
+from structed.field import Specification, load
+from structed.checksum import collect
+from structed.json_codec import decode
+
+
+# bump when the stored form changes
+FORMAT = 5
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "structed")
+
+
+# (registrations, handlers, digest of handlers), refreshed on a new registration
+_registry: Optional[tuple[int, dict[str, Callable], bytes]] = None
+
+
+def registered() -> tuple[dict[str, Callable], bytes]:
+    """handlers registered by now, including the ones from add_external_handler(), and their digest"""
+    global _registry
+    if _registry is None or _registry[0] != json_codec.registrations:
+        table = {
+            name: func for name, func in vars(registry).items()
+            if callable(func) and not name.startswith("_")
+        }
+        h = hashlib.sha256()
+        for name, func in sorted(table.items()):
+            code = getattr(func, "__code__", None)
+            h.update(f"\0{name}\0{getattr(func, '__module__', '')}\0{getattr(func, '__qualname__', '')}".encode())
+            if code is not None:
+                h.update(code.co_code)
+        _registry = (json_codec.registrations, table, h.digest())
+    return _registry[1], _registry[2]
+
+
+def fingerprint(text: str) -> str:
+    """key of a specification, it changes with the JSON text and with any handler registered"""
+    h = hashlib.sha256()
+    h.update(f"{FORMAT}\0".encode())
+    h.update(text.encode())
+    h.update(registered()[1])
+    return h.hexdigest()
+
+
+def to_bytes(spec: Specification) -> bytes:
+    """handlers are stored as their registered names"""
+    names = {id(func): name for name, func in registered()[0].items()}
+
+    def callable_name(func: Callable) -> str:
+        if id(func) not in names:
+            raise ValueError(f"Handler {func!r} is not registered, cannot be cached.")
+        return names[id(func)]
+
+    def prop(x: Any) -> Any:
+        if isinstance(x, Dependency):
+            return "dependency", callable_name(x.handler), tuple(x.args), x.slots
+        elif isinstance(x, LenPolicy | SizePolicy):
+            return "policy", x.value
+        elif isinstance(x, Callable):
+            return "callable", callable_name(x)
+        return x
+
+    def node(s: Specification) -> tuple:
+        return (
+            s.name, prop(s.length), prop(s.size), prop(s.handler), s.slot, s.bits, prop(s.switch), s.check, s.sync,
+            tuple(node(c) for c in s.children)
+        )
+    return marshal.dumps(node(spec))
+
+
+def from_bytes(data: bytes) -> Specification:
+    """rebind the handler names to the handlers registered now"""
+    table = registered()[0]
+
+    def prop(x: Any, policy: type) -> Any:
+        if not isinstance(x, tuple):
+            return x
+        match x[0]:
+            case "dependency":
+                dependency = Dependency((table[x[1]], *x[2]))
+                dependency.slots = x[3]
+                return dependency
+            case "policy":
+                return policy(x[1])
+            case "callable":
+                return table[x[1]]
+
+    def node(t: tuple, parent: Optional[Specification]) -> Specification:
+        name, length, size, handler, slot, bits, switch, check, sync, children = t
+        s = Specification(
+            name, prop(length, LenPolicy), prop(size, SizePolicy), prop(handler, None), parent, None,
+            slot=slot, bits=bits, switch=prop(switch, None), check=check, sync=sync
+        )
+        return s.add_children(*(node(c, s) for c in children))
+    spec = node(marshal.loads(data), None)
+    spec.checks = collect(spec)
+    return spec
+
+
+def load_cached(text: str, cache_dir: Optional[str] = None) -> Specification:
+    """
+    same as load(decode(text)), but the result is cached under cache_dir.
+    Register external handlers before calling it, since they are part of the key.
+    """
+    if cache_dir is None:
+        cache_dir = DEFAULT_DIR
+    path = os.path.join(cache_dir, fingerprint(text) + ".spec")
+    try:
+        with open(path, "rb") as fp:
+            return from_bytes(fp.read())
+    except (OSError, ValueError, EOFError, TypeError, KeyError):
+        pass  # missing or unreadable, build it again
+
+    spec = load(decode(text))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fp:
+        fp.write(to_bytes(spec))
+    os.replace(tmp, path)
+    return spec
@@ -0,0 +1,279 @@
+"""
+checksums stored in a field of the frame, verified over a byte range of the frame,
+numpy is only needed to verify many frames at once
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, TYPE_CHECKING
+from collections.abc import Sequence, Iterable
+import binascii
+import sys
+import zlib
+
+from structed.common import LenPolicy
+from structed.exception import SpecParseError
+
+try:
+    import numpy as np
+except ImportError:  # verify_many() falls back to one frame after another
+    np = None
+
+if TYPE_CHECKING:
+    from structed.field import Field, Specification
+
+
+def internet(data: Sequence) -> int:
+    """ones' complement of the ones' complement sum of the 16-bit words, RFC 1071"""
+    if len(data) % 2:
+        data = bytes(data) + b"\0"
+    # the sum does not depend on the byte order, so sum native words and swap the result
+    total = sum(memoryview(data).cast("B").cast("H"))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    if sys.byteorder == "little":
+        total = ((total & 0xFF) << 8) | (total >> 8)
+    return ~total & 0xFFFF
+
+
+def crc16_ccitt(data: Sequence) -> int:
+    """CRC-16/CCITT-FALSE: polynomial 0x1021, initial value 0xFFFF, not reflected"""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def crc32(data: Sequence) -> int:
+    """CRC-32 of zlib and Ethernet"""
+    return zlib.crc32(data)
+
+
+def crc16_table() -> list[int]:
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+
+def crc32_table() -> list[int]:
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xEDB88320 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+def internet_many(a: np.ndarray) -> np.ndarray:
+    """internet() of each row"""
+    if a.shape[1] % 2:
+        a = np.pad(a, ((0, 0), (0, 1)))
+    total = ((a[:, 0::2].astype(np.uint64) << 8) | a[:, 1::2]).sum(axis=1, dtype=np.uint64)
+    while (total >> 16).any():
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def crc16_ccitt_many(a: np.ndarray) -> np.ndarray:
+    """crc16_ccitt() of each row, one table lookup per column for all the rows"""
+    table = np.array(crc16_table(), dtype=np.uint32)
+    crc = np.full(a.shape[0], 0xFFFF, dtype=np.uint32)
+    for column in a.T:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ column]
+    return crc
+
+
+def crc32_many(a: np.ndarray) -> np.ndarray:
+    """crc32() of each row, one table lookup per column for all the rows"""
+    table = np.array(crc32_table(), dtype=np.uint32)
+    crc = np.full(a.shape[0], 0xFFFFFFFF, dtype=np.uint32)
+    for column in a.T:
+        crc = table[(crc ^ column) & 0xFF] ^ (crc >> 8)
+    return crc ^ 0xFFFFFFFF
+
+
+class Algorithm:
+    def __init__(
+            self,
+            name: str,
+            width: int,
+            compute: Callable[[Sequence], int],
+            compute_many: Callable[[np.ndarray], np.ndarray]
+    ):
+        """
+        :param width: bytes of the checksum
+        :param compute: checksum of bytes
+        :param compute_many: checksums of the rows of a 2-D uint8 array
+        """
+        self.name = name
+        self.width = width
+        self.compute = compute
+        self.compute_many = compute_many
+
+
+ALGORITHMS = {
+    x.name: x for x in (
+        Algorithm("internet", 2, internet, internet_many),
+        Algorithm("crc16_ccitt", 2, crc16_ccitt, crc16_ccitt_many),
+        Algorithm("crc32", 4, crc32, crc32_many),
+    )
+}
+
+
+class Check:
+    """
+    checksum stored big-endian in a field of fixed length, computed over frame[start:stop].
+    Offsets are from the start of the frame, or from its end if negative, like slices.
+    The bytes of the field itself are taken as zeros if they are in the range.
+    """
+    def __init__(
+            self,
+            path: str,
+            algorithm: Algorithm,
+            offset: int,
+            length: int,
+            start: int = 0,
+            stop: Optional[int] = None
+    ):
+        self.path = path
+        self.algorithm = algorithm
+        self.offset = offset
+        self.length = length
+        self.start = start
+        self.stop = stop
+
+    def __repr__(self):
+        return f"Check({self.path}, {self.algorithm.name}, range=[{self.start}:{self.stop}])"
+
+    def bounds(self, n: int) -> Optional[tuple[int, int, int, int]]:
+        """(field start, field stop, range start, range stop) in a frame of n bytes, None if it is too short"""
+        a = self.offset if self.offset >= 0 else n + self.offset
+        if a < 0 or a + self.length > n:
+            return None
+        start, stop, _ = slice(self.start, self.stop).indices(n)
+        return a, a + self.length, start, max(start, stop)
+
+    def verify(self, frame: Sequence) -> bool:
+        bounds = self.bounds(len(frame))
+        if bounds is None:
+            return False
+        a, b, start, stop = bounds
+        stored = int.from_bytes(frame[a:b], "big")
+        data = frame[start:stop]
+        if a < stop and start < b:
+            data = bytearray(data)
+            data[max(a, start) - start:min(b, stop) - start] = bytes(min(b, stop) - max(a, start))
+        return self.algorithm.compute(data) == stored
+
+    def fill(self, frame: bytearray | memoryview):
+        """store the checksum into a frame in which the field is still zeros"""
+        a, b, start, stop = self.bounds(len(frame))
+        frame[a:b] = self.algorithm.compute(frame[start:stop]).to_bytes(self.length, "big")
+
+    def verify_many(self, frames: np.ndarray) -> np.ndarray:
+        """verify the rows of a 2-D uint8 array of frames of the same length"""
+        bounds = self.bounds(frames.shape[1])
+        if bounds is None:
+            return np.zeros(frames.shape[0], dtype=bool)
+        a, b, start, stop = bounds
+        stored = np.zeros(frames.shape[0], dtype=np.uint64)
+        for i in range(a, b):
+            stored = (stored << 8) | frames[:, i]
+        data = frames[:, start:stop]
+        if a < stop and start < b:
+            data = data.copy()
+            data[:, max(a, start) - start:min(b, stop) - start] = 0
+        return self.algorithm.compute_many(data).astype(np.uint64) == stored
+
+
+def collect(spec: Specification) -> tuple[Check, ...]:
+    """
+    checks of the fields with a check property, spec is the root, which ends with the frame.
+    A checked field is a leaf of fixed length at a fixed offset from the start or the end of the frame.
+    """
+    checks = []
+
+    def fixed(fields: Iterable[Specification]) -> Optional[int]:
+        """sum of the lengths if all are fixed"""
+        total = 0
+        for s in fields:
+            if not isinstance(s.length, int) or s.is_structural_variable:
+                return None
+            total += s.length
+        return total
+
+    def edge(s: Specification, at_start: bool) -> Optional[tuple[bool, int]]:
+        """(from the end, offset) of the start or the stop of s, the offset is negative from the end"""
+        p = s.parent
+        if p is None:
+            return (False, 0) if at_start else (True, 0)
+        if p.switch is not None or p.is_structural_variable or p.is_bit_word or s.is_structural_variable:
+            return None
+        i = p.children.index(s)
+        if at_start:
+            before = fixed(p.children[:i])
+            base = edge(p, True)
+            if before is not None and base is not None:
+                return base[0], base[1] + before
+            after = fixed(p.children[i:])
+        else:
+            after = fixed(p.children[i + 1:])
+        # from the stop of the parent, which is the stop of its last child
+        base = edge(p, False) if p.length is LenPolicy.auto else None
+        if after is None or base is None:
+            return None
+        return base[0], base[1] - after
+
+    names = []
+
+    def preorder(s: Specification):
+        if s.check is not None:
+            path = ".".join(names)
+            name, start, stop = s.check
+            algorithm = ALGORITHMS[name]
+            offset = edge(s, True)
+            if not s.is_leaf or s.length != algorithm.width or offset is None:
+                raise SpecParseError(
+                    f"Checked field '{path}' should be a leaf of {algorithm.width} bytes "
+                    f"at a fixed offset from the start or the end of the frame."
+                )
+            checks.append(Check(path, algorithm, offset[1], s.length, start, stop))
+        for c in s.children:
+            # the path of a field is only joined if it is checked, paths of deep fields are long
+            names.append(c.name)
+            preorder(c)
+            names.pop()
+    preorder(spec)
+    return tuple(checks)
+
+
+def verify(spec: Specification, frame: Sequence) -> bool:
+    """if all the checks of the specification pass on the frame"""
+    return all(c.verify(frame) for c in spec.checks)
+
+
+def verify_many(spec: Specification, frames: Iterable[Sequence]) -> list[bool]:
+    """
+    verify() of each frame, the frames of the same length are verified at once with numpy if it is installed
+    """
+    frames = list(frames)
+    if np is None or not spec.checks:
+        return [verify(spec, x) for x in frames]
+    groups: dict[int, list[int]] = {}
+    for i, x in enumerate(frames):
+        groups.setdefault(len(x), []).append(i)
+    results = [True] * len(frames)
+    for n, indexes in groups.items():
+        a = np.frombuffer(b"".join(bytes(frames[i]) for i in indexes), dtype=np.uint8).reshape(len(indexes), n)
+        ok = np.ones(len(indexes), dtype=bool)
+        for c in spec.checks:
+            ok &= c.verify_many(a)
+        for i, v in zip(indexes, ok.tolist()):
+            results[i] = v
+    return results
+
+
+def failed(field: Field) -> tuple[Check, ...]:
+    """checks failed by a frame parsed by parse_many(..., verify=True)"""
+    return field.failed_checks
@@ -0,0 +1,455 @@
+"""
+generate the source of a parser specialized to one specification
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable
+import builtins
+import hashlib
+import importlib.util
+import os
+
+from structed import handler as builtin
+from structed.common import LenPolicy, SizePolicy, Dependency
+from structed.field import Specification
+from structed.compiler import Plan, Compiler
+from structed.exception import SpecParseError
+from structed.predefined import unwrap
+
+
+HEADER = '''"""
+parser generated by structed.codegen from a specification, do not edit
+"""
+
+import logging
+
+from structed import handler
+from structed.exception import locate
+from structed.field import Field
+
+logger = logging.getLogger("structed.generated")
+
+# preorder of the specification, set when the module is installed,
+# used by the fields whose policy is only known at runtime
+NODES = ()
+'''
+
+
+class Function:
+    """lines of one generated function"""
+    def __init__(self, name: str, comment: str):
+        self.name = name
+        self.comment = comment
+        self.lines: list[str] = []
+        self.globals: set[str] = set()  # bound as default arguments, so they are looked up as locals
+        self.count = 0
+        # inlined leaves whose handler may raise set leaf and at to their name and offset first, see locate()
+        self.leaves = False
+        # the handlers of the field itself set code first, see Generator.blamed()
+        self.handlers = False
+
+    def emit(self, line: str, indent: int = 1):
+        self.lines.append("    " * indent + line)
+
+    def local(self, prefix: str) -> str:
+        self.count += 1
+        return f"{prefix}{self.count}"
+
+    def source(self) -> str:
+        defaults = "".join(f", {x}={x}" for x in sorted(self.globals))
+        head = f"def {self.name}(raw, start, stop, parent, name{defaults}):"
+        # every field of a frame shares the same symbols, keep only the first binding if any is used
+        lines = []
+        bound = not any("symbols[" in x for x in self.lines)
+        for line in self.lines:
+            if line.startswith("    symbols = "):
+                if bound:
+                    continue
+                bound = True
+            lines.append("    " + line)
+        own = "locate(e, parent, name, start, code)" if self.handlers else "locate(e, parent, name, start)"
+        if self.leaves:
+            where = [
+                "    leaf = None",
+                "    try:",
+                *lines,
+                "    except Exception as e:",
+                "        if leaf is None:",
+                f"            {own}",
+                "        else:",
+                "            locate(e, field, leaf, at, 'handler')",
+                "        raise",
+            ]
+        else:
+            where = [
+                "    try:",
+                *lines,
+                "    except Exception as e:",
+                f"        {own}",
+                "        raise",
+            ]
+        if self.handlers:
+            where.insert(0, "    code = 'malformed'")
+        return "\n".join([head, f"    # {self.comment}", *where]) + "\n"
+
+
+class Generator:
+    """one function per field that cannot be unrolled into its parent"""
+    def __init__(self, spec: Specification):
+        self.nodes: list[Specification] = []
+        self.index: dict[int, int] = {}
+        self.__preorder(spec)
+        self.registered = {
+            id(func): name for name, func in vars(builtin).items()
+            if callable(func) and not name.startswith("_")
+        }
+        self.handlers: dict[int, str] = {}
+        self.assignments: list[str] = []
+        self.tables: list[str] = []  # defined after the functions they refer to
+        self.functions: dict[str, Function] = {}
+        self.root = self.op(spec)
+
+    def __preorder(self, spec: Specification):
+        self.index[id(spec)] = len(self.nodes)
+        self.nodes.append(spec)
+        for cs in spec.children:
+            self.__preorder(cs)
+
+    def source(self) -> str:
+        parts = [HEADER, *self.assignments, ""]
+        # a function is defined after the ones bound as its defaults
+        for f in reversed(self.functions.values()):
+            parts.append("\n" + f.source())
+        if self.tables:
+            parts.append("\n" + "\n".join(self.tables) + "\n")
+        parts.append(
+            "\ndef parse(raw, parent=None, start=0, stop=None):\n"
+            "    if stop is None:\n"
+            "        stop = len(raw)\n"
+            f"    return {self.root}(raw, start, stop, parent, {self.nodes[0].name!r})\n"
+        )
+        return "\n".join(parts)
+
+    def handler(self, f: Function, func: Callable) -> str:
+        """handlers are bound by their registered names"""
+        if id(func) not in self.registered:
+            raise ValueError(f"Handler {func!r} is not registered, cannot be generated.")
+        if id(func) not in self.handlers:
+            name = f"H{len(self.handlers)}"
+            self.handlers[id(func)] = name
+            self.assignments.append(f"{name} = handler.{self.registered[id(func)]}")
+        f.globals.add(self.handlers[id(func)])
+        return self.handlers[id(func)]
+
+    def call(self, f: Function, dependency: Dependency, *args: str) -> str:
+        """the handler of a dependency on the values in symbols"""
+        if dependency.slots is None:
+            raise SpecParseError(
+                f"Dependency on {dependency.args} is not bound, load() the specification first, "
+                "the fields of a parent frame or of another structural variable are only looked up "
+                "by parse() and compile()."
+            )
+        values = [f"symbols[{x}]" for x in dependency.slots]
+        if dependency.handler is builtin.identity and len(values) + len(args) == 1:
+            return [*values, *args][0]
+        return f"{self.handler(f, dependency.handler)}({', '.join([*values, *args])})"
+
+    def value(self, f: Function, spec: Specification, a: str, b: str, a1: Optional[str] = None) -> str:
+        """value of a leaf covering raw[a:b], a1 is a + 1 if the width is known to be spec.length"""
+        exact = a1 is not None
+        handler = spec.handler
+        if isinstance(handler, Dependency):
+            return self.call(f, handler, f"raw[{a}:{b}]")
+        elif not isinstance(handler, Callable):
+            return "None"
+        elif exact and handler is builtin.bytes2int_b and spec.length == 1:
+            return f"raw[{a}]"
+        elif exact and handler is builtin.bytes2int_b and spec.length == 2:
+            return f"(raw[{a}] << 8 | raw[{a1}])"
+        elif handler is builtin.bytes2int_b:
+            return f"int.from_bytes(raw[{a}:{b}], 'big')"
+        elif handler is builtin.bytes2hex:
+            return f"raw[{a}:{b}].hex()"
+        elif handler is builtin.identity:
+            return f"raw[{a}:{b}]"
+        return f"{self.handler(f, handler)}(raw[{a}:{b}])"
+
+    @staticmethod
+    def calls(dependency: Dependency) -> bool:
+        """call() is not inlined into a lookup of symbols"""
+        return dependency.handler is not builtin.identity or len(dependency.args) != 1
+
+    @staticmethod
+    def blamed(f: Function, line: str, handler: bool):
+        """a line of the field itself, an error raised by it has the handler code if it calls a handler"""
+        if handler:
+            f.handlers = True
+            f.emit("code = 'handler'")
+            f.emit(line)
+            f.emit("code = 'malformed'")
+        else:
+            f.emit(line)
+
+    @staticmethod
+    def may_raise(spec: Specification) -> bool:
+        """the value of the leaf is computed by a handler which is not inlined"""
+        handler = spec.handler
+        return isinstance(handler, Dependency) or (
+            isinstance(handler, Callable) and handler not in (builtin.bytes2int_b, builtin.bytes2hex, builtin.identity)
+        )
+
+    def node(self, spec: Specification) -> str:
+        return f"NODES[{self.index[id(spec)]}]"
+
+    def op(self, spec: Specification) -> str:
+        """name of the function parsing spec"""
+        i = self.index[id(spec)]
+        name = f"p{i}"
+        if name in self.functions:
+            return name
+        f = self.functions[name] = Function(name, spec.name)
+        if spec.is_structural_variable:
+            self.structural(f, spec, self.length(spec, f"e{i}"))
+        else:
+            self.length(spec, name, f)
+        return name
+
+    def length(self, spec: Specification, name: str, f: Optional[Function] = None) -> str:
+        """function parsing spec according to its length, size is ignored"""
+        if f is None:
+            f = self.functions[name] = Function(name, f"element of {spec.name}")
+        f.globals.add("Field")
+        if isinstance(spec.length, int):
+            f.emit(f"stop = min(start + {spec.length}, stop)")
+            self.sized(f, spec)
+        elif isinstance(spec.length, Dependency):
+            f.emit("symbols = parent.symbols")
+            self.blamed(f, f"length = {self.call(f, spec.length)}", self.calls(spec.length))
+            f.emit("if not isinstance(length, int):")
+            f.emit("# a policy decided at runtime, leave it to the specification", 2)
+            f.emit(f"return {self.node(spec)}.template(name, length, None).parse(raw, parent, start, stop)", 2)
+            f.emit("stop = min(start + length, stop)")
+            self.sized(f, spec)
+        elif spec.length is LenPolicy.auto:
+            f.emit("field = Field(name, b'', None, parent, None, is_virtual=True)")
+            f.emit("symbols = field.symbols")
+            f.emit("used = start")
+            self.children(f, spec)
+            if spec.is_leaf:
+                self.blamed(f, f"v = {self.value(f, spec, 'start', 'used')}", self.may_raise(spec))
+                f.emit("field.actualize(raw, v, start, used)")
+            else:
+                f.emit("field.actualize(raw, None, start, used)")
+            if spec.slot is not None:
+                f.emit(f"symbols[{spec.slot}] = field.value")
+            f.emit("return field")
+        else:
+            node = self.node(spec)
+            f.emit(f"return {node}.template(name, {node}.length, None).parse(raw, parent, start, stop)")
+        return name
+
+    def sized(self, f: Function, spec: Specification):
+        """parse a field whose stop is already decided"""
+        if spec.is_leaf:
+            if spec.slot is not None or isinstance(spec.handler, Dependency):
+                f.emit("symbols = parent.symbols")
+            self.blamed(f, f"v = {self.value(f, spec, 'start', 'stop')}", self.may_raise(spec))
+            if spec.slot is not None:
+                f.emit(f"symbols[{spec.slot}] = v")
+            f.emit("return Field(name, raw, v, parent, None, start=start, stop=stop)")
+            return
+        f.emit("field = Field(name, raw, None, parent, None, start=start, stop=stop)")
+        f.emit("symbols = field.symbols")
+        if spec.is_bit_word:
+            self.bits(f, spec)
+            f.emit("return field")
+            return
+        f.emit("used = start")
+        self.children(f, spec)
+        f.emit("if used < stop:")
+        f.emit("logger.warning(\"child fields does not used all bytes of field '%s'.\", name)", 2)
+        f.emit("return field")
+
+    def bits(self, f: Function, spec: Specification):
+        # a truncated word is read as if the missing bytes were zeros
+        f.emit(f"word = int.from_bytes(raw[start:stop], 'big') << 8 * ({spec.length} - (stop - start))")
+        children = []
+        located = any(self.may_raise(cs) for cs, _, _ in spec.bit_layout)
+        if located:
+            f.leaves = True
+            f.emit("at = start")
+        for cs, shift, mask in spec.bit_layout:
+            if self.may_raise(cs):
+                f.emit(f"leaf = {cs.name!r}")
+            bits = f"word >> {shift} & {mask}" if shift else f"word & {mask}"
+            if isinstance(cs.handler, Dependency):
+                bits = self.call(f, cs.handler, bits)
+            elif isinstance(cs.handler, Callable):
+                bits = f"{self.handler(f, cs.handler)}({bits})"
+            c = f.local("c")
+            if cs.slot is not None:
+                f.emit(f"symbols[{cs.slot}] = v = {bits}")
+                bits = "v"
+            f.emit(f"{c} = Field({cs.name!r}, raw, {bits}, field, None, start=start, stop=stop)")
+            children.append(c)
+        if located:
+            f.emit("leaf = None")
+        f.emit(f"field.children = {tuple_of(children)}")
+
+    def children(self, f: Function, spec: Specification):
+        """unroll the children, consecutive plain leaves are parsed at precomputed offsets"""
+        if spec.is_leaf:
+            return
+        if spec.switch is not None:
+            self.union(f, spec)
+            return
+        children = []
+        run = []
+        for cs in spec.children:
+            cs: Specification
+            if Compiler.is_plain_leaf(cs):
+                run.append(cs)
+                continue
+            if run:
+                children += self.run(f, run)
+                run = []
+            c = f.local("c")
+            f.emit(f"{c} = {self.op(cs)}(raw, used, stop, field, {cs.name!r})")
+            f.emit(f"used += {c}.length")
+            children.append(c)
+        if run:
+            children += self.run(f, run)
+        f.emit(f"field.children = {tuple_of(children)}")
+
+    def union(self, f: Function, spec: Specification):
+        """look the function of the case up in a table, by the value of the discriminator"""
+        functions = {id(cs): self.op(cs) for cs in spec.children}
+        table = f"S{self.index[id(spec)]}"
+        entries = ", ".join(f"{key!r}: ({functions[id(cs)]}, {cs.name!r})" for key, cs in spec.cases.items())
+        self.tables.append(f"{table} = {{{entries}}}")
+        self.blamed(f, f"key = {self.call(f, spec.switch)}", self.calls(spec.switch))
+        f.emit(f"branch = {table}.get(key)")
+        f.emit("if branch is None:")
+        f.emit(f"{self.node(spec)}.case(field)  # raises", 2)
+        c = f.local("c")
+        f.emit(f"{c} = branch[0](raw, used, stop, field, branch[1])")
+        f.emit(f"used += {c}.length")
+        f.emit(f"field.children = ({c},)")
+
+    def run(self, f: Function, specs: list[Specification]) -> list[str]:
+        """straight-line code for the whole frame, with a slower path for truncated raw"""
+        names = [f.local("c") for _ in specs]
+        total = sum(cs.length for cs in specs)
+        located = any(self.may_raise(cs) for cs in specs)
+        f.leaves = f.leaves or located
+        f.emit(f"if used + {total} <= stop:")
+        offset = 0
+        for c, cs in zip(names, specs):
+            a = f"used + {offset}" if offset else "used"
+            b = f"used + {offset + cs.length}"
+            if self.may_raise(cs):
+                f.emit(f"leaf, at = {cs.name!r}, {a}", 2)
+            self.leaf(f, c, cs, self.value(f, cs, a, b, f"used + {offset + 1}"), a, b, 2)
+            offset += cs.length
+        if located:
+            f.emit("leaf = None", 2)
+        f.emit(f"used += {total}", 2)
+        f.emit("else:")
+        f.emit("# every leaf takes what is left", 2)
+        for c, cs in zip(names, specs):
+            f.emit(f"b = min(used + {cs.length}, stop)", 2)
+            if self.may_raise(cs):
+                f.emit(f"leaf, at = {cs.name!r}, used", 2)
+            self.leaf(f, c, cs, self.value(f, cs, "used", "b"), "used", "b", 2)
+            f.emit("used = b", 2)
+        if located:
+            f.emit("leaf = None", 2)
+        return names
+
+    @staticmethod
+    def leaf(f: Function, c: str, spec: Specification, value: str, a: str, b: str, indent: int):
+        if spec.slot is not None:
+            f.emit(f"symbols[{spec.slot}] = v = {value}", indent)
+            value = "v"
+        f.emit(f"{c} = Field({spec.name!r}, raw, {value}, field, None, start={a}, stop={b})", indent)
+
+    def structural(self, f: Function, spec: Specification, element: str):
+        f.globals.update(("Field", element))
+        base = unwrap(spec.name)
+        size = spec.size
+        if isinstance(size, Dependency):
+            f.emit("virtual = Field(name, None, None, parent, None, is_virtual=True)")
+            f.emit("symbols = virtual.symbols")
+            f.emit("children = []")
+            f.emit("used = start")
+            self.blamed(f, f"count = {self.call(f, size)}", self.calls(size))
+            f.emit("for i in range(count):")
+            f.emit(f"cf = {element}(raw, used, stop, virtual, f{base + '[{i}]'!r})", 2)
+            f.emit("used += cf.length", 2)
+            f.emit("children.append(cf)", 2)
+        elif size is SizePolicy.greedy:
+            f.emit("virtual = Field(name, None, None, parent, None, is_virtual=True)")
+            f.emit("children = []")
+            f.emit("used = start")
+            f.emit("while used < stop:")
+            f.emit(f"cf = {element}(raw, used, stop, virtual, f{base + '[{len(children)}]'!r})", 2)
+            f.emit("used += cf.length", 2)
+            f.emit("children.append(cf)", 2)
+        else:
+            f.emit(f"return {self.node(spec)}.parse(raw, parent, start, stop)")
+            return
+        f.emit("virtual.children = tuple(children)")
+        f.emit("virtual.virtual_length = used - start")
+        f.emit("return virtual")
+
+
+def tuple_of(names: list[str]) -> str:
+    return f"({names[0]},)" if len(names) == 1 else f"({', '.join(names)})"
+
+
+def generate(spec: Specification) -> str:
+    """
+    source of a module parsing like the specification, with the offsets unrolled
+    and the handlers bound as locals, its parse() has the same signature as Specification.parse()
+    """
+    return Generator(spec).source()
+
+
+def install(namespace: dict, spec: Specification) -> Plan:
+    """bind the generated module to the specification it was generated from"""
+    nodes = []
+
+    def preorder(s: Specification):
+        nodes.append(s)
+        for c in s.children:
+            preorder(c)
+    preorder(spec)
+    namespace["NODES"] = tuple(nodes)
+    return Plan(spec, namespace["p0"])
+
+
+def compile_generated(spec: Specification, path: Optional[str] = None) -> Plan:
+    """
+    generate the parser and load it.
+    If path is given, the source is written there and imported, so the bytecode is cached in __pycache__,
+    otherwise it is only compiled in memory. Register external handlers first.
+    """
+    source = generate(spec)
+    if path is None:
+        namespace = {"__name__": "structed.generated"}
+        exec(builtins.compile(source, "<structed.generated>", "exec"), namespace)
+        return install(namespace, spec)
+
+    try:
+        with open(path, "r") as fp:
+            unchanged = fp.read() == source
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(path, "w") as fp:
+            fp.write(source)
+    name = "structed_generated_" + hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    module_spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return install(vars(module), spec)
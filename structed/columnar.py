@@ -0,0 +1,202 @@
+"""
+columnar batch decoding of the fixed-offset fields with NumPy,
+numpy is only needed by this module
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable
+from collections.abc import Sequence, Iterable
+
+import numpy as np
+
+from structed import handler as builtin
+from structed.common import LenPolicy, Dependency
+from structed.field import Specification
+from structed.compiler import Plan
+
+
+INT_SIZES = (1, 2, 4, 8)
+
+
+class Layout:
+    """the fixed-offset leaves at the head of a specification, as a NumPy structured dtype"""
+    def __init__(self, spec: Specification):
+        # (path, offset, length, is_int, slot) of each leaf
+        self.leaves: list[tuple[str, int, int, bool, Optional[int]]] = []
+        # (path, word path, shift, mask, handler, slot) of each bit-field, the word is in leaves
+        self.bits: list[tuple[str, str, int, int, Optional[Callable], Optional[int]]] = []
+        self.tail: list[Specification] = []
+        self.size = 0
+        self.complete = self.__walk(spec, "", 0) is not None
+        self.dtype = np.dtype({
+            "names": [path for path, *_ in self.leaves],
+            "formats": [
+                f">u{length}" if is_int else ("u1", (length,))
+                for _, _, length, is_int, _ in self.leaves
+            ],
+            "offsets": [offset for _, offset, *_ in self.leaves],
+            "itemsize": self.size
+        })
+
+    def __walk(self, spec: Specification, prefix: str, offset: int) -> Optional[int]:
+        """add the static children of spec, return the offset after them, None if stopped"""
+        for cs in spec.children:
+            cs: Specification
+            path = prefix + cs.name
+            static = not cs.is_structural_variable and (
+                isinstance(cs.length, int) or (cs.length is LenPolicy.auto and not cs.is_leaf)
+            ) and not (cs.is_bit_word and not self.is_vectorized(cs)) and cs.switch is None
+            if not static:
+                self.__stop(cs)
+                return None
+            if cs.is_leaf:
+                is_int = cs.handler is builtin.bytes2int_b and cs.length in INT_SIZES
+                self.leaves.append((path, offset, cs.length, is_int, cs.slot))
+                offset += cs.length
+            elif cs.is_bit_word:
+                self.leaves.append((path, offset, cs.length, cs.length in INT_SIZES, None))
+                for bs, shift, mask in cs.bit_layout:
+                    self.bits.append((f"{path}.{bs.name}", path, shift, mask, bs.handler, bs.slot))
+                offset += cs.length
+            else:
+                end = self.__walk(cs, path + ".", offset)
+                if end is None:
+                    return None
+                offset = offset + cs.length if isinstance(cs.length, int) else end
+            self.size = offset
+        return offset
+
+    @staticmethod
+    def is_vectorized(spec: Specification) -> bool:
+        """the word fits in uint64 and no bit-field handler depends on others"""
+        return spec.length <= 8 and not any(isinstance(cs.handler, Dependency) for cs in spec.children)
+
+    def __stop(self, spec: Specification):
+        """the variable tail, from spec to the end of its parent"""
+        siblings = spec.parent.children
+        self.tail = list(siblings[siblings.index(spec):])
+
+
+class Columns:
+    """
+    decoded batch, one array per fixed-offset field.
+    Frames shorter than the fixed part are marked in valid and decoded as zeros.
+    """
+    def __init__(
+            self,
+            buffer: np.ndarray,
+            offsets: np.ndarray,
+            lengths: np.ndarray,
+            columns: dict[str, np.ndarray],
+            valid: np.ndarray,
+            tail_name: Optional[str],
+            tail_offsets: np.ndarray,
+            tail_lengths: np.ndarray
+    ):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.lengths = lengths
+        self.columns = columns
+        self.valid = valid
+        self.tail_name = tail_name
+        self.tail_offsets = tail_offsets
+        self.tail_lengths = tail_lengths
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, path: str) -> np.ndarray:
+        return self.columns[path]
+
+    def tail(self, i: int) -> memoryview:
+        """variable tail of the i-th frame, a view into the shared buffer"""
+        start = self.tail_offsets[i]
+        return memoryview(self.buffer)[start:start + self.tail_lengths[i]]
+
+
+def pack(frames: Iterable[Sequence]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """concatenate the frames into one buffer, returns buffer, offsets and lengths"""
+    frames = list(frames)
+    lengths = np.fromiter((len(x) for x in frames), dtype=np.int64, count=len(frames))
+    offsets = np.zeros(len(frames), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    buffer = np.frombuffer(b"".join(frames), dtype=np.uint8)
+    return buffer, offsets, lengths
+
+
+def parse_packed(
+        scaffold: Specification | Plan,
+        buffer: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        layout: Optional[Layout] = None
+) -> Columns:
+    """decode the frames buffer[offsets[i]:offsets[i] + lengths[i]] all at once"""
+    spec = scaffold.spec if isinstance(scaffold, Plan) else scaffold
+    if layout is None:
+        layout = Layout(spec)
+    n = len(offsets)
+    valid = lengths >= layout.size
+
+    # gather the fixed part of every frame into one (n, size) block, then reinterpret it
+    index = offsets[:, None] + np.arange(layout.size)
+    if len(buffer) > 0:
+        block = buffer[np.minimum(index, len(buffer) - 1)]
+    else:
+        block = np.zeros((n, layout.size), dtype=np.uint8)
+    block[~valid] = 0
+    records = np.ascontiguousarray(block).view(layout.dtype).reshape(n)
+    columns = {path: records[path] for path, *_ in layout.leaves}
+    words = {word for _, word, *_ in layout.bits}
+    for path, word, shift, mask, handler, _ in layout.bits:
+        bits = (as_uint64(columns[word]) >> np.uint64(shift)) & np.uint64(mask)
+        columns[path] = bits if handler is None else np.frompyfunc(handler, 1, 1)(bits)
+    for word in words:
+        del columns[word]  # not a leaf, only its bit-fields are
+
+    tail_offsets = offsets + layout.size
+    remaining = np.maximum(lengths - layout.size, 0)
+    tail_name = None
+    tail_lengths = remaining
+    if layout.tail:
+        tail_name = layout.tail[0].name
+        tail_lengths = np.minimum(tail_length(layout, columns, remaining), remaining)
+    return Columns(
+        buffer, offsets, lengths, columns, valid,
+        tail_name, tail_offsets, tail_lengths
+    )
+
+
+def as_uint64(word: np.ndarray) -> np.ndarray:
+    """a column of big-endian ints, or of byte arrays for the widths numpy has no int for"""
+    if word.ndim == 1:
+        return word.astype(np.uint64)
+    result = np.zeros(len(word), dtype=np.uint64)
+    for k in range(word.shape[1]):
+        result = result << np.uint64(8) | word[:, k].astype(np.uint64)
+    return result
+
+
+def tail_length(layout: Layout, columns: dict[str, np.ndarray], remaining: np.ndarray) -> np.ndarray:
+    """a lone tail leaf whose length depends on int columns, e.g. data of udp"""
+    if len(layout.tail) != 1 or not layout.tail[0].is_leaf:
+        return remaining
+    dependency = layout.tail[0].length
+    if not isinstance(dependency, Dependency) or dependency.slots is None:
+        return remaining
+    by_slot = {slot: path for path, _, _, is_int, slot in layout.leaves if is_int and slot is not None}
+    by_slot.update(
+        (slot, path) for path, _, _, _, handler, slot in layout.bits if handler is None and slot is not None
+    )
+    if not all(x in by_slot for x in dependency.slots):
+        return remaining
+    args = [columns[by_slot[x]] for x in dependency.slots]
+    if dependency.handler is builtin.identity and len(args) == 1:
+        return args[0].astype(np.int64)
+    result = np.frompyfunc(dependency.handler, len(args), 1)(*args)
+    return np.asarray(result, dtype=np.int64)
+
+
+def parse_columns(scaffold: Specification | Plan, frames: Iterable[Sequence]) -> Columns:
+    """pack the frames and decode them as columns"""
+    return parse_packed(scaffold, *pack(frames))
@@ -40,6 +40,8 @@ class Dependency:
         assert len(spec) >= 1
         self.handler = spec[0]
         self.args = spec[1:]
+        # slots of the fields named in args, bound by field.bind()
+        self.slots: Optional[tuple[int, ...]] = None
         assert isinstance(self.handler, Callable)
 
 
@@ -87,9 +89,12 @@ class Tree:
         return None
 
     def add_children(self, *children: Tree) -> Tree:
-        # some dirty works, doesn't really create a new tree
-        tmp = list(self.children)
-        for child in children:
-            tmp.append(child)
-        self.children = tuple(tmp)
+        """
+        children is a list while the tree is being built, appended in place,
+        and a tuple once done, which is copied, so build with a list to add one child after another
+        """
+        if isinstance(self.children, list):
+            self.children.extend(children)
+        else:
+            self.children = (*self.children, *children)
         return self
@@ -0,0 +1,843 @@
+"""
+compile a specification into a flat parse plan
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any, TYPE_CHECKING
+from collections.abc import Sequence, Iterable
+from functools import lru_cache
+import logging
+
+from structed.common import LenPolicy, SizePolicy, Dependency
+from structed.exception import SpecParseError, locate
+from structed.field import Field, Specification, call
+from structed.filter import Filter, Rejected
+from structed.predefined import unwrap
+
+if TYPE_CHECKING:
+    from structed.profile import Profile
+
+logger = logging.getLogger(__name__)
+
+
+# op(raw, start, stop, parent, name) parses one field from raw[start:stop]
+Op = Callable[[Sequence, int, int, Optional[Field], str], Field]
+# step(raw, used, stop, field) parses children of field from raw[used:stop], returns new used
+Step = Callable[[Sequence, int, int, Field], int]
+# skip(raw, start, stop, pf) is the end of a field in raw[start:stop], without parsing it
+Skip = Callable[[Sequence, int, int, Field], int]
+# decode(raw, start, stop, pf) is the value of a leaf covering raw[start:stop]
+Decode = Callable[[Sequence, int, int, Optional[Field]], Any]
+
+# entry of a lookup table whose input made the handler raise
+MISSING = object()
+# lookup tables by (handler, width), shared by every plan of the process, the oldest first,
+# None if the results are mutable
+TABLES: dict[tuple, Optional[tuple]] = {}
+# most entries of all the lookup tables, the oldest are dropped past it, plans keep the ones they use
+TABLES_CAP = 1 << 20
+
+
+def shared(key: tuple, size: int, build: Callable[[], tuple]) -> Optional[tuple]:
+    """
+    lookup table of key built once for the process,
+    None if a result is not hashable, e.g. a dict, every frame would get the same object
+    """
+    if key in TABLES:
+        return TABLES[key]
+    table = build()
+    try:
+        hash(table)
+    except TypeError:
+        table = None
+    used = sum(len(x) for x in TABLES.values() if x is not None)
+    while TABLES and used + size > TABLES_CAP:
+        dropped = TABLES.pop(next(iter(TABLES)))
+        used -= len(dropped) if dropped is not None else 0
+    TABLES[key] = table
+    return table
+
+
+class Plan:
+    """
+    specification with every dispatch decided ahead of time,
+    it is a drop-in replacement of Specification in parse()
+    """
+    def __init__(
+            self,
+            spec: Specification,
+            op: Op,
+            where: Optional[Filter] = None,
+            slots: tuple[int, ...] = (),
+            mark: Optional[int] = None
+    ):
+        """
+        where is the filter checked by op, with the slots of its fields,
+        mark is the slot set in the symbols of a frame the filter matched while parsing, see Filter.count()
+        """
+        self.spec = spec
+        self.op = op
+        self.where = where
+        self.slots = slots
+        self.mark = mark
+
+    def parse(
+            self,
+            raw: Sequence,
+            parent: Optional[Field] = None,
+            start: int = 0,
+            stop: Optional[int] = None
+    ) -> Field:
+        if stop is None:
+            stop = len(raw)
+        return self.op(raw, start, stop, parent, self.spec.name)
+
+
+def compile(
+        spec: Specification,
+        *,
+        lazy: bool = False,
+        table_budget: int = 1 << 18,
+        lru_size: int = 0,
+        fields: Optional[Iterable[str]] = None,
+        where: Optional[Filter] = None,
+        profile: Optional[Profile] = None
+) -> Plan:
+    """
+    compile the specification once, then parse many times
+    :param spec: loaded specification
+    :param lazy: run leaf handlers on first access of Field.value,
+        except for the fields others depend on
+    :param table_budget: most entries of the lookup tables of pure handlers on 1 or 2 bytes, 0 to disable
+    :param lru_size: results cached for each pure handler on wider fixed length fields, 0 to disable,
+        only worth it for costly handlers on repeated values
+    :param fields: dotted paths of the only fields to parse, see required()
+    :param where: frames not matching it are aborted with Rejected as early as possible
+    :param profile: time each field and handler into it, the plan is compiled from an instrumented copy of spec
+        ignoring lazy, table_budget and lru_size, see structed.profile
+    """
+    if profile is not None:
+        spec = profile.instrument(spec)
+    elif where is not None and any(find_path(spec, x).slot is None for x in where.paths):
+        # the fields of the filter are given slots in a copy, the loaded specification is shared by other plans
+        spec = spec.copy()
+    keep = None
+    if fields is not None:
+        keep = required(spec, [*fields, *(where.paths if where is not None else ())])
+    if profile is not None:
+        from structed.profile import Profiler  # profile depends on this module
+        compiler = Profiler(profile, keep=keep)
+    else:
+        compiler = Compiler(lazy=lazy, table_budget=table_budget, lru_size=lru_size, keep=keep)
+    slots = compiler.watch(spec, where) if where is not None else ()
+    return Plan(spec, compiler.op(spec), where, slots, compiler.mark)
+
+
+def project(spec: Specification, fields: Iterable[str]) -> Plan:
+    """plan parsing only the given fields, compiled once for each set of fields of spec"""
+    key = frozenset(fields)
+    if key not in spec.projections:
+        spec.projections[key] = compile(spec, fields=key)
+    return spec.projections[key]
+
+
+def find_path(spec: Specification, path: str) -> Specification:
+    """
+    field at a dotted path from the root, e.g. header.type,
+    a structural variable is named with or without its prefix, e.g. items.tag
+    """
+    node = spec
+    for name in path.split("."):
+        for cs in node.children:
+            cs: Specification
+            if cs.name == name or (cs.is_structural_variable and unwrap(cs.name) == name):
+                node = cs
+                break
+        else:
+            raise SpecParseError(f"Field '{path}' not found in specification '{spec.name}'.")
+    return node
+
+
+def required(spec: Specification, fields: Iterable[str]) -> frozenset[Specification]:
+    """
+    the fields to parse for the given paths: their subtrees and ancestors,
+    and the fields they depend on transitively, including the ones needed to skip over the others
+    """
+    targets = {}
+    leaves: dict[str, list[Specification]] = {}
+
+    def preorder(s: Specification):
+        if s.slot is not None:
+            targets[s.slot] = s
+        if s.is_leaf:
+            leaves.setdefault(s.name, []).append(s)
+        for c in s.children:
+            preorder(c)
+    preorder(spec)
+
+    def dependencies(*props: Any) -> list[Specification]:
+        result = []
+        for dependency in props:
+            if isinstance(dependency, Dependency):
+                if dependency.slots is None:
+                    # looked up by name while parsing, see bind(), every leaf of that name is kept
+                    result += [x for name in dependency.args for x in leaves.get(name, ())]
+                else:
+                    result += [targets[x] for x in dependency.slots]
+        return result
+
+    def extent(s: Specification) -> list[Specification]:
+        """what skipping over s depends on"""
+        result = dependencies(s.size) if s.is_structural_variable else []
+        if isinstance(s.length, int):
+            return result
+        elif isinstance(s.length, Dependency):
+            return result + dependencies(s.length)
+        elif s.length is LenPolicy.auto:
+            return result + dependencies(s.switch) + [x for c in s.children for x in extent(c)]
+        # parsed to be skipped over
+        return result + [
+            x for c in (s, *s.children) for x in dependencies(c.length, c.size, c.handler, c.switch)
+        ]
+
+    keep = {spec}
+    expanded = set()
+    pending = [find_path(spec, path) for path in fields] + dependencies(spec.length, spec.size, spec.switch)
+    while True:
+        while pending:
+            s = pending.pop()
+            if s in expanded:
+                continue
+            subtree = [s]
+            while subtree:
+                d = subtree.pop()
+                expanded.add(d)
+                keep.add(d)
+                pending += dependencies(d.length, d.size, d.handler, d.switch)
+                subtree += [c for c in d.children if c not in expanded]
+            while s.parent is not None:
+                s = s.parent
+                if s not in keep:
+                    keep.add(s)
+                    pending += dependencies(s.length, s.size, s.switch)
+        # the skipped children of the kept fields, until nothing more is needed
+        pending = [x for k in keep for c in walked(k, keep) for x in extent(c) if x not in expanded]
+        if not pending:
+            return frozenset(keep)
+
+
+def walked(spec: Specification, keep: Iterable[Specification]) -> list[Specification]:
+    """
+    the skipped children of a kept field to skip over one by one,
+    the ones after the last kept child of a field of known length are not
+    """
+    skipped = [c for c in spec.children if c not in keep]
+    if not skipped or not isinstance(spec.length, int | Dependency):
+        return skipped
+    kept = [i for i, c in enumerate(spec.children) if c in keep]
+    if spec.switch is not None or not kept:
+        return []
+    return [c for c in spec.children[:kept[-1]] if c not in keep]
+
+
+class Compiler:
+    """every option is decided here, so the ops never check them per frame"""
+    # widths of the fields cached by lru instead of lookup table
+    LRU_WIDTHS = range(3, 9)
+
+    def __init__(
+            self,
+            *,
+            lazy: bool = False,
+            table_budget: int = 0,
+            lru_size: int = 0,
+            keep: Optional[frozenset[Specification]] = None
+    ):
+        """keep is the only fields to parse, the others are skipped over, None for all"""
+        self.lazy = lazy
+        self.keep = keep
+        # the guard step is run right after the anchor is parsed, see watch()
+        self.anchor: Optional[Specification] = None
+        self.guard: Optional[Step] = None
+        self.mark: Optional[int] = None
+        self.table_budget = table_budget
+        self.lru_size = lru_size
+        self.tables: dict[tuple, Optional[tuple]] = {}  # used by this plan
+        self.lrus: dict[Callable, Callable] = {}
+
+    def watch(self, spec: Specification, where: Filter) -> tuple[int, ...]:
+        """
+        abort a frame with Rejected as soon as all the fields of the filter are parsed and it does not match,
+        otherwise mark it with a slot of its own.
+        The fields are given slots if they have none, so compile() passes a copy of a shared specification,
+        returns the slots.
+        """
+        order = []
+
+        def preorder(s: Specification):
+            order.append(s)
+            for c in s.children:
+                preorder(c)
+        preorder(spec)
+
+        targets = [find_path(spec, path) for path in where.paths]
+        for target in targets:
+            if not target.is_leaf:
+                raise SpecParseError(f"Field '{target.name}' of a filter should be a leaf.")
+            s = target
+            while s is not spec:
+                if s.is_structural_variable:
+                    raise SpecParseError(f"Field '{target.name}' of a filter should not be in a structural variable.")
+                s = s.parent
+        for target in targets:
+            if target.slot is None:
+                target.slot = 1 + max((x.slot for x in order if x.slot is not None), default=-1)
+        slots = tuple(x.slot for x in targets)
+        mark = 1 + max(x.slot for x in order if x.slot is not None)
+
+        anchor = max(targets, key=order.index)
+        if anchor.bits is not None:
+            anchor = anchor.parent  # bit-fields are parsed with their word
+
+        def guard(raw: Sequence, used: int, stop: int, field: Field) -> int:
+            if not where.matches(field.symbols, slots):
+                raise Rejected(where)
+            field.symbols[mark] = True
+            return used
+        self.anchor = anchor
+        self.guard = guard
+        self.mark = mark
+        return slots
+
+    def op(self, spec: Specification) -> Op:
+        if spec.is_structural_variable:
+            return self.structural(spec)
+        return self.length(spec)
+
+    def length(self, spec: Specification) -> Op:
+        """dispatch according to type of spec.length, size is ignored"""
+        if isinstance(spec.length, int):
+            return self.fixed(spec, spec.length)
+        elif isinstance(spec.length, Dependency):
+            return self.dependency(spec)
+        elif spec.length is LenPolicy.auto:
+            return self.auto(spec)
+        else:
+            return self.fallback(spec)
+
+    def is_lazy(self, spec: Specification) -> bool:
+        """no other field depends on the value of spec"""
+        return self.lazy and spec.is_leaf and spec.slot is None
+
+    @staticmethod
+    def value(spec: Specification) -> Callable[[Sequence, Optional[Field]], Any]:
+        """same as Specification.parse_value"""
+        handler = spec.handler
+        if not spec.is_leaf:
+            return lambda raw, pf: None
+        elif isinstance(handler, Callable):
+            return lambda raw, pf: handler(raw)
+        elif isinstance(handler, Dependency):
+            return lambda raw, pf: pf.handle_dependency(handler)(raw)
+        else:
+            return lambda raw, pf: None
+
+    @staticmethod
+    def pending(spec: Specification) -> Callable[[Optional[Field]], Optional[Callable]]:
+        """handler to run later, with dependencies bound while they are at hand"""
+        handler = spec.handler
+        if isinstance(handler, Callable):
+            return lambda pf: handler
+        elif isinstance(handler, Dependency):
+            return lambda pf: pf.handle_dependency(handler)
+        else:
+            return lambda pf: None
+
+    @staticmethod
+    def is_pure(spec: Specification) -> bool:
+        return spec.is_leaf \
+            and isinstance(spec.length, int) \
+            and isinstance(spec.handler, Callable) \
+            and getattr(spec.handler, "pure", False)
+
+    def table(self, spec: Specification) -> Optional[tuple]:
+        """results of a pure handler for every input of 1 or 2 bytes, shared by fields of the same width"""
+        if not self.is_pure(spec) or spec.length not in (1, 2):
+            return None
+        key = spec.handler, spec.length
+        if key not in self.tables:
+            size = 1 << (8 * spec.length)
+            if size > self.table_budget:
+                self.tables[key] = None
+            else:
+                self.tables[key] = shared(key, size, lambda: tuple(
+                    self.evaluate(spec.handler, i.to_bytes(spec.length, "big")) for i in range(size)
+                ))
+                if self.tables[key] is not None:
+                    self.table_budget -= size
+        return self.tables[key]
+
+    @staticmethod
+    def evaluate(handler: Callable, raw: bytes) -> Any:
+        try:
+            return handler(raw)
+        except Exception:
+            return MISSING  # raise again when met while parsing
+
+    def cached(self, spec: Specification) -> Optional[Callable]:
+        """pure handler of a wider field behind an lru cache"""
+        if not self.is_pure(spec) or spec.length not in self.LRU_WIDTHS or self.lru_size <= 0:
+            return None
+        handler = spec.handler
+        if handler not in self.lrus:
+            cache = lru_cache(self.lru_size)(handler)
+            # memoryview of a bytearray is not hashable
+            self.lrus[handler] = lambda x: cache(x if type(x) is bytes else bytes(x))
+        return self.lrus[handler]
+
+    def decode(self, spec: Specification) -> Decode:
+        """value of a leaf, by lookup table if possible"""
+        value = self.value(spec)
+        table = self.table(spec)
+        cached = self.cached(spec)
+        if table is not None and spec.length == 1:
+            def decode(raw: Sequence, start: int, stop: int, pf: Optional[Field]) -> Any:
+                if stop - start == 1:
+                    v = table[raw[start]]
+                    if v is not MISSING:
+                        return v
+                return value(raw[start:stop], pf)
+            return decode
+        elif table is not None:
+            def decode(raw: Sequence, start: int, stop: int, pf: Optional[Field]) -> Any:
+                if stop - start == 2:
+                    v = table[raw[start] << 8 | raw[start + 1]]
+                    if v is not MISSING:
+                        return v
+                return value(raw[start:stop], pf)
+            return decode
+        elif cached is not None:
+            return lambda raw, start, stop, pf: cached(raw[start:stop])
+        return lambda raw, start, stop, pf: value(raw[start:stop], pf)
+
+    def sized(self, spec: Specification) -> Op:
+        """parse a field whose stop is already decided"""
+        slot = spec.slot
+        if self.is_lazy(spec):
+            pending = self.pending(spec)
+
+            def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+                try:
+                    return Field(name, raw, None, parent, None, start=start, stop=stop, pending=pending(parent))
+                except Exception as e:
+                    locate(e, parent, name, start)
+                    raise
+            return op
+        elif spec.is_leaf and slot is None:
+            decode = self.decode(spec)
+
+            def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+                try:
+                    return Field(name, raw, decode(raw, start, stop, parent), parent, None, start=start, stop=stop)
+                except Exception as e:
+                    locate(e, parent, name, start, "handler")
+                    raise
+            return op
+        elif spec.is_leaf:
+            decode = self.decode(spec)
+
+            def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+                try:
+                    v = decode(raw, start, stop, parent)
+                except Exception as e:
+                    locate(e, parent, name, start, "handler")
+                    raise
+                parent.symbols[slot] = v
+                return Field(name, raw, v, parent, None, start=start, stop=stop)
+            return op
+        elif spec.is_bit_word:
+            return self.bits(spec)
+
+        steps = self.children(spec)
+
+        def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+            field = Field(name, raw, None, parent, None, start=start, stop=stop)
+            field.children = []
+            used = start
+            try:
+                for step in steps:
+                    used = step(raw, used, stop, field)
+            except Exception as e:
+                locate(e, parent, name, start)
+                raise
+            field.children = tuple(field.children)
+            if used < stop:
+                logger.warning("child fields does not used all bytes of field '%s'.", name)
+            return field
+        return op
+
+    def bit_table(self, spec: Specification) -> Optional[tuple]:
+        """values of all the bit-fields for every word of 1 or 2 bytes, if their handlers are pure"""
+        if spec.length not in (1, 2) or not all(
+                cs.handler is None or (isinstance(cs.handler, Callable) and getattr(cs.handler, "pure", False))
+                for cs in spec.children
+        ):
+            return None
+        key = tuple((cs.handler, shift, mask) for cs, shift, mask in spec.bit_layout), spec.length
+        if key not in self.tables:
+            size = 1 << (8 * spec.length)
+            if size > self.table_budget:
+                self.tables[key] = None
+            else:
+                self.tables[key] = shared(key, size, lambda: tuple(
+                    self.evaluate(lambda w: tuple(
+                        (w >> shift) & mask if handler is None else handler((w >> shift) & mask)
+                        for handler, shift, mask in key[0]
+                    ), i) for i in range(size)
+                ))
+                if self.tables[key] is not None:
+                    self.table_budget -= size
+        return self.tables[key]
+
+    def bits(self, spec: Specification) -> Op:
+        """all the bit-fields of a word at once, with precomputed shifts and masks"""
+        layout = tuple((cs.name, shift, mask, cs.slot, cs.parse_bits) for cs, shift, mask in spec.bit_layout)
+        length = spec.length
+        table = self.bit_table(spec)
+
+        def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+            field = Field(name, raw, None, parent, None, start=start, stop=stop)
+            values = MISSING
+            if table is not None and stop - start == length:
+                values = table[raw[start] if length == 1 else raw[start] << 8 | raw[start + 1]]
+            children = []
+            if values is not MISSING:
+                for (cname, _, _, slot, _), v in zip(layout, values):
+                    if slot is not None:
+                        field.symbols[slot] = v
+                    children.append(Field(cname, raw, v, field, None, start=start, stop=stop))
+            else:
+                # a truncated word is read as if the missing bytes were zeros
+                word = int.from_bytes(raw[start:stop], "big") << 8 * (length - (stop - start))
+                try:
+                    for cname, shift, mask, slot, value in layout:
+                        v = value((word >> shift) & mask, field)
+                        if slot is not None:
+                            field.symbols[slot] = v
+                        children.append(Field(cname, raw, v, field, None, start=start, stop=stop))
+                except Exception as e:
+                    locate(e, field, layout[len(children)][0], start, "handler")
+                    raise
+            field.add_children(*children)
+            return field
+        return op
+
+    def fixed(self, spec: Specification, length: int) -> Op:
+        sized = self.sized(spec)
+
+        def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+            return sized(raw, start, min(start + length, stop), parent, name)
+        return op
+
+    def dependency(self, spec: Specification) -> Op:
+        sized = self.sized(spec)
+        dependency = spec.length
+
+        def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+            try:
+                length = call(parent.handle_dependency(dependency))
+            except Exception as e:
+                locate(e, parent, name, start)
+                raise
+            if isinstance(length, int):
+                return sized(raw, start, min(start + length, stop), parent, name)
+            # a policy decided at runtime, leave it to the specification
+            return spec.template(name, length, None).parse(raw, parent, start, stop)
+        return op
+
+    def auto(self, spec: Specification) -> Op:
+        value = self.value(spec)
+        slot = spec.slot
+        steps = self.children(spec)
+
+        def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+            field = Field(name, b"", None, parent, None, is_virtual=True)
+            field.children = []
+            used = start
+            try:
+                for step in steps:
+                    used = step(raw, used, stop, field)
+                field.children = tuple(field.children)
+            except Exception as e:
+                locate(e, parent, name, start)
+                raise
+            try:
+                v = value(raw[start:used], parent)
+            except Exception as e:
+                locate(e, parent, name, start, "handler")
+                raise
+            return field.actualize(raw, v, start, used).record(slot)
+        return op
+
+    def structural(self, spec: Specification) -> Op:
+        if spec.is_fixed_element and not self.lazy:
+            return self.elements(spec)
+        element = self.length(spec)
+        base = unwrap(spec.name)
+        size = spec.size
+
+        if isinstance(size, Dependency):
+            def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+                virtual = Field(name, None, None, parent, None, is_virtual=True)
+                virtual.children = children = []
+                used = start
+                try:
+                    for i in range(call(virtual.handle_dependency(size))):
+                        cf = element(raw, used, stop, virtual, f"{base}[{i}]")
+                        used += cf.length
+                        children.append(cf)
+                except Exception as e:
+                    locate(e, parent, name, start)
+                    raise
+                virtual.children = tuple(children)
+                return virtual.set_virtual_length(used - start)
+            return op
+        elif size is SizePolicy.greedy:
+            def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+                virtual = Field(name, None, None, parent, None, is_virtual=True)
+                virtual.children = children = []
+                used = start
+                try:
+                    while used < stop:
+                        cf = element(raw, used, stop, virtual, f"{base}[{len(children)}]")
+                        used += cf.length
+                        children.append(cf)
+                except Exception as e:
+                    locate(e, parent, name, start)
+                    raise
+                virtual.children = tuple(children)
+                return virtual.set_virtual_length(used - start)
+            return op
+        else:
+            return lambda raw, start, stop, parent, name: spec.parse(raw, parent, start, stop)
+
+    @staticmethod
+    def elements(spec: Specification) -> Op:
+        """an array of fixed length leaves in one loop, see Specification.parse_elements"""
+        size = spec.size
+        if isinstance(size, Dependency):
+            def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+                virtual = Field(name, None, None, parent, None, is_virtual=True)
+                try:
+                    return spec.parse_elements(raw, start, stop, virtual, call(virtual.handle_dependency(size)))
+                except Exception as e:
+                    locate(e, parent, name, start)
+                    raise
+            return op
+        elif size is SizePolicy.greedy:
+            def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+                virtual = Field(name, None, None, parent, None, is_virtual=True)
+                try:
+                    return spec.parse_elements(raw, start, stop, virtual, None)
+                except Exception as e:
+                    locate(e, parent, name, start)
+                    raise
+            return op
+        return lambda raw, start, stop, parent, name: spec.parse(raw, parent, start, stop)
+
+    @staticmethod
+    def fallback(spec: Specification) -> Op:
+        """nothing to precompute, use the specification itself"""
+        def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+            return spec.template(name, spec.length, None).parse(raw, parent, start, stop)
+        return op
+
+    @staticmethod
+    def is_plain_leaf(spec: Specification) -> bool:
+        """fixed length leaf which does not look at other fields"""
+        return spec.is_leaf \
+            and not spec.is_structural_variable \
+            and isinstance(spec.length, int) \
+            and not isinstance(spec.handler, Dependency)
+
+    def children(self, spec: Specification) -> tuple[Step, ...]:
+        """consecutive plain leaves are merged into one step, so are consecutive skipped fields"""
+        if spec.switch is not None:
+            return self.union(spec),
+        steps = []
+        run = []
+        skipped = []
+
+        def flush_run():
+            if run:
+                steps.append(self.run(run))
+                if self.anchor in run:
+                    steps.append(self.guard)
+                run.clear()
+
+        for cs in spec.children:
+            cs: Specification
+            if self.keep is not None and cs not in self.keep:
+                flush_run()
+                skipped.append(cs)
+                continue
+            if skipped:
+                steps.append(self.gap(skipped))
+                skipped = []
+            if self.is_plain_leaf(cs):
+                run.append(cs)
+                continue
+            flush_run()
+            steps.append(self.step(cs))
+            if cs is self.anchor:
+                steps.append(self.guard)
+        flush_run()
+        if skipped and isinstance(spec.length, int | Dependency):
+            # the end is already known
+            steps.append(lambda raw, used, stop, field: stop)
+        elif skipped:
+            steps.append(self.gap(skipped))
+        return tuple(steps)
+
+    def union(self, spec: Specification) -> Step:
+        """parse the child chosen by the discriminator, each case is compiled once"""
+        branches = {}
+        for cs in spec.children:
+            cs: Specification
+            if self.keep is None or cs in self.keep:
+                branches[id(cs)] = self.step(cs)
+            elif isinstance(spec.length, int | Dependency):
+                branches[id(cs)] = lambda raw, used, stop, field: stop
+            else:
+                branches[id(cs)] = self.gap([cs])
+
+        def step(raw: Sequence, used: int, stop: int, field: Field) -> int:
+            return branches[id(spec.case(field))](raw, used, stop, field)
+        return step
+
+    def gap(self, specs: list[Specification]) -> Step:
+        """skip over fields without creating them or running their handlers"""
+        if all(isinstance(cs.length, int) and not cs.is_structural_variable for cs in specs):
+            total = sum(cs.length for cs in specs)
+            return lambda raw, used, stop, field: min(used + total, stop)
+        skips = tuple(self.skip(cs) for cs in specs)
+
+        def step(raw: Sequence, used: int, stop: int, field: Field) -> int:
+            for skip in skips:
+                used = skip(raw, used, stop, field)
+            return used
+        return step
+
+    def skip(self, spec: Specification) -> Skip:
+        """end of a field, only the fields its length depends on are looked at"""
+        if not spec.is_structural_variable:
+            return self.skip_length(spec)
+        element = self.skip_length(spec)
+        size = spec.size
+        if isinstance(size, Dependency):
+            def skip(raw: Sequence, start: int, stop: int, pf: Field) -> int:
+                for _ in range(call(pf.handle_dependency(size))):
+                    start = element(raw, start, stop, pf)
+                return start
+            return skip
+        elif size is SizePolicy.greedy:
+            def skip(raw: Sequence, start: int, stop: int, pf: Field) -> int:
+                while start < stop:
+                    start = element(raw, start, stop, pf)
+                return start
+            return skip
+        return lambda raw, start, stop, pf: start + spec.parse(raw, pf, start, stop).length
+
+    def skip_length(self, spec: Specification) -> Skip:
+        """end of a field according to its length, size is ignored"""
+        length = spec.length
+        if isinstance(length, int):
+            return lambda raw, start, stop, pf: min(start + length, stop)
+        elif isinstance(length, Dependency):
+            def skip(raw: Sequence, start: int, stop: int, pf: Field) -> int:
+                n = call(pf.handle_dependency(length))
+                if isinstance(n, int):
+                    return min(start + n, stop)
+                return start + spec.template(spec.name, n, None).parse(raw, pf, start, stop).length
+            return skip
+        elif length is LenPolicy.auto and spec.switch is not None:
+            branches = {id(cs): self.skip(cs) for cs in spec.children}
+            return lambda raw, start, stop, pf: branches[id(spec.case(pf))](raw, start, stop, pf)
+        elif length is LenPolicy.auto:
+            skips = tuple(self.skip(cs) for cs in spec.children)
+
+            def skip(raw: Sequence, start: int, stop: int, pf: Field) -> int:
+                for s in skips:
+                    start = s(raw, start, stop, pf)
+                return start
+            return skip
+        return lambda raw, start, stop, pf: start + spec.template(spec.name, length, None).parse(
+            raw, pf, start, stop
+        ).length
+
+    def step(self, spec: Specification) -> Step:
+        op = self.op(spec)
+        name = spec.name
+
+        def step(raw: Sequence, used: int, stop: int, field: Field) -> int:
+            cf = op(raw, used, stop, field, name)
+            field.add_children(cf)
+            return used + cf.length
+        return step
+
+    def leaf(self, spec: Specification) -> Callable[[Sequence, int, int, Field], Field]:
+        """a plain leaf of a run from raw[a:b], specialized on whether it is lazy and has a lookup table"""
+        name = spec.name
+        handler = spec.handler if isinstance(spec.handler, Callable) else None
+        if self.is_lazy(spec):
+            return lambda raw, a, b, field: Field(name, raw, None, field, None, start=a, stop=b, pending=handler)
+        table = self.table(spec)
+        handler = self.cached(spec) or handler
+        if table is not None and spec.length == 1:
+            def leaf(raw: Sequence, a: int, b: int, field: Field) -> Field:
+                v = table[raw[a]] if b - a == 1 else MISSING
+                if v is MISSING:
+                    v = handler(raw[a:b])
+                return Field(name, raw, v, field, None, start=a, stop=b)
+            return leaf
+        elif table is not None:
+            def leaf(raw: Sequence, a: int, b: int, field: Field) -> Field:
+                v = table[raw[a] << 8 | raw[a + 1]] if b - a == 2 else MISSING
+                if v is MISSING:
+                    v = handler(raw[a:b])
+                return Field(name, raw, v, field, None, start=a, stop=b)
+            return leaf
+        elif handler is not None:
+            return lambda raw, a, b, field: Field(name, raw, handler(raw[a:b]), field, None, start=a, stop=b)
+        return lambda raw, a, b, field: Field(name, raw, None, field, None, start=a, stop=b)
+
+    def run(self, specs: list[Specification]) -> Step:
+        """plain leaves with precomputed offsets"""
+        layout = []
+        # (index, slot) of the leaves others depend on
+        slots = []
+        offset = 0
+        for i, cs in enumerate(specs):
+            layout.append((self.leaf(cs), cs.name, offset, offset + cs.length))
+            if cs.slot is not None:
+                slots.append((i, cs.slot))
+            offset += cs.length
+        layout = tuple(layout)
+        slots = tuple(slots)
+        total = offset
+
+        def step(raw: Sequence, used: int, stop: int, field: Field) -> int:
+            children = []
+            try:
+                # min() only matters for truncated raw, every leaf takes what is left
+                for leaf, _, a, b in layout:
+                    children.append(leaf(raw, min(used + a, stop), min(used + b, stop), field))
+            except Exception as e:
+                _, name, a, _ = layout[len(children)]
+                locate(e, field, name, min(used + a, stop), "handler")
+                raise
+            for i, slot in slots:
+                field.symbols[slot] = children[i].value
+            field.add_children(*children)
+            return min(used + total, stop)
+        return step
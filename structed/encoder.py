@@ -0,0 +1,299 @@
+"""
+encode values shaped like dict(field) into frames of the same specification
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Iterable
+import struct
+
+from structed import handler as builtin
+from structed.common import Dependency
+from structed.exception import FrameEncodeError
+from structed.field import Specification, UNPACK_FORMATS
+from structed.checksum import Check
+from structed.compiler import find_path
+
+# kinds of the pieces of a frame
+BYTES, INT, ZERO = range(3)
+PACK_FORMATS = {length: struct.Struct(f">{f}") for length, f in UNPACK_FORMATS.items()}
+
+# inverse of a handler, from its value to bytes
+inverses: dict[Callable, Callable[[Any], bytes]] = {
+    builtin.bytes2hex: bytes.fromhex,
+    builtin.identity: bytes,
+}
+
+
+def add_inverse_handler(handler: Callable, inverse: Callable[[Any], bytes]):
+    """encode the values of fields with this handler by inverse, bytes2int_b is built in"""
+    inverses[handler] = inverse
+
+
+class Draft:
+    """pieces of one frame, [kind, length, payload] each, and what is left to fill once they are known"""
+    def __init__(self):
+        self.pieces: list[list] = []
+        # values of the fields others depend on, given or derived
+        self.symbols: dict[int, Any] = {}
+        # pieces of the fields without value by slot, encoded once their value is derived
+        self.pending: dict[int, tuple[list, Specification]] = {}
+        self.checks: list[Check] = []
+        self.size = 0
+
+    def clear(self) -> Draft:
+        """reuse the draft for another frame"""
+        self.pieces.clear()
+        self.symbols.clear()
+        self.pending.clear()
+        self.checks.clear()
+        self.size = 0
+        return self
+
+    def add(self, kind: int, length: int, payload: Any) -> list:
+        piece = [kind, length, payload]
+        self.pieces.append(piece)
+        self.size += length
+        return piece
+
+
+class Encoder:
+    """
+    encode values with a loaded specification, values are shaped like dict(field) of a parsed frame.
+    A field missing from the value is derived if possible:
+    a length or a size, from the field or elements it is the length or the size of, if its dependency is "#",
+    the discriminator of a switch from the name of the case, a checksum from the frame, and a sync word.
+    """
+    def __init__(self, spec: Specification):
+        self.spec = spec
+        self.checks = {find_path(spec, c.path): c for c in spec.checks}
+
+    def draft(self, value: dict, d: Optional[Draft] = None) -> Draft:
+        """lay out a frame, lengths of every piece are known after it, into d if given"""
+        d = Draft() if d is None else d.clear()
+        self.lay(self.spec, value, d)
+        for _, spec in d.pending.values():
+            raise FrameEncodeError(f"No value of field '{spec.name}'.")
+        return d
+
+    def write(self, d: Draft, buffer: bytearray | memoryview, offset: int = 0) -> int:
+        """write a drafted frame into buffer at offset, return its length"""
+        used = offset
+        for kind, length, payload in d.pieces:
+            if kind == INT:
+                if length in PACK_FORMATS:
+                    PACK_FORMATS[length].pack_into(buffer, used, payload)
+                else:
+                    buffer[used:used + length] = payload.to_bytes(length, "big")
+            elif kind == BYTES:
+                buffer[used:used + length] = payload
+            else:
+                buffer[used:used + length] = bytes(length)
+            used += length
+        if d.checks:
+            frame = memoryview(buffer)[offset:used]
+            for c in d.checks:
+                c.fill(frame)
+        return used - offset
+
+    def lay(self, spec: Specification, value: Any, d: Draft) -> int:
+        """add the pieces of a field, return its length"""
+        if spec.is_structural_variable:
+            return self.elements(spec, value, d)
+        size = d.size
+        if spec.is_leaf:
+            length = self.length(spec, d)
+            piece = self.leaf(spec, value, length)
+            d.add(*piece)
+            if spec.slot is not None:
+                d.symbols[spec.slot] = value
+        elif spec.is_bit_word:
+            d.add(INT, spec.length, self.bits(spec, value, d))
+        else:
+            if not isinstance(value, dict):
+                raise FrameEncodeError(f"Value of field '{spec.name}' should be a dict: {value!r}.")
+            length = self.length(spec, d)
+            if spec.switch is not None:
+                self.union(spec, value, d)
+            else:
+                for cs in spec.children:
+                    cs: Specification
+                    if cs.name in value:
+                        self.lay(cs, value[cs.name], d)
+                    else:
+                        self.missing(cs, d)
+            if length is not None and d.size - size < length:
+                d.add(ZERO, length - (d.size - size), None)
+            elif length is not None and d.size - size > length:
+                raise FrameEncodeError(f"Field '{spec.name}' is longer than its {length} bytes.")
+        self.derive(spec.length, d.size - size, d)
+        return d.size - size
+
+    def missing(self, spec: Specification, d: Draft):
+        """a field without value, filled later if it is a checksum or others depend on it"""
+        if spec in self.checks:
+            d.add(ZERO, spec.length, None)
+            d.checks.append(self.checks[spec])
+        elif spec.sync is not None:
+            d.add(BYTES, spec.length, spec.sync)
+        elif spec.slot is not None and spec.is_leaf and isinstance(spec.length, int):
+            # the value of a previous element is not the value of this one
+            d.symbols.pop(spec.slot, None)
+            d.pending[spec.slot] = (d.add(ZERO, spec.length, None), spec)
+        elif spec.is_structural_variable:
+            self.elements(spec, None, d)
+        elif not spec.is_leaf:
+            self.lay(spec, {}, d)
+        else:
+            raise FrameEncodeError(f"No value of field '{spec.name}'.")
+
+    @staticmethod
+    def length(spec: Specification, d: Draft) -> Optional[int]:
+        """length the field should have, None if it is as long as its value"""
+        if isinstance(spec.length, int):
+            return spec.length
+        if isinstance(spec.length, Dependency) and spec.length.slots is not None:
+            try:
+                return spec.length.handler(*(d.symbols[x] for x in spec.length.slots))
+            except KeyError:
+                return None  # derived from the value
+        return None
+
+    def derive(self, dependency: Any, value: Any, d: Draft):
+        """give a value to the field a dependency refers to, if it has none and the dependency is "#" """
+        if isinstance(dependency, Dependency) \
+                and dependency.handler is builtin.identity \
+                and dependency.slots is not None \
+                and len(dependency.slots) == 1 \
+                and dependency.slots[0] not in d.symbols:
+            slot = dependency.slots[0]
+            d.symbols[slot] = value
+            if slot in d.pending:
+                piece, spec = d.pending.pop(slot)
+                piece[:] = self.leaf(spec, value, spec.length)
+
+    @staticmethod
+    def leaf(spec: Specification, value: Any, length: Optional[int]) -> list:
+        """[kind, length, payload] of the value of a leaf"""
+        if isinstance(value, bytes | bytearray | memoryview):
+            payload = value
+        elif spec.handler is builtin.bytes2int_b:
+            if not isinstance(value, int) or value < 0:
+                raise FrameEncodeError(f"Value of field '{spec.name}' should be an unsigned int: {value!r}.")
+            if length is None:
+                length = max(1, -(-value.bit_length() // 8))
+            if value.bit_length() > 8 * length:
+                raise FrameEncodeError(f"Value of field '{spec.name}' does not fit in {length} bytes: {value}.")
+            return [INT, length, value]
+        elif value is None and spec.handler is None and length is not None:
+            return [ZERO, length, None]
+        elif spec.handler in inverses:
+            payload = inverses[spec.handler](value)
+        else:
+            raise FrameEncodeError(f"Cannot encode the value of field '{spec.name}' without its bytes: {value!r}.")
+        if length is not None and len(payload) != length:
+            raise FrameEncodeError(f"Field '{spec.name}' should have {length} bytes, not {len(payload)}.")
+        return [BYTES, len(payload), payload]
+
+    def bits(self, spec: Specification, value: Any, d: Draft) -> int:
+        """the word of bit-fields"""
+        if isinstance(value, int):
+            return value
+        word = 0
+        for cs, shift, mask in spec.bit_layout:
+            if cs.name not in value:
+                raise FrameEncodeError(f"No value of bit-field '{cs.name}'.")
+            v = value[cs.name]
+            if cs.slot is not None:
+                d.symbols[cs.slot] = v
+            if not isinstance(v, int):
+                if cs.handler not in inverses:
+                    raise FrameEncodeError(f"Cannot encode the value of bit-field '{cs.name}': {v!r}.")
+                v = int.from_bytes(inverses[cs.handler](v), "big")
+            if not 0 <= v <= mask:
+                raise FrameEncodeError(f"Value of bit-field '{cs.name}' does not fit in {cs.bits} bits: {v}.")
+            word |= v << shift
+        return word
+
+    def union(self, spec: Specification, value: dict, d: Draft):
+        """the case named by the only key of value"""
+        if len(value) != 1:
+            raise FrameEncodeError(f"Value of switch '{spec.name}' should have one case: {list(value)}.")
+        (name, v), = value.items()
+        case = next((cs for cs in spec.children if cs.name == name), None)
+        if case is None:
+            raise FrameEncodeError(f"No case '{name}' of switch '{spec.name}'.")
+        try:
+            discriminator = int(name, 0)
+        except ValueError:
+            discriminator = name
+        self.derive(spec.switch, discriminator, d)
+        self.lay(case, v, d)
+
+    def elements(self, spec: Specification, value: Any, d: Draft) -> int:
+        """a structural variable, value is a dict of its elements, a list of them, or None if there are none"""
+        if value is None:
+            value = ()
+        elif isinstance(value, dict):
+            value = value.values()
+        size = d.size
+        count = 0
+        element = spec.element
+        for v in value:
+            self.lay(element, v, d)
+            count += 1
+        self.derive(spec.size, count, d)
+        return d.size - size
+
+    def encode(self, value: dict) -> bytes:
+        d = self.draft(value)
+        buffer = bytearray(d.size)
+        self.write(d, buffer)
+        return bytes(buffer)
+
+
+def encoder_of(scaffold: Specification | Encoder) -> Encoder:
+    return scaffold if isinstance(scaffold, Encoder) else Encoder(scaffold)
+
+
+def encode(scaffold: Specification | Encoder, value: dict) -> bytes:
+    """the frame parsed into value, parse(spec, encode(spec, value)) gives value back"""
+    return encoder_of(scaffold).encode(value)
+
+
+def encode_into(
+        scaffold: Specification | Encoder,
+        value: dict,
+        buffer: bytearray | memoryview,
+        offset: int = 0
+) -> int:
+    """write the frame into a preallocated buffer at offset, return its length"""
+    encoder = encoder_of(scaffold)
+    d = encoder.draft(value)
+    if offset + d.size > len(buffer):
+        raise FrameEncodeError(f"Frame of {d.size} bytes does not fit in the buffer at {offset}.")
+    return encoder.write(d, buffer, offset)
+
+
+def encode_many(
+        scaffold: Specification | Encoder,
+        values: Iterable[dict]
+) -> tuple[bytearray, list[int]]:
+    """
+    pack the frames of many values one after another in a single buffer,
+    each frame is laid out in the same draft and written at once, the buffer grows by doubling
+    :return: the buffer and the offsets of the frames, with the end of the last one,
+        frame i is buffer[offsets[i]:offsets[i + 1]]
+    """
+    encoder = encoder_of(scaffold)
+    d = Draft()
+    buffer = bytearray()
+    offsets = [0]
+    for value in values:
+        encoder.draft(value, d)
+        used = offsets[-1]
+        if used + d.size > len(buffer):
+            buffer.extend(bytes(max(used + d.size, 2 * len(buffer)) - len(buffer)))
+        offsets.append(used + encoder.write(d, buffer, used))
+    del buffer[offsets[-1]:]
+    return buffer, offsets
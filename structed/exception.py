@@ -1,8 +1,69 @@
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Any
+
+
 class SpecParseError(Exception):
     def __init__(self, *args):
         super().__init__(*args)
 
 
 class FrameParseError(Exception):
+    def __init__(self, *args, code: str = "malformed"):
+        """code is the kind of error, see structed.quarantine.Code"""
+        super().__init__(*args)
+        self.code = code
+
+
+class FrameEncodeError(Exception):
     def __init__(self, *args):
         super().__init__(*args)
+
+
+class Location:
+    """
+    innermost field being parsed when parsing a frame failed, recorded on the error by the engines, see locate().
+    parent is its partially parsed parent, a Field or a FieldView, None for the root
+    """
+    __slots__ = ("parent", "name", "offset", "code", "scope", "outer")
+
+    def __init__(self, parent: Any, name: str, offset: int, code: str):
+        self.parent = parent
+        self.name = name
+        self.offset = offset
+        self.code = code
+        # detached scope the field was parsed under and the parent it stands for,
+        # see frame.FrameCompiler.fallback()
+        self.scope: Any = None
+        self.outer: Any = None
+
+    @property
+    def path(self) -> str:
+        names = [self.name]
+        p = self.parent
+        while p is not None:
+            if p is self.scope:
+                p = self.outer
+                continue
+            names.append(p.name)
+            p = p.parent
+        return ".".join(reversed(names))
+
+
+def locate(error: Exception, parent: Any, name: str, offset: int, code: str = "malformed"):
+    """
+    called by the op of each field an error goes through, only the innermost is kept in error.parse_location.
+    The ops catch the error in a try statement, so parsing a good frame pays nothing for it.
+    code is the kind of error, see structed.quarantine.Code: the ops give "handler" where they catch it
+    around the call of a handler, or blame() it first, a FrameParseError has its own
+    """
+    if getattr(error, "parse_location", None) is None:
+        code = vars(error).pop("parse_code", code)
+        if isinstance(error, FrameParseError):
+            code = error.code
+        error.parse_location = Location(parent, name, offset, code)
+
+
+def blame(error: Exception, code: str):
+    """record the kind of error where it is caught by a step that leaves locating it to its op, see locate()"""
+    if getattr(error, "parse_location", None) is None:
+        error.parse_code = code
@@ -3,16 +3,29 @@ main datastructure: field and specification
 """
 
 from __future__ import annotations  # to allow forward references in type hint
-from typing import Optional, Callable, Any
-from collections.abc import Sequence, Iterator
+from typing import Optional, Callable, Any, TYPE_CHECKING
+from collections.abc import Sequence, Iterator, Iterable
 from functools import partial
+import logging
+import struct
 
-from structed import predefined
+from structed import predefined, handler as builtin
 from structed.common import LenPolicy, SizePolicy, Dependency, Tree
+from structed.exception import SpecParseError, FrameParseError, locate, blame
 from structed.predefined import check_and_get, unwrap
+from structed.checksum import Check, collect
+
+if TYPE_CHECKING:
+    from structed.compiler import Plan
+    from structed.profile import Profile
+
+logger = logging.getLogger(__name__)
 
 
 class Field(Tree):
+    # checks failed by the frame, set on its root by parse_many(..., verify=True)
+    failed_checks: tuple = ()
+
     def __init__(
             self,
             name: str,
@@ -22,17 +35,28 @@ class Field(Tree):
             children: Optional[Iterator[Field]],
             *,
             is_virtual: bool = False,
-            virtual_length: Optional[int] = None
+            virtual_length: Optional[int] = None,
+            start: int = 0,
+            stop: Optional[int] = None,
+            pending: Optional[Callable[[Sequence], Any]] = None
     ):
         """
         virtual is used in 2 situations:
         1. LenPolicy.auto, after parsing actualize() should be called.
         2. Structural variable.
+
+        raw is the whole buffer being parsed, the field only covers raw[start:stop].
+        If pending is given, value is pending(raw) computed on first access.
         """
         super().__init__(parent, children)
         self.name = name
-        self.raw = raw
-        self.value = value
+        # values of the fields others depend on, shared by the whole frame
+        self.symbols = parent.symbols if parent is not None else {}
+        self.buffer = raw
+        self.start = start
+        self.stop = len(raw) if stop is None and raw is not None else stop
+        self._value = value
+        self.pending = pending
         self.is_virtual = is_virtual
         self.virtual_length = virtual_length
 
@@ -45,12 +69,31 @@ class Field(Tree):
             if virtual_length is None:
                 self.virtual_length = 0
 
+    @property
+    def raw(self) -> Optional[Sequence]:
+        """sliced on demand, a view if the buffer is a memoryview"""
+        if self.buffer is None:
+            return None
+        return self.buffer[self.start:self.stop]
+
+    @property
+    def value(self) -> Any:
+        if self.pending is not None:
+            self._value = self.pending(self.raw)
+            self.pending = None
+        return self._value
+
+    @value.setter
+    def value(self, value: Any):
+        self._value = value
+        self.pending = None
+
     @property
     def length(self):
         if self.is_virtual:
             return self.virtual_length
         else:
-            return len(self.raw)
+            return self.stop - self.start
 
     def __iter__(self):
         for child in self.children:
@@ -73,15 +116,37 @@ class Field(Tree):
         return field.value
 
     def handle_dependency(self, dependency: Dependency) -> Callable:
+        if dependency.slots is not None:
+            try:
+                return partial(
+                    dependency.handler,
+                    *(self.symbols[x] for x in dependency.slots)
+                )
+            except KeyError:
+                pass  # not parsed in this frame, let get() search for it
         return partial(
             dependency.handler,
             *(self.get(x) for x in dependency.args)
         )
 
-    def actualize(self, raw: Sequence, value: Any) -> Field:
+    def record(self, slot: Optional[int]) -> Field:
+        """make the value available to dependencies"""
+        if slot is not None:
+            self.symbols[slot] = self.value
+        return self
+
+    def actualize(
+            self,
+            raw: Sequence,
+            value: Any,
+            start: int = 0,
+            stop: Optional[int] = None
+    ) -> Field:
         """to set values of a virtual field"""
         assert self.is_virtual
-        self.raw = raw
+        self.buffer = raw
+        self.start = start
+        self.stop = len(raw) if stop is None else stop
         self.value = value
         self.is_virtual = False
         return self
@@ -100,13 +165,39 @@ class Specification(Tree):
             size: Optional[SizePolicy | Dependency],
             handler: Optional[Callable | Dependency],
             parent: Optional[Specification],
-            children: Optional[Iterator[Specification]]
+            children: Optional[Iterator[Specification]],
+            *,
+            slot: Optional[int] = None,
+            bits: Optional[int] = None,
+            switch: Optional[Dependency] = None,
+            check: Optional[tuple[str, int, Optional[int]]] = None,
+            sync: Optional[bytes] = None
     ):
+        """
+        slot is set if other fields depend on this one, see bind().
+        bits is set for a bit-field, which is a child of a word of fixed length,
+        its value is the bits as int, or the result of handler on that int.
+        switch is set for a union, only the child named by its value is parsed, see cases.
+        check is (algorithm, start, stop) of a checksum stored in this field, see structed.checksum,
+        checks of the root are all of them.
+        sync is the constant bytes of a sync word or preamble, a leaf of the same length,
+        it is not checked by parse(), but by structed.resync.
+        """
         super().__init__(parent, children)
         self.name = name
         self.length = length
         self.size = size
         self.handler = handler
+        self.slot = slot
+        self.bits = bits
+        self.switch = switch
+        self.check = check
+        self.sync = sync
+        self.checks: tuple[Check, ...] = ()
+        self._cases: Optional[dict[Any, Specification]] = None
+        # compiled plans of projections, see compiler.project()
+        self.projections: dict[frozenset[str], Plan] = {}
+        self._element: Optional[Specification] = None
 
     @property
     def is_structural_variable(self) -> bool:
@@ -116,10 +207,129 @@ class Specification(Tree):
     def is_length_variable(self) -> bool:
         return not isinstance(self.size, int)
 
-    def structural_template(self, count: int) -> Specification:
-        """rename and erase the size policy"""
-        name = unwrap(self.name) + f"[{count}]"
-        return self.template(name, self.length, None)
+    @property
+    def cases(self) -> dict[Any, Specification]:
+        """
+        children of a union by the values of the discriminator,
+        a child named like an int is also found by the int, e.g. "0x01" by 1
+        """
+        if self._cases is None:
+            cases = {}
+            for cs in self.children:
+                cases[cs.name] = cs
+                try:
+                    cases.setdefault(int(cs.name, 0), cs)
+                except ValueError:
+                    pass
+            self._cases = cases
+        return self._cases
+
+    def case(self, pf: Field) -> Specification:
+        """the child of a union chosen by the discriminator"""
+        switch = pf.handle_dependency(self.switch)
+        try:
+            value = switch()
+        except Exception as e:
+            blame(e, "handler")
+            raise
+        try:
+            return self.cases[value]
+        except (KeyError, TypeError):
+            raise FrameParseError(f"No case of '{self.name}' for {value!r}.", code="case") from None
+
+    def active_children(self, pf: Field) -> tuple[Specification, ...]:
+        """children to parse, only one for a union"""
+        if self.switch is None:
+            return self.children
+        return self.case(pf),
+
+    @property
+    def is_bit_word(self) -> bool:
+        """a field of fixed length made of bit-fields"""
+        return not self.is_leaf and self.children[0].bits is not None
+
+    @property
+    def bit_layout(self) -> tuple[tuple[Specification, int, int], ...]:
+        """(bit-field, shift, mask) of each child, the first bit-field takes the most significant bits"""
+        layout = []
+        shift = 8 * self.length
+        for cs in self.children:
+            cs: Specification
+            shift -= cs.bits
+            layout.append((cs, shift, (1 << cs.bits) - 1))
+        return tuple(layout)
+
+    def parse_bits(self, bits: int, pf: Field) -> Any:
+        """value of a bit-field"""
+        if self.handler is None:
+            return bits
+        return self.parse_value(bits, pf)
+
+    @property
+    def element(self) -> Specification:
+        """template shared by all the elements of a structural variable, they are renamed after parsing"""
+        if self._element is None:
+            self._element = self.template(unwrap(self.name), self.length, None)
+        return self._element
+
+    @property
+    def is_fixed_element(self) -> bool:
+        """elements of a structural variable are independent leaves of fixed length"""
+        return self.is_structural_variable \
+            and self.is_leaf \
+            and isinstance(self.length, int) \
+            and self.length > 0 \
+            and not isinstance(self.handler, Dependency)
+
+    def parse_elements(
+            self, raw: Sequence, start: int, stop: int, virtual: Field, count: Optional[int]
+    ) -> Field:
+        """
+        parse count elements in one loop if is_fixed_element, as many as raw holds if count is None.
+        Values of the whole elements are unpacked at once if possible.
+        """
+        length = self.length
+        if count is None:
+            count = -(-(stop - start) // length)
+        count = max(count, 0)
+        whole = max(0, min(count, (stop - start) // length))
+        values = unpack(self.handler, raw, start, whole, length)
+        base = unwrap(self.name)
+        children = []
+        for i in range(count):
+            a = min(start + i * length, stop)
+            b = min(a + length, stop)
+            v = values[i] if i < whole else self.parse_value(raw[a:b], virtual)
+            children.append(Field(f"{base}[{i}]", raw, v, virtual, None, start=a, stop=b))
+        virtual.add_children(*children)
+        return virtual.set_virtual_length(min(start + count * length, stop) - start)
+
+    def parse_element(self, raw: Sequence, start: int, stop: int, virtual: Field, name: str) -> Field:
+        """parse an element with the shared template, then name it"""
+        try:
+            field = self.element.parse(raw, virtual, start, stop)
+        except Exception as e:
+            location = e.parse_location
+            # the element being parsed is named after parsing
+            if location.parent is virtual:
+                location.name = name
+            else:
+                p = location.parent
+                while p.parent is not virtual:
+                    p = p.parent
+                p.name = name
+            raise
+        field.name = name
+        return field
+
+    def copy(self, parent: Optional[Specification] = None) -> Specification:
+        """copy of the tree of this specification, sharing its handlers and dependencies"""
+        c = Specification(
+            self.name, self.length, self.size, self.handler, parent, None,
+            slot=self.slot, bits=self.bits, switch=self.switch, check=self.check, sync=self.sync
+        )
+        c.checks = self.checks
+        return c.add_children(*(x.copy(c) for x in self.children))
 
     def template(
             self,
@@ -128,7 +338,10 @@ class Specification(Tree):
             size: Optional[SizePolicy | Dependency]
     ) -> Specification:
         """intermediate message structure"""
-        return Specification(name, length, size, self.handler, self.parent, self.children)
+        return Specification(
+            name, length, size, self.handler, self.parent, self.children,
+            slot=self.slot, bits=self.bits, switch=self.switch, check=self.check, sync=self.sync
+        )
 
     def parse_value(self, raw: Sequence, pf: Field) -> Any:
         """
@@ -139,78 +352,135 @@ class Specification(Tree):
         """
         if self.is_leaf:
             if isinstance(self.handler, Callable):
-                return self.handler(raw)
+                handler = self.handler
             elif isinstance(self.handler, Dependency):
                 assert pf is not None
-                return pf.handle_dependency(self.handler)(raw)
+                handler = pf.handle_dependency(self.handler)
+            else:
+                return None
+            try:
+                return handler(raw)
+            except Exception as e:
+                blame(e, "handler")
+                raise
         else:
             return None
 
-    def parse(self, raw: Sequence, parent: Optional[Field] = None) -> Field:
-        # dealing with structural variability
-        if self.is_structural_variable:
-            return self.__parse_structural_variable(raw, parent)
-        else:
-            return self.__parse(raw, parent)
+    def parse(
+            self,
+            raw: Sequence,
+            parent: Optional[Field] = None,
+            start: int = 0,
+            stop: Optional[int] = None
+    ) -> Field:
+        """
+        parse raw[start:stop], raw is never sliced except for leaf handlers
+        :param raw: bytes, or memoryview to hand views to the handlers
+        :param parent: partially parsed parent field
+        :param start: offset of the field in raw
+        :param stop: end of the bytes available to the field
+        """
+        if stop is None:
+            stop = len(raw)
+        try:
+            # dealing with structural variability
+            if self.is_structural_variable:
+                return self.__parse_structural_variable(raw, start, stop, parent)
+            else:
+                return self.__parse(raw, start, stop, parent)
+        except Exception as e:
+            locate(e, parent, self.name, start)
+            raise
 
-    def __parse(self, raw: Sequence, parent: Optional[Field]) -> Field:
+    def __parse(self, raw: Sequence, start: int, stop: int, parent: Optional[Field]) -> Field:
         # dealing with length variability
         # dispatch according to type of self.length
         if isinstance(self.length, int):
-            return self.__parse_len_policy_fixed(raw, parent)
+            return self.__parse_len_policy_fixed(raw, start, stop, parent)
         elif isinstance(self.length, Dependency):
-            return self.__parse_len_policy_dependency(raw, parent)
+            return self.__parse_len_policy_dependency(raw, start, stop, parent)
         elif isinstance(self.length, LenPolicy):
             match self.length:
                 case LenPolicy.auto:
-                    return self.__parse_len_policy_auto(raw, parent)
+                    return self.__parse_len_policy_auto(raw, start, stop, parent)
                 case LenPolicy.greedy:
-                    return self.__parse_len_policy_greedy(raw, parent)
+                    return self.__parse_len_policy_greedy(raw, start, stop, parent)
                 case _:
                     raise Exception(f"Unsupported length policy of field '{self.name}' : {self.length}")
         else:
             raise Exception(f"Unsupported length type of field '{self.name}' : {type(self.length)}")
 
-    def __parse_len_policy_fixed(self, raw: Sequence, parent: Optional[Field]) -> Field:
-        raw = raw[:self.length]
+    def __parse_len_policy_fixed(
+            self, raw: Sequence, start: int, stop: int, parent: Optional[Field]
+    ) -> Field:
+        stop = min(start + self.length, stop)
+        # only leaves slice, so a field of n bytes is copied at most once
+        value = self.parse_value(raw[start:stop], parent) if self.is_leaf else None
         field = Field(
-            self.name, raw, self.parse_value(raw, parent), parent, None
-        )
-
-        used = 0
-        for cs in self.children:
+            self.name, raw, value, parent, None,
+            start=start, stop=stop
+        ).record(self.slot)
+        if self.is_bit_word:
+            return self.__parse_bits(raw, start, stop, field)
+
+        used = start
+        field.children = []
+        for cs in self.active_children(field):
             cs: Specification
-            cf = cs.parse(field.raw[used:], field)
+            cf = cs.parse(raw, field, used, stop)
             used += cf.length
+            field.children.append(cf)
+        field.children = tuple(field.children)
+        if not self.is_leaf and used < stop:
+            logger.warning("child fields does not used all bytes of field '%s'.", field.name)
+        return field
+
+    def __parse_bits(self, raw: Sequence, start: int, stop: int, field: Field) -> Field:
+        # a truncated word is read as if the missing bytes were zeros
+        word = int.from_bytes(raw[start:stop], byteorder="big") << 8 * (self.length - (stop - start))
+        for cs, shift, mask in self.bit_layout:
+            cf = Field(
+                cs.name, raw, cs.parse_bits((word >> shift) & mask, field), field, None,
+                start=start, stop=stop
+            ).record(cs.slot)
             field = field.add_children(cf)
-        if not self.is_leaf and used < field.length:
-            print(f"Warning: child fields does not used all bytes of field '{field.name}'.")
         return field
 
-    def __parse_len_policy_dependency(self, raw: Sequence, parent: Optional[Field]) -> Field:
-        length = parent.handle_dependency(self.length)()
-        return self.template(self.name, length, self.size).__parse(raw, parent)
+    def __parse_len_policy_dependency(
+            self, raw: Sequence, start: int, stop: int, parent: Optional[Field]
+    ) -> Field:
+        length = call(parent.handle_dependency(self.length))
+        return self.template(self.name, length, self.size).__parse(raw, start, stop, parent)
 
-    def __parse_len_policy_auto(self, raw: Sequence, parent: Optional[Field]) -> Field:
+    def __parse_len_policy_auto(
+            self, raw: Sequence, start: int, stop: int, parent: Optional[Field]
+    ) -> Field:
         field = Field(
             self.name, b"", None, parent, None,
             is_virtual=True
         )
 
-        used = 0
-        for cs in self.children:
+        used = start
+        field.children = []
+        for cs in self.active_children(field):
             cs: Specification
-            cf = cs.parse(raw[used:], field)
+            cf = cs.parse(raw, field, used, stop)
             used += cf.length
-            field = field.add_children(cf)
-        raw = raw[:used]
-        field = field.actualize(raw, self.parse_value(raw, parent))
+            field.children.append(cf)
+        field.children = tuple(field.children)
+        value = self.parse_value(raw[start:used], parent) if self.is_leaf else None
+        field = field.actualize(raw, value, start, used).record(self.slot)
         return field
 
-    def __parse_len_policy_greedy(self, raw: Sequence, parent: Optional[Field]) -> Field:
-        pass
+    def __parse_len_policy_greedy(
+            self, raw: Sequence, start: int, stop: int, parent: Optional[Field]
+    ) -> Field:
+        # every byte left to the field
+        return self.template(self.name, stop - start, self.size).__parse(raw, start, stop, parent)
 
-    def __parse_structural_variable(self, raw: Sequence, parent: Optional[Field]) -> Field:
+    def __parse_structural_variable(
+            self, raw: Sequence, start: int, stop: int, parent: Optional[Field]
+    ) -> Field:
         # create a virtual parent
         virtual = Field(
             self.name, None, None, parent, None,
@@ -218,36 +488,72 @@ class Specification(Tree):
         )
         # dispatch according to type of self.size
         if isinstance(self.size, Dependency):
-            return self.__parse_size_policy_dependency(raw, virtual)
+            return self.__parse_size_policy_dependency(raw, start, stop, virtual)
         elif isinstance(self.size, SizePolicy):
             match self.size:
                 case SizePolicy.greedy:
-                    return self.__parse_size_policy_greedy(raw, virtual)
+                    return self.__parse_size_policy_greedy(raw, start, stop, virtual)
                 case _:
                     raise Exception(f"Unsupported size policy of field '{self.name}' : {self.size}")
         else:
             raise Exception(f"Unsupported size type of field '{self.name}' : {type(self.size)}")
 
-    def __parse_size_policy_dependency(self, raw: Sequence, virtual: Optional[Field]) -> Field:
-        used = 0
-        size = virtual.handle_dependency(self.size)()
-        for _ in range(size):
-            cs = self\
-                .structural_template(len(virtual.children))\
-                .parse(raw[used:], virtual)
+    def __parse_size_policy_dependency(
+            self, raw: Sequence, start: int, stop: int, virtual: Optional[Field]
+    ) -> Field:
+        size = call(virtual.handle_dependency(self.size))
+        if self.is_fixed_element:
+            return self.parse_elements(raw, start, stop, virtual, size)
+        used = start
+        base = unwrap(self.name)
+        children = []
+        for i in range(size):
+            cs = self.parse_element(raw, used, stop, virtual, f"{base}[{i}]")
             used += cs.length
-            virtual = virtual.add_children(cs)
-        return virtual.set_virtual_length(used)
-
-    def __parse_size_policy_greedy(self, raw: Sequence, virtual: Optional[Field]) -> Field:
-        used = 0
-        while used < len(raw):
-            cs = self\
-                .structural_template(len(virtual.children))\
-                .parse(raw[used:], virtual)
+            children.append(cs)
+        virtual.add_children(*children)
+        return virtual.set_virtual_length(used - start)
+
+    def __parse_size_policy_greedy(
+            self, raw: Sequence, start: int, stop: int, virtual: Optional[Field]
+    ) -> Field:
+        if self.is_fixed_element:
+            return self.parse_elements(raw, start, stop, virtual, None)
+        used = start
+        base = unwrap(self.name)
+        children = []
+        while used < stop:
+            cs = self.parse_element(raw, used, stop, virtual, f"{base}[{len(children)}]")
             used += cs.length
-            virtual = virtual.add_children(cs)
-        return virtual.set_virtual_length(used)
+            children.append(cs)
+        virtual.add_children(*children)
+        return virtual.set_virtual_length(used - start)
+
+
+# struct formats of big-endian unsigned ints by length
+UNPACK_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+def call(handler: Callable) -> Any:
+    """result of the handler of a dependency, see blame()"""
+    try:
+        return handler()
+    except Exception as e:
+        blame(e, "handler")
+        raise
+
+
+def unpack(handler: Any, raw: Sequence, start: int, count: int, length: int) -> Sequence:
+    """values of count consecutive leaves of the same length and handler"""
+    if handler is builtin.bytes2int_b and length in UNPACK_FORMATS:
+        return struct.unpack_from(f">{count}{UNPACK_FORMATS[length]}", raw, start)
+    elif isinstance(handler, Callable):
+        try:
+            return [handler(raw[a:a + length]) for a in range(start, start + count * length, length)]
+        except Exception as e:
+            blame(e, "handler")
+            raise
+    return [None] * count
 
 
 def load(
@@ -260,6 +566,10 @@ def load(
     length = check_and_get(prop, name, predefined.LENGTH)
     size = check_and_get(prop, name, predefined.SIZE)
     handler = check_and_get(prop, name, predefined.HANDLER)
+    bits = prop.get(predefined.BITS)
+    switch = prop.get(predefined.SWITCH)
+    check = prop.get(predefined.CHECK)
+    sync = prop.get(predefined.SYNC)
 
     if not isinstance(length, int):
         # is a length variable field
@@ -289,20 +599,119 @@ def load(
         if isinstance(handler, tuple):
             handler = Dependency(handler)
 
+    if switch is not None:
+        switch = Dependency(switch)
+
     # recursively build the scaffold
     fs = Specification(
-        name, length, size, handler, parent, None
+        name, length, size, handler, parent, None,
+        bits=bits, switch=switch, check=check, sync=sync
     )
     children = []
     for child_name, child_spec in spec.items():
         if child_name != predefined.I_PROPERTIES:
             children.append(load(child_spec, child_name, fs))
-    return fs.add_children(*children)
+    fs = fs.add_children(*children)
+    check_bits(fs)
+    if switch is not None and fs.is_leaf:
+        raise SpecParseError(f"Switch '{name}' should have a child for each case.")
+    if sync is not None and (not fs.is_leaf or fs.is_structural_variable or fs.length != len(sync)):
+        raise SpecParseError(f"Sync word '{name}' should be a leaf of {len(sync)} bytes.")
+    if parent is None:
+        fs = bind(fs)
+        fs.checks = collect(fs)
+    return fs
+
+
+def check_bits(fs: Specification):
+    """bit-fields are leaves, all the children of a word of fixed length"""
+    with_bits = [cs for cs in fs.children if cs.bits is not None]
+    if not with_bits:
+        return
+    if len(with_bits) != len(fs.children):
+        raise SpecParseError(f"Either all or none of the children of '{fs.name}' are bit-fields.")
+    if not isinstance(fs.length, int) or fs.is_structural_variable:
+        raise SpecParseError(f"Word '{fs.name}' of bit-fields should have a fixed length.")
+    if sum(cs.bits for cs in with_bits) > 8 * fs.length:
+        raise SpecParseError(f"Bit-fields exceed the {fs.length} bytes of '{fs.name}'.")
+    for cs in with_bits:
+        if not cs.is_leaf or cs.is_structural_variable:
+            raise SpecParseError(f"Bit-field '{cs.name}' should be a leaf.")
+
+
+def bind(scaffold: Specification) -> Specification:
+    """
+    resolve the names in dependencies to slots, once for all frames.
+    A name refers to the first leaf of that name parsed before the dependent field, searched from its parent,
+    through the children before the ancestors, like Field.get() does.
+    A dependency is left unbound, and looked up by Field.get() while parsing, on a name not in the specification,
+    which may be in the parent frame passed to parse(), or on a leaf in the elements of a structural variable
+    the dependent field is not in, since every element would write the slot while Field.get() finds the first one.
+    """
+    order = {}
+
+    def preorder(s: Specification):
+        order[s] = len(order)
+        for c in s.children:
+            preorder(c)
+    preorder(scaffold)
+
+    slots = {}
+
+    def resolve(s: Specification, name: str) -> Optional[int]:
+        ancestors = set()
+        p = s.parent
+        while p is not None:
+            ancestors.add(p)
+            p = p.parent
+        origin = s.parent if s.parent is not None else s
+        target = origin.find(
+            lambda x: x.name == name
+            and not x.is_structural_variable
+            and order[x] < order[s]
+            and x not in ancestors
+        )
+        if target is None:
+            return None
+        if not target.is_leaf:
+            raise SpecParseError(f"Field '{s.name}' depends on non-leaf field '{name}'.")
+        p = target.parent
+        while p is not None:
+            if p.is_structural_variable and p not in ancestors:
+                return None
+            p = p.parent
+        if target not in slots:
+            slots[target] = len(slots)
+            target.slot = slots[target]
+        return slots[target]
+
+    for s in order:
+        for dependency in (s.length, s.size, s.handler, s.switch):
+            if isinstance(dependency, Dependency):
+                resolved = tuple(resolve(s, x) for x in dependency.args)
+                dependency.slots = None if None in resolved else resolved
+    return scaffold
 
 
 def parse(
-        scaffold: Specification,
+        scaffold: Specification | Plan,
         raw: Sequence,
-        parent: Optional[Field] = None
+        parent: Optional[Field] = None,
+        fields: Optional[Iterable[str]] = None,
+        profile: Optional[Profile] = None
 ) -> Field:
+    """
+    scaffold is a loaded specification, or its compiled plan.
+    Pass a memoryview as raw to parse without copying, then the handlers and Field.raw get views.
+    If fields is given, only the fields at these dotted paths (e.g. header.type) and what they depend on are parsed,
+    the others are skipped over by length.
+    If profile is given, the frame is parsed by a plan timing each field into it, see structed.profile.
+    """
+    if profile is not None:
+        from structed.compiler import Plan  # compiler depends on this module
+        return profile.plan(scaffold.spec if isinstance(scaffold, Plan) else scaffold, fields).parse(raw, parent)
+    if fields is not None:
+        from structed.compiler import Plan, project  # compiler depends on this module
+        spec = scaffold.spec if isinstance(scaffold, Plan) else scaffold
+        return project(spec, fields).parse(raw, parent)
     return scaffold.parse(raw, parent)
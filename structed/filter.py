@@ -0,0 +1,64 @@
+"""
+filters on the values of a few fields, checked as soon as these fields are parsed
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Sequence
+
+from structed.field import Field
+
+
+class Rejected(Exception):
+    """raised while parsing a frame not matching the filter of the plan, the frame is dropped"""
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+class Filter:
+    """
+    condition on the values of fields at dotted paths, which must not be in a structural variable,
+    e.g. Filter({"dst_port": 8000}), Filter({"header.type": lambda x: x["channel_type"] == "DCCH"})
+    or Filter(["src_port", "dst_port"], lambda src, dst: src < dst).
+    hits and skips count the frames kept and dropped by the drivers, e.g. parse_many().
+    """
+    def __init__(
+            self,
+            where: dict[str, Any] | Sequence[str],
+            predicate: Optional[Callable[..., bool]] = None
+    ):
+        """
+        :param where: path to the expected value, or to a predicate on the value,
+            or only paths if predicate is given
+        :param predicate: called with the values of the paths in order
+        """
+        if isinstance(where, dict):
+            self.paths = tuple(where)
+            tests = tuple(x if callable(x) else (lambda v, x=x: v == x) for x in where.values())
+            self.predicate = lambda *values: all(t(v) for t, v in zip(tests, values))
+        elif predicate is not None:
+            self.paths = tuple(where)
+            self.predicate = predicate
+        else:
+            raise Exception("A predicate is needed for a filter on paths.")
+        self.hits = 0
+        self.skips = 0
+
+    def __repr__(self):
+        return f"Filter(paths={self.paths}, hits={self.hits}, skips={self.skips})"
+
+    def matches(self, symbols: dict, slots: Sequence[int]) -> bool:
+        """evaluate on the values of a frame, slots are the ones of the paths"""
+        try:
+            values = [symbols[x] for x in slots]
+        except KeyError:
+            return False  # not in this frame
+        return bool(self.predicate(*values))
+
+    def count(self, root: Field, slots: Sequence[int], mark: Optional[int] = None) -> bool:
+        """count a parsed frame, evaluated again only if no guard marked it while parsing, see Plan.mark"""
+        if root.symbols.get(mark) is not True and not self.matches(root.symbols, slots):
+            self.skips += 1
+            return False
+        self.hits += 1
+        return True
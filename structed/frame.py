@@ -0,0 +1,523 @@
+"""
+compact result: a whole parsed frame in parallel arrays, viewed through FieldView
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Sequence, Iterator
+from array import array
+import logging
+
+from structed.common import LenPolicy, SizePolicy, Dependency
+from structed.field import Field, Specification, unpack, call
+from structed.compiler import Plan
+from structed.exception import SpecParseError, FrameParseError, locate, blame
+from structed.predefined import unwrap
+
+logger = logging.getLogger(__name__)
+
+
+class Frame:
+    """
+    node i of a frame is stored at index i of every array, in the order of parsing,
+    so the descendants of node i are the nodes in [i + 1, end[i]).
+    """
+    __slots__ = (
+        "buffer", "names", "virtual", "node", "ordinal", "parent", "start", "stop", "end", "value", "symbols",
+        "failed_checks"
+    )
+
+    def __init__(self, buffer: Sequence, names: list[str], virtual: list[bool]):
+        """names and virtual are shared by all frames of a plan, indexed by node id"""
+        self.buffer = buffer
+        self.names = names
+        self.virtual = virtual
+        self.node = array("i")
+        self.ordinal = array("i")  # index in a structural variable, -1 for others
+        self.parent = array("i")
+        self.start = array("q")
+        self.stop = array("q")
+        self.end = array("i")
+        self.value = []
+        self.symbols = {}
+        self.failed_checks = ()
+
+    def __len__(self):
+        return len(self.value)
+
+    def add(self, node: int, ordinal: int, parent: int, start: int, stop: int, value: Any) -> int:
+        i = len(self.value)
+        self.node.append(node)
+        self.ordinal.append(ordinal)
+        self.parent.append(parent)
+        self.start.append(start)
+        self.stop.append(stop)
+        self.end.append(i + 1)
+        self.value.append(value)
+        return i
+
+    def adopt(self, field: Field, parent: int, start: int, ordinal: int = -1) -> int:
+        """copy a parsed field into the frame, start is needed by virtual fields"""
+        node = self.node_of(field.name, field.is_virtual)
+        if not field.is_virtual:
+            start = field.start
+        i = self.add(node, ordinal, parent, start, start + field.length, field.value)
+        used = start
+        for child in field.children:
+            used = self.stop[self.adopt(child, i, used)]
+        self.end[i] = len(self.value)
+        return i
+
+    def node_of(self, name: str, virtual: bool) -> int:
+        for node, (n, v) in enumerate(zip(self.names, self.virtual)):
+            if n == name and v == virtual:
+                return node
+        self.names.append(name)
+        self.virtual.append(virtual)
+        return len(self.names) - 1
+
+    def root(self) -> FieldView:
+        return FieldView(self, 0)
+
+
+class FieldView:
+    """the Field interface of one node of a frame"""
+    __slots__ = ("frame", "index")
+
+    def __init__(self, frame: Frame, index: int):
+        self.frame = frame
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, FieldView) and self.frame is other.frame and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.frame), self.index))
+
+    @property
+    def name(self) -> str:
+        f, i = self.frame, self.index
+        name = f.names[f.node[i]]
+        if f.ordinal[i] >= 0:
+            return f"{name}[{f.ordinal[i]}]"
+        return name
+
+    @property
+    def value(self) -> Any:
+        return self.frame.value[self.index]
+
+    @property
+    def is_virtual(self) -> bool:
+        return self.frame.virtual[self.frame.node[self.index]]
+
+    @property
+    def raw(self) -> Optional[Sequence]:
+        if self.is_virtual:
+            return None
+        return self.frame.buffer[self.frame.start[self.index]:self.frame.stop[self.index]]
+
+    @property
+    def length(self) -> int:
+        return self.frame.stop[self.index] - self.frame.start[self.index]
+
+    @property
+    def parent(self) -> Optional[FieldView]:
+        p = self.frame.parent[self.index]
+        return FieldView(self.frame, p) if p >= 0 else None
+
+    @property
+    def failed_checks(self) -> tuple:
+        return self.frame.failed_checks
+
+    @failed_checks.setter
+    def failed_checks(self, checks: tuple):
+        self.frame.failed_checks = checks
+
+    @property
+    def is_root(self) -> bool:
+        return self.frame.parent[self.index] < 0
+
+    @property
+    def is_leaf(self) -> bool:
+        return self.frame.end[self.index] == self.index + 1
+
+    @property
+    def children(self) -> tuple[FieldView, ...]:
+        return tuple(FieldView(self.frame, x) for x in self.__children())
+
+    def __children(self) -> Iterator[int]:
+        end = self.frame.end
+        j = self.index + 1
+        while j < end[self.index]:
+            yield j
+            j = end[j]
+
+    def __iter__(self):
+        for child in self.children:
+            if child.is_leaf:
+                yield child.name, child.value
+            else:
+                d = {k: v for k, v in iter(child)}
+                yield child.name, d
+
+    def find(
+            self,
+            condition: Callable[[Any], bool],
+            visited: Optional[set] = None
+    ) -> Optional[FieldView]:
+        """same search as Tree.find"""
+        if not visited:
+            visited = set()
+
+        visited.add(self.index)
+        if condition(self):
+            return self
+
+        nxt = list(self.children)
+        if not self.is_root:
+            nxt.append(self.parent)
+
+        for t in nxt:
+            if t.index not in visited:
+                result = t.find(condition, visited)
+                if result:
+                    return result
+        return None
+
+    def get(self, name: str) -> Any:
+        """get the value of a field"""
+        field = self.find(lambda x: x.name == name and not x.is_virtual)
+        if not field:
+            raise Exception(f"Cannot get field '{name}'.")
+        if not field.is_leaf:
+            raise Exception(f"Cannot get value from non-leaf field '{field.name}'.")
+        return field.value
+
+
+# op(frame, raw, start, stop, parent, ordinal) adds one node parsed from raw[start:stop], returns its index
+FrameOp = Callable[[Frame, Sequence, int, int, int, int], int]
+# step(frame, raw, used, stop, parent) adds children of parent from raw[used:stop], returns new used
+FrameStep = Callable[[Frame, Sequence, int, int, int], int]
+
+
+def locate_node(
+        error: Exception, frame: Frame, parent: int, node: int, ordinal: int, start: int, code: str = "malformed"
+):
+    """locate() for the op of a node of a frame"""
+    if getattr(error, "parse_location", None) is None:
+        name = frame.names[node] + (f"[{ordinal}]" if ordinal >= 0 else "")
+        locate(error, FieldView(frame, parent) if parent >= 0 else None, name, start, code)
+
+
+def resolve(symbols: dict, dependency: Dependency) -> Callable:
+    return lambda *args: dependency.handler(*(symbols[x] for x in dependency.slots), *args)
+
+
+class FramePlan(Plan):
+    """plan whose result is a FieldView of a Frame instead of a tree of Field"""
+    def __init__(self, spec: Specification):
+        self.names: list[str] = []
+        self.virtual: list[bool] = []
+        self.frame_op = FrameCompiler(self).op(spec)
+
+        def op(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> FieldView:
+            frame = Frame(raw, self.names, self.virtual)
+            self.frame_op(frame, raw, start, stop, -1, -1)
+            return frame.root()
+        super().__init__(spec, op)
+
+    def node(self, name: str, virtual: bool = False) -> int:
+        self.names.append(name)
+        self.virtual.append(virtual)
+        return len(self.names) - 1
+
+
+def compile_frame(spec: Specification) -> FramePlan:
+    """compile the specification into a plan producing compact frames"""
+    return FramePlan(spec)
+
+
+class FrameCompiler:
+    """counterpart of compiler.Compiler, writing the frame arrays instead of creating fields"""
+    def __init__(self, plan: FramePlan):
+        self.plan = plan
+
+    def op(self, spec: Specification) -> FrameOp:
+        if spec.is_structural_variable:
+            return self.structural(spec)
+        return self.length(spec, self.plan.node(spec.name))
+
+    def length(self, spec: Specification, node: int) -> FrameOp:
+        if isinstance(spec.length, int):
+            return self.fixed(spec, node, spec.length)
+        elif isinstance(spec.length, Dependency):
+            return self.dependency(spec, node)
+        elif spec.length is LenPolicy.auto:
+            return self.auto(spec, node)
+        else:
+            return self.fallback(spec)
+
+    @staticmethod
+    def check(dependency: Dependency) -> Dependency:
+        if dependency.slots is None:
+            raise SpecParseError(
+                f"Dependency on {dependency.args} is not bound, load() the specification first, "
+                "the fields of a parent frame or of another structural variable are only looked up "
+                "by parse() and compile()."
+            )
+        return dependency
+
+    def value(self, spec: Specification) -> Callable[[Sequence, Frame], Any]:
+        handler = spec.handler
+        if not spec.is_leaf:
+            return lambda raw, frame: None
+        elif isinstance(handler, Callable):
+            return lambda raw, frame: handler(raw)
+        elif isinstance(handler, Dependency):
+            dependency = self.check(handler)
+            return lambda raw, frame: resolve(frame.symbols, dependency)(raw)
+        else:
+            return lambda raw, frame: None
+
+    def sized(self, spec: Specification, node: int) -> FrameOp:
+        value = self.value(spec)
+        slot = spec.slot
+        if spec.is_leaf:
+            def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+                try:
+                    v = value(raw[start:stop], frame)
+                except Exception as e:
+                    locate_node(e, frame, parent, node, ordinal, start, "handler")
+                    raise
+                if slot is not None:
+                    frame.symbols[slot] = v
+                return frame.add(node, ordinal, parent, start, stop, v)
+            return op
+        elif spec.is_bit_word:
+            return self.bits(spec, node)
+
+        steps = self.children(spec)
+        name = spec.name
+
+        def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+            i = frame.add(node, ordinal, parent, start, stop, None)
+            used = start
+            try:
+                for step in steps:
+                    used = step(frame, raw, used, stop, i)
+            except Exception as e:
+                locate_node(e, frame, parent, node, ordinal, start)
+                raise
+            frame.end[i] = len(frame.value)
+            if used < stop:
+                logger.warning("child fields does not used all bytes of field '%s'.", name)
+            return i
+        return op
+
+    def bits(self, spec: Specification, node: int) -> FrameOp:
+        """all the bit-fields of a word at once, with precomputed shifts and masks"""
+        layout = tuple(
+            (self.plan.node(cs.name), shift, mask, cs.slot, self.value(cs) if cs.handler is not None else None)
+            for cs, shift, mask in spec.bit_layout
+        )
+        length = spec.length
+
+        def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+            i = frame.add(node, ordinal, parent, start, stop, None)
+            word = int.from_bytes(raw[start:stop], "big") << 8 * (length - (stop - start))
+            for child, shift, mask, slot, value in layout:
+                bits = (word >> shift) & mask
+                try:
+                    v = value(bits, frame) if value is not None else bits
+                except Exception as e:
+                    locate_node(e, frame, i, child, -1, start, "handler")
+                    raise
+                if slot is not None:
+                    frame.symbols[slot] = v
+                frame.add(child, -1, i, start, stop, v)
+            frame.end[i] = len(frame.value)
+            return i
+        return op
+
+    def fixed(self, spec: Specification, node: int, length: int) -> FrameOp:
+        sized = self.sized(spec, node)
+
+        def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+            return sized(frame, raw, start, min(start + length, stop), parent, ordinal)
+        return op
+
+    def dependency(self, spec: Specification, node: int) -> FrameOp:
+        sized = self.sized(spec, node)
+        dependency = self.check(spec.length)
+        fallback = self.fallback(spec)
+
+        def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+            try:
+                length = call(resolve(frame.symbols, dependency))
+            except Exception as e:
+                locate_node(e, frame, parent, node, ordinal, start)
+                raise
+            if isinstance(length, int):
+                return sized(frame, raw, start, min(start + length, stop), parent, ordinal)
+            return fallback(frame, raw, start, stop, parent, ordinal, length)
+        return op
+
+    def auto(self, spec: Specification, node: int) -> FrameOp:
+        value = self.value(spec)
+        slot = spec.slot
+        steps = self.children(spec)
+
+        def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+            i = frame.add(node, ordinal, parent, start, start, None)
+            used = start
+            try:
+                for step in steps:
+                    used = step(frame, raw, used, stop, i)
+            except Exception as e:
+                locate_node(e, frame, parent, node, ordinal, start)
+                raise
+            frame.end[i] = len(frame.value)
+            frame.stop[i] = used
+            if spec.is_leaf:
+                try:
+                    frame.value[i] = value(raw[start:used], frame)
+                except Exception as e:
+                    locate_node(e, frame, parent, node, ordinal, start, "handler")
+                    raise
+                if slot is not None:
+                    frame.symbols[slot] = frame.value[i]
+            return i
+        return op
+
+    def structural(self, spec: Specification) -> FrameOp:
+        container = self.plan.node(spec.name, virtual=True)
+        if spec.is_fixed_element:
+            return self.elements(spec, container, self.plan.node(unwrap(spec.name)))
+        element = self.length(spec, self.plan.node(unwrap(spec.name)))
+        size = spec.size
+
+        if isinstance(size, Dependency):
+            dependency = self.check(size)
+
+            def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+                c = frame.add(container, -1, parent, start, start, None)
+                used = start
+                try:
+                    for i in range(call(resolve(frame.symbols, dependency))):
+                        used = frame.stop[element(frame, raw, used, stop, c, i)]
+                except Exception as e:
+                    locate_node(e, frame, parent, container, -1, start)
+                    raise
+                frame.end[c] = len(frame.value)
+                frame.stop[c] = used
+                return c
+            return op
+        elif size is SizePolicy.greedy:
+            def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+                c = frame.add(container, -1, parent, start, start, None)
+                used = start
+                i = 0
+                try:
+                    while used < stop:
+                        used = frame.stop[element(frame, raw, used, stop, c, i)]
+                        i += 1
+                except Exception as e:
+                    locate_node(e, frame, parent, container, -1, start)
+                    raise
+                frame.end[c] = len(frame.value)
+                frame.stop[c] = used
+                return c
+            return op
+        else:
+            return self.fallback(spec)
+
+    def elements(self, spec: Specification, container: int, node: int) -> FrameOp:
+        """an array of fixed length leaves in one loop, whole elements are unpacked at once"""
+        size = spec.size
+        if not isinstance(size, Dependency) and size is not SizePolicy.greedy:
+            return self.fallback(spec)
+        dependency = self.check(size) if isinstance(size, Dependency) else None
+        length = spec.length
+        value = self.value(spec)
+
+        def op(frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int) -> int:
+            c = frame.add(container, -1, parent, start, start, None)
+            try:
+                if dependency is not None:
+                    count = max(call(resolve(frame.symbols, dependency)), 0)
+                else:
+                    count = -(-(stop - start) // length)
+                whole = max(0, min(count, (stop - start) // length))
+                values = unpack(spec.handler, raw, start, whole, length)
+                for i in range(count):
+                    a = min(start + i * length, stop)
+                    b = min(a + length, stop)
+                    if i < whole:
+                        v = values[i]
+                    else:
+                        try:
+                            v = value(raw[a:b], frame)
+                        except Exception as e:
+                            blame(e, "handler")
+                            raise
+                    frame.add(node, i, c, a, b, v)
+            except Exception as e:
+                locate_node(e, frame, parent, container, -1, start)
+                raise
+            frame.end[c] = len(frame.value)
+            frame.stop[c] = min(start + count * length, stop)
+            return c
+        return op
+
+    def union(self, spec: Specification) -> FrameStep:
+        """parse the child chosen by the discriminator, each case is compiled once"""
+        dependency = self.check(spec.switch)
+        cases = spec.cases
+        branches = {}
+        for cs in spec.children:
+            op = self.op(cs)
+            branches[id(cs)] = lambda frame, raw, used, stop, parent, op=op: \
+                frame.stop[op(frame, raw, used, stop, parent, -1)]
+
+        def step(frame: Frame, raw: Sequence, used: int, stop: int, parent: int) -> int:
+            value = call(resolve(frame.symbols, dependency))
+            try:
+                cs = cases[value]
+            except (KeyError, TypeError):
+                raise FrameParseError(f"No case of '{spec.name}' for {value!r}.", code="case") from None
+            return branches[id(cs)](frame, raw, used, stop, parent)
+        return step
+
+    @staticmethod
+    def fallback(spec: Specification) -> Callable[..., int]:
+        """parse with the specification, then copy the fields into the frame"""
+        def op(
+                frame: Frame, raw: Sequence, start: int, stop: int, parent: int, ordinal: int,
+                length: Any = spec.length
+        ) -> int:
+            scope = Field(spec.name, None, None, None, None, is_virtual=True)
+            scope.symbols = frame.symbols
+            try:
+                if ordinal >= 0:
+                    name = unwrap(spec.name) + f"[{ordinal}]"
+                    field = spec.template(name, length, None).parse(raw, scope, start, stop)
+                    field.name = unwrap(spec.name)
+                else:
+                    field = spec.template(spec.name, length, spec.size).parse(raw, scope, start, stop)
+            except Exception as e:
+                # the path goes on from the parent node instead of the scope
+                e.parse_location.scope = scope
+                e.parse_location.outer = FieldView(frame, parent) if parent >= 0 else None
+                raise
+            return frame.adopt(field, parent, start, ordinal)
+        return op
+
+    def children(self, spec: Specification) -> tuple[FrameStep, ...]:
+        if spec.switch is not None:
+            return self.union(spec),
+        steps = []
+        for cs in spec.children:
+            cs: Specification
+            op = self.op(cs)
+            steps.append(lambda frame, raw, used, stop, parent, op=op: frame.stop[op(frame, raw, used, stop, parent, -1)])
+        return tuple(steps)
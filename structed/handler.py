@@ -1,8 +1,22 @@
+from typing import Callable
+
+
+def pure(func: Callable) -> Callable:
+    """
+    mark a handler whose result only depends on its input bytes,
+    so its results may be precomputed and shared, they must not be mutated
+    """
+    func.pure = True
+    return func
+
+
+@pure
 def bytes2int_b(x: bytes) -> int:
     """byte order is big-endian"""
     return int.from_bytes(x, byteorder="big")
 
 
+@pure
 def bytes2hex(x: bytes) -> str:
     """convert the bytes to hex string"""
     return x.hex()
@@ -3,9 +3,9 @@ JSON decoder and encoder for convert JSON into intermediate dict
 """
 
 import json
-from typing import Callable, Any
+from typing import Callable, Any, Optional
 
-from structed import predefined, handler
+from structed import predefined, handler, checksum
 from structed.common import LenPolicy
 
 
@@ -49,6 +49,17 @@ class Decoder(json.JSONDecoder):
                     value = Decoder.decode_callable(value)
                 elif isinstance(value, list):
                     value = Decoder.check_dependency(value)
+            case predefined.BITS:
+                if not isinstance(value, int) or value <= 0:
+                    raise Exception(f"Invalid number of bits: {value}")
+            case predefined.SWITCH:
+                if not isinstance(value, list):
+                    raise Exception(f"Discriminator of a switch should be a dependency: {value}")
+                value = Decoder.check_dependency(value)
+            case predefined.CHECK:
+                value = Decoder.check_check(value)
+            case predefined.SYNC:
+                value = Decoder.check_sync(value)
             case _:
                 raise Exception(f"Invalid internal property name: '{name}'")
         return name, value
@@ -68,6 +79,30 @@ class Decoder(json.JSONDecoder):
         dependency[0] = Decoder.decode_callable(dependency[0])
         return tuple(dependency)
 
+    @staticmethod
+    def check_check(check: str | list) -> tuple[str, int, Optional[int]]:
+        """algorithm and range of a checksum, e.g. "crc32" or ["crc32", 0, -4]"""
+        if isinstance(check, str):
+            check = [check]
+        if not isinstance(check, list) or not 1 <= len(check) <= 3:
+            raise Exception(f"Invalid checksum: {check}")
+        name = check[0]
+        start = check[1] if len(check) > 1 else 0
+        stop = check[2] if len(check) > 2 else None
+        if name not in checksum.ALGORITHMS:
+            raise Exception(f"Unknown checksum algorithm: '{name}'")
+        if not isinstance(start, int) or not (stop is None or isinstance(stop, int)):
+            raise Exception(f"Range of a checksum should be offsets: {check}")
+        return name, start, stop
+
+    @staticmethod
+    def check_sync(sync: str) -> bytes:
+        """constant bytes of a sync word or preamble, in hex, e.g. "aa55" """
+        try:
+            return bytes.fromhex(sync)
+        except (TypeError, ValueError):
+            raise Exception(f"Sync word should be hex digits: {sync!r}") from None
+
     @staticmethod
     def check_default_value(prop: dict) -> dict:
         """if needed is not in prop, use default value"""
@@ -77,14 +112,28 @@ class Decoder(json.JSONDecoder):
             prop[predefined.SIZE] = None
         if predefined.HANDLER not in prop:
             prop[predefined.HANDLER] = None
+        if predefined.BITS not in prop:
+            prop[predefined.BITS] = None
+        if predefined.SWITCH not in prop:
+            prop[predefined.SWITCH] = None
+        if predefined.CHECK not in prop:
+            prop[predefined.CHECK] = None
+        if predefined.SYNC not in prop:
+            prop[predefined.SYNC] = None
         return prop
 
     def __init__(self):
         super().__init__(object_pairs_hook=self.hook)
 
 
+# incremented by every registration, so caches of the handler set know when to refresh
+registrations = 0
+
+
 def add_external_handler(func: Callable):
+    global registrations
     setattr(handler, func.__name__, func)
+    registrations += 1
 
 
 def add_external_handlers_from(mod):
@@ -0,0 +1,114 @@
+"""
+parse a large corpus with a pool of processes
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Sequence, Iterable, Iterator
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from importlib import import_module
+import os
+from itertools import islice
+
+from structed.field import load
+from structed.compiler import Plan, compile
+from structed.json_codec import decode, add_external_handlers_from
+from structed.quarantine import diagnose
+
+
+# state of a worker process, set once by init()
+_plan: Optional[Plan] = None
+_transform: Optional[Callable] = None
+
+
+def init(spec: str, modules: Sequence[str], transform: Callable):
+    """
+    load the specification in the worker, handlers are imported by module name
+    since the loaded specification (e.g. Dependency) cannot be pickled
+    """
+    global _plan, _transform
+    for name in modules:
+        add_external_handlers_from(import_module(name))
+    _plan = compile(load(decode(spec)))
+    _transform = transform
+
+
+def work(frames: list[bytes]) -> list[Any]:
+    """results of a chunk, a frame failed to parse has its Status in its place, so the others are kept"""
+    op = _plan.op
+    name = _plan.spec.name
+    results = []
+    for raw in frames:
+        try:
+            results.append(_transform(op(raw, 0, len(raw), None, name)))
+        except Exception as e:
+            results.append(diagnose(e))
+    return results
+
+
+def chunked(frames: Iterable[bytes], size: int) -> Iterator[list[bytes]]:
+    frames = iter(frames)
+    while chunk := list(islice(frames, size)):
+        yield chunk
+
+
+def parse_parallel(
+        spec: str,
+        frames: Iterable[bytes],
+        *,
+        modules: Sequence[str] = (),
+        transform: Callable = dict,
+        processes: Optional[int] = None,
+        chunk_size: int = 1024,
+        max_pending: Optional[int] = None,
+        ordered: bool = True
+) -> Iterator[Any]:
+    """
+    parse frames in worker processes, each worker loads the specification only once.
+    A frame failed to parse yields its Status, which is falsy, see structed.quarantine
+    :param spec: JSON text of the specification
+    :param modules: names of the modules to add external handlers from, importable by the workers
+    :param transform: applied to each parsed field in the worker, its result is sent back,
+        so it must be picklable, e.g. dict
+    :param processes: number of worker processes, default to the number of CPUs
+    :param chunk_size: number of frames sent to a worker at a time
+    :param max_pending: most chunks in flight, frames are not read further until one is done
+    :param ordered: yield results in the order of frames, otherwise as soon as they are done
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * processes
+    with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=init,
+            initargs=(spec, tuple(modules), transform)
+    ) as pool:
+        pending: deque[Future] = deque()
+        for chunk in chunked(frames, chunk_size):
+            pending.append(pool.submit(work, chunk))
+            if len(pending) >= max_pending:
+                yield from finished(pending, ordered)
+        while pending:
+            yield from finished(pending, ordered)
+
+
+def finished(pending: deque[Future], ordered: bool) -> Iterator[Any]:
+    """wait for the oldest chunk, or for any chunk if not ordered"""
+    if ordered:
+        yield from pending.popleft().result()
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+        yield from future.result()
+
+
+def hex_lines(path: str) -> Iterator[bytes]:
+    """frames of a corpus with one hex string per line, e.g. raw_dcch.txt"""
+    with open(path, "r") as fp:
+        for line in fp:
+            line = line.strip()
+            if line:
+                yield bytes.fromhex(line)
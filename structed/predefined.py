@@ -18,6 +18,10 @@ I_PROPERTIES = INTERNAL_PREFIX + PROPERTIES
 LENGTH = "length"
 SIZE = "size"
 HANDLER = "handler"
+BITS = "bits"
+SWITCH = "switch"
+CHECK = "check"
+SYNC = "sync"
 
 
 def is_structural_variable_field(name: str) -> bool:
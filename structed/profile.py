@@ -0,0 +1,182 @@
+"""
+per-field profiling of parsing, opt-in: a profiled plan is compiled from an instrumented copy of the specification,
+other plans are not changed at all
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable, Any
+from collections.abc import Sequence, Iterable
+import time
+
+from structed.common import Dependency
+from structed.field import Field, Specification
+from structed.compiler import Compiler, Plan, Op, compile
+from structed.filter import Filter
+
+clock = time.perf_counter_ns
+
+
+class Stats:
+    """counters of one field of the specification, times are in nanoseconds"""
+    __slots__ = ("path", "calls", "bytes", "total", "handlers", "lookups")
+
+    def __init__(self, path: tuple[str, ...]):
+        self.path = path
+        self.calls = 0
+        self.bytes = 0
+        # time in parsing the field, including its children and handlers
+        self.total = 0
+        # time in each handler of the field by name, including the ones of its dependencies
+        self.handlers: dict[str, int] = {}
+        # dependencies of the field evaluated, for its length, size, handler or switch
+        self.lookups = 0
+
+    @property
+    def handler(self) -> int:
+        return sum(self.handlers.values())
+
+
+class Profile:
+    """
+    counters by path of field, filled by parse(..., profile=p) and parse_many(..., profile=p).
+    Handlers run without lookup tables or caches and every field is parsed by itself,
+    so the total time is higher than without profiling.
+    """
+    def __init__(self):
+        self.stats: dict[tuple[str, ...], Stats] = {}
+        # profiled plans by (specification, fields, filter)
+        self.plans: dict[tuple[int, Optional[frozenset[str]], int], tuple[Specification, Plan]] = {}
+        # stats of the fields of the instrumented copies
+        self.of: dict[Specification, Stats] = {}
+
+    def reset(self):
+        for stats in self.stats.values():
+            stats.__init__(stats.path)
+
+    def stats_of(self, path: tuple[str, ...]) -> Stats:
+        if path not in self.stats:
+            self.stats[path] = Stats(path)
+        return self.stats[path]
+
+    def plan(
+            self,
+            spec: Specification,
+            fields: Optional[Iterable[str]] = None,
+            where: Optional[Filter] = None
+    ) -> Plan:
+        """profiled plan of spec, compiled once"""
+        key = id(spec), None if fields is None else frozenset(fields), id(where)
+        if key not in self.plans:
+            # spec is kept along, so its id is not reused
+            self.plans[key] = spec, compile(spec, fields=key[1], where=where, profile=self)
+        return self.plans[key][1]
+
+    def instrument(self, spec: Specification) -> Specification:
+        """copy of a loaded specification whose handlers are timed"""
+        def timed(handler: Callable, stats: Stats, lookup: bool) -> Callable:
+            name = getattr(handler, "__name__", repr(handler))
+
+            def h(*args):
+                if lookup:
+                    stats.lookups += 1
+                t = clock()
+                try:
+                    return handler(*args)
+                finally:
+                    stats.handlers[name] = stats.handlers.get(name, 0) + clock() - t
+            h.__name__ = name
+            return h
+
+        def prop(x: Any, stats: Stats) -> Any:
+            if isinstance(x, Dependency):
+                dependency = Dependency((timed(x.handler, stats, True), *x.args))
+                dependency.slots = x.slots
+                return dependency
+            elif isinstance(x, Callable):
+                return timed(x, stats, False)
+            return x
+
+        def copy(s: Specification, parent: Optional[Specification], path: tuple[str, ...]) -> Specification:
+            stats = self.stats_of(path)
+            c = Specification(
+                s.name, prop(s.length, stats), prop(s.size, stats), prop(s.handler, stats), parent, None,
+                slot=s.slot, bits=s.bits, switch=prop(s.switch, stats), check=s.check, sync=s.sync
+            )
+            self.of[c] = stats
+            return c.add_children(*(copy(x, c, (*path, x.name)) for x in s.children))
+        root = copy(spec, None, (spec.name,))
+        root.checks = spec.checks
+        return root
+
+    def rows(self) -> list[tuple[str, int, int, float, float, float, float, int]]:
+        """(path, calls, bytes, total ms, self ms, handler ms, framework ms, lookups) of each field parsed"""
+        children: dict[tuple[str, ...], int] = {}
+        for path, stats in self.stats.items():
+            if len(path) > 1:
+                children[path[:-1]] = children.get(path[:-1], 0) + stats.total
+        rows = []
+        for path, stats in self.stats.items():
+            if not stats.calls and not stats.lookups and not stats.handlers:
+                continue
+            own = stats.total - children.get(path, 0)
+            rows.append((
+                ".".join(path), stats.calls, stats.bytes, stats.total / 1e6, own / 1e6,
+                stats.handler / 1e6, (own - stats.handler) / 1e6, stats.lookups
+            ))
+        return rows
+
+    def table(self, sort: str = "self") -> str:
+        """rows as text, sorted by total, self, handler or framework time, or in the order of the specification"""
+        rows = self.rows()
+        column = {"total": 3, "self": 4, "handler": 5, "framework": 6}.get(sort)
+        if column is not None:
+            rows.sort(key=lambda x: -x[column])
+        width = max([len("path"), *(len(x[0]) for x in rows)])
+        lines = [f"{'path':<{width}} {'calls':>9} {'bytes':>11} {'total ms':>10} {'self ms':>10} "
+                 f"{'handler ms':>10} {'framework':>10} {'lookups':>9}"]
+        for path, calls, n, total, own, handler, framework, lookups in rows:
+            lines.append(f"{path:<{width}} {calls:>9} {n:>11} {total:>10.3f} {own:>10.3f} "
+                         f"{handler:>10.3f} {framework:>10.3f} {lookups:>9}")
+        return "\n".join(lines)
+
+    def folded(self) -> str:
+        """
+        self time in microseconds in the folded stack format of flame graph tools,
+        e.g. flamegraph.pl or speedscope, each handler is a frame on top of its field
+        """
+        lines = []
+        for path, calls, n, total, own, handler, framework, lookups in self.rows():
+            stack = path.replace(".", ";")
+            if framework > 0:
+                lines.append(f"{stack} {round(framework * 1e3)}")
+            for name, t in self.stats[tuple(path.split("."))].handlers.items():
+                lines.append(f"{stack};{name} {round(t / 1e3)}")
+        return "\n".join(lines)
+
+
+class Profiler(Compiler):
+    """compile an instrumented copy of a specification, see Profile.instrument()"""
+    def __init__(self, profile: Profile, *, keep: Optional[frozenset[Specification]] = None):
+        # handlers are called every time, so they are timed
+        super().__init__(lazy=False, table_budget=0, lru_size=0, keep=keep)
+        self.profile = profile
+
+    @staticmethod
+    def is_plain_leaf(spec: Specification) -> bool:
+        """every field has its own op, which is timed"""
+        return False
+
+    def op(self, spec: Specification) -> Op:
+        op = super().op(spec)
+        stats = self.profile.of[spec]
+
+        def timed(raw: Sequence, start: int, stop: int, parent: Optional[Field], name: str) -> Field:
+            t = clock()
+            try:
+                field = op(raw, start, stop, parent, name)
+            finally:
+                stats.total += clock() - t
+                stats.calls += 1
+            stats.bytes += field.length
+            return field
+        return timed
@@ -0,0 +1,67 @@
+"""
+malformed frames of parse_many(..., quarantine=...), reported by a status instead of an exception
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional
+from collections.abc import Sequence
+from collections import deque
+from enum import Enum
+
+from structed.exception import FrameParseError
+
+
+class Code(Enum):
+    """kind of error of a frame"""
+    handler = "handler"  # a handler raised, e.g. a KeyError looking up an unknown value
+    case = "case"  # no case of a union for the value of its discriminator
+    malformed = "malformed"  # any other error while parsing, e.g. an unusable length
+
+
+class Status:
+    """
+    why a frame failed: code, dotted path of the innermost field being parsed and its offset in the frame,
+    it is falsy, so it is checked like the None yielded with skip_errors
+    """
+    __slots__ = ("code", "path", "offset", "error")
+
+    def __init__(self, code: Code, path: Optional[str], offset: Optional[int], error: Exception):
+        self.code = code
+        self.path = path
+        self.offset = offset
+        # without its traceback, which holds the frame and the fields parsed so far
+        self.error = error
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return f"Status(code={self.code.value}, path={self.path!r}, offset={self.offset}, error={self.error!r})"
+
+
+class Quarantine:
+    """sink keeping a copy of the last bad frames with their status, and counting them by code"""
+    def __init__(self, capacity: int = 1024):
+        self.frames: deque[tuple[bytes, Status]] = deque(maxlen=capacity)
+        self.counts: dict[Code, int] = {}
+
+    def __call__(self, raw: Sequence, status: Status):
+        self.frames.append((bytes(raw), status))
+        self.counts[status.code] = self.counts.get(status.code, 0) + 1
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def __repr__(self):
+        return f"Quarantine({', '.join(f'{k.value}={v}' for k, v in self.counts.items())})"
+
+
+def diagnose(error: Exception) -> Status:
+    """status of a frame whose parsing raised error, its code was recorded by the engine, see locate()"""
+    location = getattr(error, "parse_location", None)
+    if location is None:
+        code = Code(error.code) if isinstance(error, FrameParseError) else Code.malformed
+        return Status(code, None, None, error.with_traceback(None))
+    # the location holds the fields parsed so far, an error raised again records a new one
+    del error.parse_location
+    return Status(Code(location.code), location.path, location.offset, error.with_traceback(None))
@@ -0,0 +1,311 @@
+"""
+find the frames of a corrupted or misaligned buffer from what the specification says a frame looks like:
+sync words, the valid values of the leaves at fixed offsets from the start of a frame, and checksums
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional, Callable
+from collections.abc import Sequence, Iterator
+from itertools import chain
+
+from structed.common import LenPolicy
+from structed.field import Field, Specification
+from structed.compiler import Plan, Compiler, TABLES, MISSING, compile
+from structed.batch import BatchStats
+from structed.exception import SpecParseError
+
+# bytes of a buffer marked at once when searching by a guard
+WINDOW = 1 << 14
+# the frame at the position reaches past the end of the buffer, it may be complete later
+INCOMPLETE = object()
+
+
+class Bounded:
+    """buffer of which only data[:end] is known, noting whether a parse read past it"""
+    __slots__ = ("data", "end", "past")
+
+    def __init__(self, data: Sequence, end: int):
+        self.data = data
+        self.end = end
+        self.past = False
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key: int | slice):
+        if isinstance(key, slice):
+            if key.stop is None or key.stop > self.end:
+                self.past = True
+        elif key >= self.end:
+            self.past = True
+        return self.data[key]
+
+
+class Sync:
+    """constant bytes at a fixed offset from the start of a frame"""
+    def __init__(self, path: str, offset: int, word: bytes):
+        self.path = path
+        self.offset = offset
+        self.word = word
+        # share of the positions it accepts, lower is more selective
+        self.share = 256.0 ** -len(word)
+
+    def __repr__(self):
+        return f"Sync({self.path}, offset={self.offset}, word={self.word.hex()})"
+
+    def accepts(self, buffer: Sequence, at: int, end: int) -> bool:
+        """the bytes at offset at may be the word, the ones from end on are unknown"""
+        n = min(len(self.word), end - at)
+        return n <= 0 or buffer[at:at + n] == self.word[:n]
+
+
+class Guard:
+    """leaf of 1 or 2 bytes at a fixed offset from the start of a frame, of which only some values are valid"""
+    def __init__(self, path: str, offset: int, width: int, valid: frozenset[int]):
+        """valid is the valid bytes of the leaf as big-endian ints"""
+        self.path = path
+        self.offset = offset
+        self.width = width
+        self.valid = valid
+        firsts = {x >> 8 * (width - 1) for x in valid}
+        # 1 for the first byte of a valid value, for bytes.translate()
+        self.marks = bytes(1 if i in firsts else 0 for i in range(256))
+        self.share = len(valid) / (1 << 8 * width)
+        self.first_share = len(firsts) / 256
+
+    def __repr__(self):
+        return f"Guard({self.path}, offset={self.offset}, valid={len(self.valid)}/{1 << 8 * self.width})"
+
+    def accepts(self, buffer: Sequence, at: int, end: int) -> bool:
+        """the bytes at offset at may be the leaf, the ones from end on are unknown"""
+        n = min(self.width, end - at)
+        if n == self.width:
+            return int.from_bytes(buffer[at:at + n], "big") in self.valid
+        return n <= 0 or self.marks[buffer[at]] == 1
+
+
+def valid_values(spec: Specification, unions: Sequence[Specification]) -> Optional[frozenset[int]]:
+    """
+    inputs of 1 or 2 bytes on which the pure handler of a leaf does not raise,
+    and its value chooses a case of each union it is the discriminator of, None if every input is valid
+    """
+    handler = spec.handler
+    if spec.length not in (1, 2) or not isinstance(handler, Callable) or not getattr(handler, "pure", False):
+        return None
+    table = TABLES.get((handler, spec.length))
+    if table is None:
+        table = tuple(Compiler.evaluate(handler, i.to_bytes(spec.length, "big")) for i in range(1 << 8 * spec.length))
+    valid = []
+    for i, v in enumerate(table):
+        if v is MISSING:
+            continue
+        try:
+            if all(u.switch.handler(v) in u.cases for u in unions):
+                valid.append(i)
+        except Exception:
+            pass
+    return frozenset(valid) if len(valid) < len(table) else None
+
+
+def anchors(spec: Specification) -> tuple[list[Sync], list[Guard]]:
+    """sync words and guards at fixed offsets from the start of a frame of spec"""
+    syncs, guards = [], []
+    # unions by the slot of their discriminator
+    unions: dict[int, list[Specification]] = {}
+
+    def preorder(s: Specification):
+        if s.switch is not None and s.switch.slots is not None and len(s.switch.slots) == 1:
+            unions.setdefault(s.switch.slots[0], []).append(s)
+        for c in s.children:
+            preorder(c)
+    preorder(spec)
+
+    def walk(s: Specification, offset: int, path: tuple[str, ...]) -> Optional[int]:
+        """length of s if it is fixed, collecting its leaves at fixed offsets"""
+        if s.is_structural_variable or s.switch is not None:
+            return None
+        if s.is_leaf:
+            if not isinstance(s.length, int):
+                return None
+            if s.sync is not None:
+                syncs.append(Sync(".".join(path), offset, s.sync))
+            else:
+                valid = valid_values(s, unions.get(s.slot, ()) if s.slot is not None else ())
+                if valid is not None:
+                    guards.append(Guard(".".join(path), offset, s.length, valid))
+            return s.length
+        fixed = s.length if isinstance(s.length, int) else None
+        if s.is_bit_word:
+            return fixed
+        used = 0
+        for cs in s.children:
+            n = walk(cs, offset + used, (*path, cs.name))
+            if n is None:
+                # the children after it are not at fixed offsets
+                return fixed
+            used += n
+        if fixed is not None:
+            return fixed
+        return used if s.length is LenPolicy.auto else None
+    walk(spec, 0, (spec.name,))
+    return syncs, guards
+
+
+class Scanner:
+    """
+    Find the frames of a buffer with garbage between them, e.g. after a corrupt length byte.
+    Candidate starts are searched with bytes.find() for the longest sync word,
+    or else with bytes.translate() for the first byte of the most selective guard, so the search runs in C.
+    Each candidate is checked by the other sync words and guards, then parsed, verified by the checksums,
+    and kept if the bytes after it may be the start of the next frame too.
+    Without sync words nor guards, every position is a candidate, so the frames need checksums.
+    """
+    def __init__(self, scaffold: Specification | Plan, lookahead: Optional[bool] = None):
+        """
+        :param scaffold: loaded specification or compiled plan
+        :param lookahead: check the start of the next frame, by default unless the frames have checksums
+        """
+        spec = scaffold.spec if isinstance(scaffold, Plan) else scaffold
+        # a filter would abort frames, only their validity matters here
+        self.plan = scaffold if isinstance(scaffold, Plan) and scaffold.where is None else compile(spec)
+        self.extent = compile(spec, fields=())
+        self.syncs, self.guards = anchors(spec)
+        # the cheap checks, the most selective first
+        self.probes = sorted([*self.syncs, *self.guards], key=lambda x: x.share)
+        self.checks = spec.checks
+        self.lookahead = not self.checks if lookahead is None else lookahead
+        if not self.probes and not self.checks:
+            raise SpecParseError(
+                f"No sync word, guard nor checksum to find the frames of '{spec.name}' by, "
+                "see structed.resync."
+            )
+
+    def plausible(self, buffer: Sequence, at: int, end: int) -> bool:
+        """the bytes at offset at may be the start of a frame, as far as the sync words and guards tell"""
+        for probe in self.probes:
+            if not probe.accepts(buffer, at + probe.offset, end):
+                return False
+        return True
+
+    def candidates(self, buffer: bytes | bytearray, start: int, end: int) -> Iterator[int]:
+        """increasing offsets from start on which may be frame starts, at least for the probe searched for"""
+        if self.syncs:
+            sync = max(self.syncs, key=lambda x: len(x.word))
+            at = start
+            while True:
+                i = buffer.find(sync.word, at + sync.offset, end)
+                if i < 0:
+                    break
+                yield i - sync.offset
+                at = i - sync.offset + 1
+            # the word is cut by the end
+            yield from range(max(at, end - sync.offset - len(sync.word) + 1), end)
+        elif self.guards:
+            guard = min(self.guards, key=lambda x: x.first_share)
+            at = start
+            while at < end - guard.offset:
+                stop = min(at + WINDOW, end - guard.offset)
+                marks = buffer[at + guard.offset:stop + guard.offset].translate(guard.marks)
+                i = marks.find(1)
+                while i >= 0:
+                    yield at + i
+                    i = marks.find(1, i + 1)
+                at = stop
+            # the guard is past the end
+            yield from range(max(start, end - guard.offset), end)
+        else:
+            yield from range(start, end)
+
+    def frame(
+            self, buffer: Sequence, at: int, end: int, probe: bool = True, horizon: int = 0
+    ) -> Optional[Field] | object:
+        """
+        the frame at offset at if it is valid, INCOMPLETE if it reaches past end, None if it is not valid.
+        If probe, its end is found first by the extent plan, which only parses what the lengths depend on,
+        so most false candidates are not parsed fully.
+        A frame starting less than horizon bytes before end which fails to parse after reading past end
+        may only lack bytes, one failing before is not valid.
+        """
+        name = self.plan.spec.name
+        try:
+            if probe:
+                verdict = self.ends(buffer, at, at + self.extent.op(buffer, at, len(buffer), None, name).length, end)
+                if verdict is not True:
+                    return verdict
+            field = self.plan.op(buffer, at, len(buffer), None, name)
+        except Exception:
+            return INCOMPLETE if end - at < horizon and self.truncated(buffer, at, end) else None
+        if not probe:
+            verdict = self.ends(buffer, at, at + field.length, end)
+            if verdict is not True:
+                return verdict
+        return field
+
+    def truncated(self, buffer: Sequence, at: int, end: int) -> bool:
+        """the frame at offset at reads past end, parsed again only for a frame which failed"""
+        bounded = Bounded(buffer, end)
+        try:
+            self.plan.op(bounded, at, len(buffer), None, self.plan.spec.name)
+        except Exception:
+            pass
+        return bounded.past
+
+    def ends(self, buffer: Sequence, at: int, stop: int, end: int) -> Optional[bool] | object:
+        """True if a frame may be buffer[at:stop], by its checksums and the start of the next one"""
+        if stop > end:
+            return INCOMPLETE
+        if stop == at:
+            return None
+        if self.lookahead and stop < end and not self.plausible(buffer, stop, end):
+            return None
+        if self.checks:
+            frame = buffer[at:stop]
+            for check in self.checks:
+                if not check.verify(frame):
+                    return None
+        return True
+
+    def next(
+            self, buffer: bytes | bytearray, start: int = 0, end: Optional[int] = None, horizon: int = 0
+    ) -> tuple[int, Optional[Field]]:
+        """
+        (offset, frame) of the first valid frame from start on, buffer[end:] is only read by frames reaching there,
+        the frame is None if the one at offset may be complete with more bytes, the offset is end if there is none,
+        see frame() for horizon
+        """
+        end = len(buffer) if end is None else end
+        for at in chain((start,), self.candidates(buffer, start + 1, end)):
+            if at >= end:
+                break
+            if not self.plausible(buffer, at, end):
+                continue
+            # a frame is expected at start, the others are searched for
+            field = self.frame(buffer, at, end, at != start, horizon)
+            if field is INCOMPLETE:
+                return at, None
+            if field is not None:
+                return at, field
+        return end, None
+
+    def frames(
+            self,
+            buffer: bytes | bytearray | memoryview,
+            stats: Optional[BatchStats] = None
+    ) -> Iterator[tuple[int, Field]]:
+        """(offset, frame) of each valid frame of buffer, the bytes between them are counted in stats.skipped"""
+        if isinstance(buffer, memoryview):
+            buffer = bytes(buffer)
+        stats = stats if stats is not None else BatchStats()
+        end = len(buffer)
+        used = 0
+        while used < end:
+            at, field = self.next(buffer, used, end)
+            if field is None:
+                # a truncated frame at the end is skipped too
+                stats.skipped += end - used
+                return
+            stats.skipped += at - used
+            stats.frames += 1
+            stats.bytes += field.length
+            used = at + field.length
+            yield at, field
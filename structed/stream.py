@@ -0,0 +1,176 @@
+"""
+parse frames from a contiguous byte stream, e.g. TCP, serial line or a concatenated capture
+"""
+
+from __future__ import annotations  # to allow forward references in type hint
+from typing import Optional
+from collections.abc import Iterable, Iterator
+
+from structed.field import Field, Specification
+from structed.compiler import Plan, compile
+from structed.batch import BatchStats
+from structed.filter import Filter, Rejected
+from structed.exception import FrameParseError
+from structed.resync import Scanner
+
+
+# appended to the buffer, a frame reaching into it is not complete yet
+PAD = b"\x00"
+
+
+class StreamParser:
+    """
+    Reassemble frames from chunks of arbitrary size.
+    The boundaries come from the specification itself, so it must be self-delimiting,
+    i.e. no field of the root level is greedy.
+    """
+    def __init__(
+            self,
+            scaffold: Specification | Plan,
+            max_frame: int = 1 << 16,
+            stats: Optional[BatchStats] = None,
+            where: Optional[Filter] = None,
+            resync: bool = False
+    ):
+        """
+        :param scaffold: loaded specification or compiled plan
+        :param max_frame: the most bytes kept while waiting for the rest of a frame
+        :param stats: counters to update, frames and bytes include the frames dropped by the filter
+        :param where: only the frames matching it are returned, see parse_many()
+        :param resync: skip the bytes which are not valid frames instead of raising,
+            counted in stats.skipped, see structed.resync.Scanner
+        """
+        if where is not None:
+            self.plan = compile(scaffold.spec if isinstance(scaffold, Plan) else scaffold, where=where)
+        else:
+            self.plan = scaffold if isinstance(scaffold, Plan) else compile(scaffold)
+        # finds the end of a frame, parsing only what the lengths depend on
+        self.extent = compile(self.plan.spec, fields=())
+        self.scanner = Scanner(self.plan.spec) if resync else None
+        self.max_frame = max_frame
+        self.stats = stats if stats is not None else BatchStats()
+        self.pending = bytearray()
+        # bytes the frame at the start of pending needs, known from its header, 0 if not known
+        self.needed = 0
+
+    def feed(self, chunk: bytes) -> list[Field]:
+        """parse every frame completed by chunk, the rest is kept for the next feed"""
+        self.pending += chunk
+        if len(self.pending) < self.needed:
+            return []  # the frame is not complete yet, not parsed again
+        op = self.plan.op
+        name = self.plan.spec.name
+        # every emitted field shares this buffer, it is never modified afterwards
+        data = b"".join((self.pending, PAD))
+        end = len(data) - len(PAD)
+        if self.scanner is not None:
+            return self.resync(data, end)
+        fields = []
+        used = 0
+        self.needed = 0
+        while used < end:
+            try:
+                try:
+                    field = op(data, used, len(data), None, name)
+                    keep = True
+                except Rejected:
+                    field = self.extent.op(data, used, len(data), None, name)
+                    keep = False
+            except Exception as e:
+                needed = self.wait(data, used, end)
+                complete = 0 < needed <= end - used
+                if not complete and end - used < self.max_frame:
+                    # may be an incomplete frame, wait for more bytes
+                    self.needed = needed
+                    break
+                if fields:
+                    break  # the frames before it are returned first, it is raised by the next feed
+                self.stats.failures += 1
+                # the frames after a bad one of known length are still parsed by the next feeds
+                self.pending = bytearray(memoryview(data)[used + needed:end]) if complete else bytearray()
+                self.needed = 0
+                raise FrameParseError(f"Cannot parse frame at stream offset {used}.") from e
+            if used + field.length > end:
+                # the frame reaches into the padding
+                self.needed = self.wait(data, used, end)
+                break
+            if field.length == 0:
+                raise FrameParseError(f"Frame of '{name}' has no length, the stream cannot advance.")
+            used += field.length
+            self.stats.frames += 1
+            self.stats.bytes += field.length
+            if not keep:
+                self.plan.where.skips += 1
+            elif self.plan.where is None or self.plan.where.count(field, self.plan.slots, self.plan.mark):
+                fields.append(field)
+
+        self.pending = bytearray(memoryview(data)[used:end])
+        if len(self.pending) > self.max_frame:
+            self.stats.failures += 1
+            self.pending = bytearray()
+            self.needed = 0
+            raise FrameParseError(f"Frame exceeds {self.max_frame} bytes.")
+        return fields
+
+    def wait(self, data: bytes, used: int, end: int) -> int:
+        """
+        bytes the frame at used needs before it is parsed again, by the lengths in its header,
+        0 if the header is not complete, so the bytes of a frame are not parsed again on every feed.
+        At most max_frame + 1, no frame is kept longer than max_frame bytes.
+        """
+        def received(f: Field) -> bool:
+            """the values of f were parsed from the bytes received"""
+            if f.is_leaf:
+                return f.is_virtual or f.stop <= end
+            return all(received(c) for c in f.children)
+
+        try:
+            # not clamped to the bytes received, so the lengths are the ones declared
+            field = self.extent.op(data, used, used + self.max_frame + 1, None, self.plan.spec.name)
+        except Exception:
+            return 0
+        if not received(field):
+            return 0
+        return min(field.length, self.max_frame + 1)
+
+    def resync(self, data: bytes, end: int) -> list[Field]:
+        """parse the valid frames of data[:end], skipping the bytes between them"""
+        fields = []
+        used = 0
+        self.needed = 0
+        while used < end:
+            # a frame failing to parse may only lack bytes, like in feed()
+            at, field = self.scanner.next(data, used, end, self.max_frame)
+            while field is None and end - at > self.max_frame:
+                # waited too long for the rest of this one, it is not a frame
+                at, field = self.scanner.next(data, at + 1, end, self.max_frame)
+            self.stats.skipped += at - used
+            used = at
+            if field is None:
+                if at < end:
+                    self.needed = self.wait(data, at, end)
+                break
+            used += field.length
+            self.stats.frames += 1
+            self.stats.bytes += field.length
+            if self.plan.where is None or self.plan.where.count(field, self.plan.slots, self.plan.mark):
+                fields.append(field)
+        self.pending = bytearray(memoryview(data)[used:end])
+        return fields
+
+
+def parse_stream(
+        scaffold: Specification | Plan,
+        chunks: Iterable[bytes],
+        max_frame: int = 1 << 16,
+        stats: Optional[BatchStats] = None,
+        where: Optional[Filter] = None,
+        resync: bool = False
+) -> Iterator[Field]:
+    """
+    lazily parse the frames of a stream,
+    e.g. chunks = iter(lambda: sock.recv(4096), b"")
+    """
+    parser = StreamParser(scaffold, max_frame, stats, where, resync)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
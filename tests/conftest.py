@@ -0,0 +1,17 @@
+import pytest
+
+from structed import handler, json_codec
+
+
+@pytest.fixture
+def scoped_handlers():
+    """the handlers added by the test with add_external_handler() are removed after it"""
+    saved = dict(vars(handler))
+    yield
+    for name in [x for x in vars(handler) if x not in saved]:
+        delattr(handler, name)
+    for name, func in saved.items():
+        if getattr(handler, name, None) is not func:
+            setattr(handler, name, func)
+    # the handlers registered are cached by structed.cache
+    json_codec.registrations += 1
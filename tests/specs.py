@@ -0,0 +1,91 @@
+"""specifications shared by the tests"""
+
+from structed.handler import hex2bytes
+
+spec_udp = """{
+    "src_port": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "dst_port": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "length": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "checksum": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "data": {
+        "_length": ["#", "length"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+spec_udp_checksum = """{
+    "src_port": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "dst_port": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "length": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "checksum": {
+        "_length": 2,
+        "_handler": "#bytes2int_b",
+        "_check": "internet"
+    },
+    "data": {
+        "_length": ["#", "length"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+spec_array = """{
+    "count": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "@items": {
+        "_size": ["#", "count"],
+        "tag": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "body": {
+            "_length": ["#", "tag"],
+            "_handler": "#bytes2hex"
+        }
+    },
+    "@rest": {
+        "_size": "greedy",
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    }
+}"""
+
+spec_tlv = """{
+    "tag": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "len": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "value": {
+        "_length": ["#", "len"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+raw_udp = hex2bytes("30391f40000cd20f2058866fffce")
+raw_array = hex2bytes("0201aa02bbcc0708")
@@ -0,0 +1,77 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from structed import decode, load
+from structed.aio import DatagramParser, read_frames
+from specs import spec_tlv
+
+
+async def udp_loopback(frames: list[bytes], **kwargs) -> list[dict]:
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: DatagramParser(load(decode(spec_tlv)), **kwargs),
+        local_addr=("127.0.0.1", 0)
+    )
+    sender, _ = await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol, remote_addr=transport.get_extra_info("sockname")
+    )
+    for frame in frames:
+        sender.sendto(frame)
+    results = []
+    async for field, addr in protocol:
+        results.append(dict(field))
+        if len(results) == len(frames):
+            break
+    sender.close()
+    transport.close()
+    return results
+
+
+async def tcp_loopback(data: bytes) -> list[dict]:
+    async def serve(reader, writer):
+        for i in range(0, len(data), 3):
+            writer.write(data[i:i + 3])
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(serve, "127.0.0.1", 0)
+    reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname())
+    results = [dict(x) async for x in read_frames(reader, load(decode(spec_tlv)), chunk_size=4)]
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return results
+
+
+class TestAio:
+    def test_datagram(self):
+        frames = [b"\x01\x02ab", b"\x02\x00", b"\x03\x01c"]
+        results = asyncio.run(udp_loopback(frames))
+        assert results == [
+            {"tag": 1, "len": 2, "value": "6162"},
+            {"tag": 2, "len": 0, "value": ""},
+            {"tag": 3, "len": 1, "value": "63"}
+        ]
+
+    def test_offload(self):
+        frames = [b"\x01\x02ab", b"\x02\x40" + bytes(64)]
+        results = asyncio.run(udp_loopback(frames, offload_size=16))
+        assert sorted(x["tag"] for x in results) == [1, 2]
+
+    def test_process_pool(self):
+        with ProcessPoolExecutor(1) as pool:
+            with pytest.raises(ValueError):
+                DatagramParser(load(decode(spec_tlv)), offload_size=16, executor=pool)
+
+    def test_closed(self):
+        async def closed():
+            protocol = DatagramParser(load(decode(spec_tlv)))
+            protocol.connection_lost(None)
+            return [x async for x in protocol]
+        assert asyncio.run(closed()) == []
+
+    def test_stream(self):
+        data = b"\x01\x02ab\x02\x00\x03\x01c"
+        assert [x["tag"] for x in asyncio.run(tcp_loopback(data))] == [1, 2, 3]
@@ -0,0 +1,36 @@
+import pytest
+
+from structed import decode, load, parse, parse_many, BatchStats
+from specs import spec_tlv
+
+frames = [
+    bytes.fromhex("0102aabb"),
+    bytes.fromhex("0200"),
+    bytes.fromhex("0301cc"),
+]
+
+
+def bad(x: bytes) -> int:
+    raise ValueError(x)
+
+
+class TestBatch:
+    def test_parse_many(self):
+        spec = load(decode(spec_tlv))
+        stats = BatchStats()
+        results = parse_many(spec, iter(frames), stats)
+        assert stats.frames == 0  # lazy
+        assert [dict(x) for x in results] == [dict(parse(spec, x)) for x in frames]
+        assert (stats.frames, stats.bytes, stats.failures) == (3, 9, 0)
+
+    def test_failures(self):
+        spec = load(decode(spec_tlv))
+        spec.children[2].handler = bad
+        stats = BatchStats()
+        with pytest.raises(ValueError):
+            list(parse_many(spec, frames, stats))
+        assert stats.failures == 1
+
+        stats = BatchStats()
+        assert list(parse_many(spec, frames, stats, skip_errors=True)) == [None] * 3
+        assert (stats.frames, stats.failures) == (3, 3)
@@ -0,0 +1,25 @@
+from benchmarks import bench, corpora
+from structed import decode, load, parse
+
+
+class TestBenchmarks:
+    def test_corpora(self):
+        corpora.register_dcch_handlers()
+        for name, (path, _, _) in corpora.CORPORA.items():
+            with open(path) as fp:
+                spec = load(decode(fp.read()))
+            frames = list(corpora.generate(name, 20))
+            assert frames == list(corpora.generate(name, 20))
+            for raw in frames:
+                assert parse(spec, raw).length == len(raw)
+
+    def test_run(self):
+        result = bench.run(20, names=["udp_short", "dcch"], engines=["interpreter", "compile"], load_repeat=2)
+        assert {bench.key(x) for x in result["results"]} == {
+            ("udp.json", "-", "load"), ("dcch.json", "-", "load"),
+            *((c, e, s) for c in ("udp_short", "dcch") for e in ("interpreter", "compile")
+              for s in ("parse", "parse+dict")),
+        }
+        for x in result["results"]:
+            assert x["frames_per_s"] > 0 and x["p99_us"] >= x["p50_us"] and x["peak_bytes"] > 0
+        assert len(bench.compare(result, result)) == len(result["results"]) + 1
@@ -0,0 +1,94 @@
+import pytest
+
+from structed import decode, load, parse, compile, compile_frame, add_external_handler
+from structed.handler import pure
+from structed.exception import SpecParseError
+from structed.cache import to_bytes, from_bytes
+
+
+@pure
+def bits2bin(x: int) -> str:
+    return bin(x)
+
+
+@pytest.fixture
+def ipv4_handlers(scoped_handlers):
+    """bits2bin of spec_ipv4 is registered for the test only"""
+    add_external_handler(bits2bin)
+
+spec_ipv4 = """{
+    "first": {
+        "_length": 1,
+        "version": {
+            "_bits": 4
+        },
+        "ihl": {
+            "_bits": 4
+        }
+    },
+    "fragment": {
+        "_length": 2,
+        "flags": {
+            "_bits": 3,
+            "_handler": "#bits2bin"
+        },
+        "offset": {
+            "_bits": 13
+        }
+    },
+    "options": {
+        "_length": ["#", "ihl"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+raw_ipv4 = bytes.fromhex("4240052233")
+expected = {
+    "first": {"version": 4, "ihl": 2},
+    "fragment": {"flags": "0b10", "offset": 5},
+    "options": "2233",
+}
+
+
+class TestBits:
+    def test_parse(self, ipv4_handlers):
+        field = parse(load(decode(spec_ipv4)), raw_ipv4)
+        assert dict(field) == expected
+        assert field.children[0].children[1].raw == b"\x42"
+
+    def test_engines(self, ipv4_handlers):
+        spec = load(decode(spec_ipv4))
+        assert dict(parse(compile(spec), raw_ipv4)) == expected
+        assert dict(parse(compile(spec, table_budget=0), raw_ipv4)) == expected
+        assert dict(parse(compile_frame(spec), raw_ipv4)) == expected
+        assert dict(parse(from_bytes(to_bytes(spec)), raw_ipv4)) == expected
+
+    def test_truncated(self, ipv4_handlers):
+        spec = load(decode(spec_ipv4))
+        field = parse(spec, raw_ipv4[:2])
+        assert dict(field)["fragment"] == {"flags": "0b10", "offset": 0}
+        assert dict(parse(compile(spec), raw_ipv4[:2])) == dict(field)
+
+    @pytest.mark.parametrize("spec", [
+        '{"word": {"_length": 1, "a": {"_bits": 4}, "b": {"_length": 1}}}',
+        '{"word": {"a": {"_bits": 4}}}',
+        '{"word": {"_length": 1, "a": {"_bits": 9}}}',
+    ])
+    def test_invalid(self, spec):
+        with pytest.raises(SpecParseError):
+            load(decode(spec))
+
+
+class TestBitsColumnar:
+    def test_columns(self, ipv4_handlers):
+        pytest.importorskip("numpy")
+        from structed.columnar import parse_columns
+        spec = load(decode(spec_ipv4))
+        frames = [raw_ipv4, bytes.fromhex("4fffff")]
+        columns = parse_columns(spec, frames)
+        assert list(columns["first.version"]) == [4, 4]
+        assert list(columns["first.ihl"]) == [2, 15]
+        assert list(columns["fragment.flags"]) == ["0b10", "0b111"]
+        assert list(columns["fragment.offset"]) == [5, 0x1fff]
+        assert "first" not in columns.columns
+        assert list(columns.tail_lengths) == [2, 0]
@@ -0,0 +1,39 @@
+import os
+
+from structed import decode, load, parse, add_external_handler
+from structed.cache import load_cached, fingerprint, to_bytes, from_bytes
+from specs import spec_udp
+
+raw = bytes.fromhex("303900500002ffffaabb")
+
+
+def h_cache_test(x: bytes) -> int:
+    return len(x)
+
+
+class TestCache:
+    def test_round_trip(self):
+        spec = load(decode(spec_udp))
+        restored = from_bytes(to_bytes(spec))
+        assert dict(parse(restored, raw)) == dict(parse(spec, raw))
+        assert restored.children[4].length.slots == spec.children[4].length.slots
+
+    def test_load_cached(self, tmp_path):
+        cold = load_cached(spec_udp, str(tmp_path))
+        assert len(os.listdir(tmp_path)) == 1
+        warm = load_cached(spec_udp, str(tmp_path))
+        assert warm is not cold
+        assert dict(parse(warm, raw)) == dict(parse(cold, raw))
+
+    def test_invalidation(self, tmp_path, scoped_handlers):
+        before = fingerprint(spec_udp)
+        add_external_handler(h_cache_test)
+        assert fingerprint(spec_udp) != before
+        assert fingerprint(spec_udp + " ") != fingerprint(spec_udp)
+
+    def test_corrupted(self, tmp_path):
+        load_cached(spec_udp, str(tmp_path))
+        for name in os.listdir(tmp_path):
+            (tmp_path / name).write_bytes(b"garbage")
+        spec = load_cached(spec_udp, str(tmp_path))
+        assert dict(parse(spec, raw))["src_port"] == 12345
@@ -0,0 +1,135 @@
+import binascii
+import random
+import zlib
+
+import numpy as np
+import pytest
+
+from structed import decode, load, parse_many, compile_frame, BatchStats, verify, verify_many
+from structed.cache import to_bytes, from_bytes
+from structed.checksum import ALGORITHMS, Check, internet, failed
+from structed.exception import SpecParseError
+from specs import spec_udp_checksum
+
+spec_trailer = """{
+    "header": {
+        "len": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        }
+    },
+    "payload": {
+        "_length": ["#", "len"],
+        "_handler": "#bytes2hex"
+    },
+    "footer": {
+        "mic": {
+            "_length": 2,
+            "_handler": "#bytes2hex",
+            "_check": ["crc16_ccitt", 0, -6]
+        },
+        "fcs": {
+            "_length": 4,
+            "_handler": "#bytes2hex",
+            "_check": ["crc32", 0, -4]
+        }
+    }
+}"""
+
+
+def udp(data: bytes) -> bytes:
+    head = (1234).to_bytes(2, "big") + (80).to_bytes(2, "big") + len(data).to_bytes(2, "big")
+    checksum = internet(head + b"\0\0" + data)
+    return head + checksum.to_bytes(2, "big") + data
+
+
+def trailer(payload: bytes) -> bytes:
+    frame = bytes([len(payload)]) + payload
+    frame += binascii.crc_hqx(frame, 0xFFFF).to_bytes(2, "big")
+    return frame + zlib.crc32(frame).to_bytes(4, "big")
+
+
+def reference_internet(data: bytes) -> int:
+    data += b"\0" * (len(data) % 2)
+    total = sum(int.from_bytes(data[i:i + 2], "big") for i in range(0, len(data), 2))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+class TestChecksum:
+    def test_algorithms(self):
+        rng = random.Random(0)
+        rows = np.array([[rng.randrange(256) for _ in range(9)] for _ in range(16)], dtype=np.uint8)
+        for algorithm in ALGORITHMS.values():
+            expected = [algorithm.compute(bytes(x)) for x in rows]
+            assert algorithm.compute_many(rows).tolist() == expected
+        assert [internet(bytes(x)) for x in rows] == [reference_internet(bytes(x)) for x in rows]
+        assert ALGORITHMS["crc16_ccitt"].compute(b"123456789") == 0x29B1
+        assert ALGORITHMS["crc32"].compute(b"123456789") == 0xCBF43926
+
+    def test_verify(self):
+        spec = load(decode(spec_udp_checksum))
+        good = udp(b"\x01\x02\x03")
+        bad = good[:-1] + b"\x00"
+        assert verify(spec, good) and verify(spec, memoryview(good))
+        assert not verify(spec, bad)
+        assert not verify(spec, good[:5])
+
+    def test_trailer(self):
+        spec = load(decode(spec_trailer))
+        assert [(c.path, c.offset) for c in spec.checks] == [("footer.mic", -6), ("footer.fcs", -4)]
+        frames = [trailer(b"abc"), trailer(b""), trailer(b"hello")]
+        assert all(verify(spec, x) for x in frames)
+        assert not verify(spec, frames[0][:2] + b"x" + frames[0][3:])
+        assert from_bytes(to_bytes(spec)).checks[1].offset == -4
+
+    def test_verify_many(self):
+        spec = load(decode(spec_trailer))
+        frames = [trailer(bytes([i]) * (i % 3)) for i in range(12)]
+        frames[4] = frames[4][:-1] + b"\xff"
+        frames[7] = b""
+        expected = [verify(spec, x) for x in frames]
+        assert expected.count(False) == 2
+        assert verify_many(spec, frames) == expected
+        spec = load(decode(spec_udp_checksum))
+        frames = [udp(bytes([i, i])) for i in range(8)] + [udp(b"\x01" * 3)[:-1] + b"\x02"]
+        assert verify_many(spec, frames) == [True] * 8 + [False]
+
+    def test_parse_many(self):
+        spec = load(decode(spec_udp_checksum))
+        frames = [udp(b"\x01\x02"), udp(b"\x03\x04")[:-1] + b"\x00", udp(b"")]
+        stats = BatchStats()
+        results = list(parse_many(spec, frames, stats=stats, verify=True))
+        assert len(results) == 3
+        assert [len(failed(x)) for x in results] == [0, 1, 0]
+        assert failed(results[1])[0].path == "checksum"
+        assert stats.corrupted == 1
+        # kept apart from the values of the fields
+        assert Check not in results[1].symbols
+        results = list(parse_many(compile_frame(spec), frames, verify=True))
+        assert [len(failed(x)) for x in results] == [0, 1, 0]
+        # not verified by default
+        assert [failed(x) for x in parse_many(spec, frames)] == [(), (), ()]
+
+    def test_range(self):
+        # the checksum covers the frame after its own field when only the start is given
+        spec = load(decode('{"fcs": {"_length": 4, "_handler": "#bytes2int_b", "_check": ["crc32", 4]},'
+                           ' "data": {"_length": 3, "_handler": "#bytes2hex"}}'))
+        check, = spec.checks
+        assert (check.start, check.stop) == (4, None)
+        frame = zlib.crc32(b"abc").to_bytes(4, "big") + b"abc"
+        assert verify(spec, frame)
+        assert not verify(spec, zlib.crc32(b"").to_bytes(4, "big") + b"abc")
+
+    def test_invalid(self):
+        with pytest.raises(Exception):
+            decode('{"a": {"_length": 2, "_check": "md5"}}')
+        with pytest.raises(SpecParseError):
+            load(decode('{"a": {"_length": 4, "_check": "internet"}}'))
+        # after a field of variable length and not at the end
+        with pytest.raises(SpecParseError):
+            load(decode(
+                '{"n": {"_length": 1, "_handler": "#bytes2int_b"}, "a": {"_length": ["#", "n"]},'
+                ' "c": {"_length": 2, "_check": "internet"}, "d": {"_length": ["#", "n"]}}'
+            ))
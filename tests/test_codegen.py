@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from structed import decode, load, parse, compile_generated
+from structed.codegen import generate
+from specs import spec_udp
+
+spec_array_bits = """{
+    "count": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "@items": {
+        "_size": ["#", "count"],
+        "tag": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "body": {
+            "_length": ["#", "tag"],
+            "_handler": "#bytes2hex"
+        }
+    },
+    "word": {
+        "_length": 1,
+        "high": {
+            "_bits": 3
+        },
+        "low": {
+            "_bits": 5
+        }
+    },
+    "@rest": {
+        "_size": "greedy",
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    }
+}"""
+
+cases = [
+    (spec_udp, bytes.fromhex("30391f400004d20fdeadbeef")),
+    (spec_array_bits, bytes.fromhex("0201aa02bbccf10708")),
+]
+
+
+def tree(field):
+    """everything observable of a parsed field"""
+    return (
+        field.name, field.is_virtual, None if field.is_virtual else field.start, field.length,
+        field.value if field.is_leaf else None,
+        tuple(tree(x) for x in field.children)
+    )
+
+
+class TestCodegen:
+    @pytest.mark.parametrize("text, raw", cases)
+    def test_same_as_specification(self, text, raw):
+        spec = load(decode(text))
+        plan = compile_generated(spec)
+        # truncated raw included
+        for stop in range(len(raw) + 1):
+            assert tree(parse(plan, raw[:stop])) == tree(parse(spec, raw[:stop]))
+        assert tree(parse(plan, memoryview(raw))) == tree(parse(spec, raw))
+
+    def test_unrolled(self):
+        source = generate(load(decode(spec_udp)))
+        # the fixed leaves are read at constant offsets, without a loop
+        assert "raw[used + 4] << 8 | raw[used + 5]" in source
+        assert "for " not in source
+
+    def test_module(self, tmp_path):
+        spec = load(decode(spec_array_bits))
+        path = str(tmp_path / "array_parser.py")
+        plan = compile_generated(spec, path)
+        assert os.path.exists(path)
+        raw = cases[1][1]
+        assert tree(parse(plan, raw)) == tree(parse(spec, raw))
+        # generated again only if the source changed
+        mtime = os.stat(path).st_mtime_ns
+        compile_generated(spec, path)
+        assert os.stat(path).st_mtime_ns == mtime
+
+    def test_unregistered_handler(self):
+        spec = load(decode(spec_udp))
+        spec.children[0].handler = lambda x: x
+        with pytest.raises(ValueError):
+            generate(spec)
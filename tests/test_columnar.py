@@ -0,0 +1,56 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from structed import decode, load, parse
+from structed.columnar import Layout, parse_columns
+from specs import spec_udp
+
+spec_nested = """{
+    "header": {
+        "type": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "flags": {
+            "_length": 2,
+            "_handler": "#bytes2hex"
+        }
+    },
+    "@items": {
+        "_size": "greedy",
+        "_length": 1
+    }
+}"""
+
+frames = [
+    bytes.fromhex("30391f400004d20fdeadbeef"),
+    bytes.fromhex("a5fede7b0002ffff0102ff"),
+    bytes.fromhex("0001"),
+]
+
+
+class TestColumnar:
+    def test_layout(self):
+        layout = Layout(load(decode(spec_udp)))
+        assert layout.size == 8
+        assert layout.dtype.names == ("src_port", "dst_port", "length", "checksum")
+        assert [x.name for x in layout.tail] == ["data"]
+
+    def test_parse_columns(self):
+        spec = load(decode(spec_udp))
+        columns = parse_columns(spec, frames)
+        assert list(columns.valid) == [True, True, False]
+        for i, raw in enumerate(frames[:2]):
+            field = dict(parse(spec, raw))
+            for name in ("src_port", "dst_port", "length", "checksum"):
+                assert columns[name][i] == field[name]
+            assert columns.tail_name == "data"
+            assert columns.tail(i).hex() == field["data"]
+        assert columns.tail_lengths[2] == 0
+
+    def test_nested(self):
+        columns = parse_columns(load(decode(spec_nested)), [b"\x01\xab\xcd\x05", b"\x02\x00\x01"])
+        assert list(columns["header.type"]) == [1, 2]
+        assert columns["header.flags"].tolist() == [[0xab, 0xcd], [0, 1]]
+        assert list(columns.tail_lengths) == [1, 0]
@@ -0,0 +1,137 @@
+import pytest
+
+from structed import decode, load, parse, compile, Plan
+from structed.handler import pure
+from specs import spec_udp, spec_array, raw_udp, raw_array
+
+
+class TestCompiler:
+    def test_compile(self):
+        plan = compile(load(decode(spec_udp)))
+        assert isinstance(plan, Plan)
+
+    def test_same_as_specification(self):
+        for spec, raw in [(spec_udp, raw_udp), (spec_array, raw_array)]:
+            spec = load(decode(spec))
+            assert dict(parse(compile(spec), raw)) == dict(parse(spec, raw))
+
+    def test_fixed_run(self):
+        field = parse(compile(load(decode(spec_udp))), raw_udp)
+        assert dict(field) == {
+            "src_port": 12345,
+            "dst_port": 8000,
+            "length": 12,
+            "checksum": 53775,
+            "data": "2058866fffce"
+        }
+        assert field.length == len(raw_udp)
+
+    def test_structural(self):
+        field = parse(compile(load(decode(spec_array))), raw_array)
+        assert dict(field) == {
+            "count": 2,
+            "@items": {
+                "items[0]": {"tag": 1, "body": "aa"},
+                "items[1]": {"tag": 2, "body": "bbcc"}
+            },
+            "@rest": {"rest[0]": 7, "rest[1]": 8}
+        }
+
+    def test_memoryview(self):
+        for spec, raw in [(spec_udp, raw_udp), (spec_array, raw_array)]:
+            spec = load(decode(spec))
+            for scaffold in (spec, compile(spec)):
+                field = parse(scaffold, memoryview(raw))
+                assert isinstance(field.raw, memoryview)
+                assert field.raw == raw
+                assert dict(field) == dict(parse(spec, raw))
+
+    def test_lazy(self):
+        calls = []
+
+        def spy(x: bytes) -> str:
+            calls.append(x)
+            return x.hex()
+
+        spec = load(decode(spec_udp))
+        spec.children[4].handler = spy
+        spec.children[0].handler = spy
+        field = parse(compile(spec, lazy=True), raw_udp)
+        assert calls == []
+        # length is needed by data, so it is parsed eagerly
+        assert field.children[2].pending is None
+        assert field.get("data") == "2058866fffce"
+        assert len(calls) == 1
+        lazy = dict(field)
+        assert len(calls) == 2
+        assert lazy == dict(parse(spec, raw_udp))
+
+    def test_lookup_table(self):
+        calls = []
+
+        @pure
+        def small(x: bytes) -> int:
+            calls.append(x)
+            if x[0] > 0xf0:
+                raise KeyError(x)
+            return x[0] * 2
+
+        spec = load(decode(spec_udp))
+        spec.children[0].length = 1
+        spec.children[0].handler = small
+        spec.children[1].length = 3
+        plan = compile(spec)
+        assert len(calls) == 256  # evaluated once per input at compile time
+        field = parse(plan, raw_udp[:1] + raw_udp[2:])
+        assert field.get("src_port") == 0x30 * 2
+        assert field.get("dst_port") == 0x1f4000
+        assert len(calls) == 256
+        with pytest.raises(KeyError):
+            parse(plan, b"\xff" + raw_udp[2:])
+        assert parse(compile(spec, table_budget=0), raw_udp).get("src_port") == 0x30 * 2
+
+    def test_mutable_results_not_shared(self):
+        @pure
+        def flags(x: bytes) -> dict:
+            return {"on": x[0] & 1 == 1}
+
+        spec = load(decode(spec_udp))
+        spec.children[0].length = 1
+        spec.children[0].handler = flags
+        raw = raw_udp[:1] + raw_udp[2:]
+        first = parse(compile(spec), raw)
+        first.get("src_port")["on"] = None
+        assert parse(compile(spec), raw).get("src_port") == {"on": False}
+
+    def test_tables_cap(self, monkeypatch):
+        from structed import compiler
+        monkeypatch.setattr(compiler, "TABLES", {})
+        monkeypatch.setattr(compiler, "TABLES_CAP", 1 << 16)
+        spec = load(decode(spec_udp))
+        plan = compile(spec)
+        assert list(compiler.TABLES) == [(spec.children[0].handler, 2)]
+        other = load(decode('{"a": {"_length": 1, "_handler": "#bytes2hex"}}'))
+        compile(other)
+        # the table of 2 bytes is dropped for the one of 1 byte, the plan still has it
+        assert list(compiler.TABLES) == [(other.children[0].handler, 1)]
+        assert parse(plan, raw_udp).get("src_port") == 0x3039
+
+    def test_lru(self):
+        calls = []
+
+        @pure
+        def wide(x: bytes) -> int:
+            calls.append(x)
+            return int.from_bytes(x, "big")
+
+        spec = load(decode(spec_udp))
+        spec.children[1].length = 4
+        spec.children[1].handler = wide
+        raw = raw_udp[:2] + raw_udp[2:4] * 2 + raw_udp[6:]
+        for _ in range(3):
+            parse(compile(spec), raw)
+        assert len(calls) == 3  # not cached by default
+        plan = compile(spec, lru_size=16)
+        for _ in range(3):
+            parse(plan, raw)
+        assert len(calls) == 4
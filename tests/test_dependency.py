@@ -0,0 +1,123 @@
+import pytest
+
+from structed import decode, load, parse, compile, compile_frame
+from structed.exception import SpecParseError
+
+spec_nested = """{
+    "header": {
+        "type": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "len": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        }
+    },
+    "@items": {
+        "_size": ["#", "type"],
+        "len": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "body": {
+            "_length": ["#", "len"],
+            "_handler": "#bytes2hex"
+        }
+    },
+    "tail": {
+        "_length": ["#", "len"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+spec_unknown = """{
+    "data": {
+        "_length": ["#", "length"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+spec_non_leaf = """{
+    "header": {
+        "a": {
+            "_length": 1
+        }
+    },
+    "data": {
+        "_length": ["#", "header"]
+    }
+}"""
+
+spec_after_array = """{
+    "count": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "@items": {
+        "_size": ["#", "count"],
+        "len": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "body": {
+            "_length": ["#", "len"],
+            "_handler": "#bytes2hex"
+        }
+    },
+    "tail": {
+        "_length": ["#", "len"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+raw = bytes.fromhex("020101aa02bbcc")
+
+
+class TestDependency:
+    def test_bind(self):
+        spec = load(decode(spec_nested))
+        header, items, tail = spec.children
+        assert header.children[0].slot is not None
+        assert items.size.slots == (header.children[0].slot,)
+        # the nearest "len" is the one in the same element
+        assert items.children[1].length.slots == (items.children[0].slot,)
+
+    def test_nearest(self):
+        spec = load(decode(spec_nested))
+        for scaffold in (spec, compile(spec)):
+            field = parse(scaffold, raw)
+            assert dict(field) == {
+                "header": {"type": 2, "len": 1},
+                "@items": {
+                    "items[0]": {"len": 1, "body": "aa"},
+                    "items[1]": {"len": 2, "body": "bbcc"}
+                },
+                "tail": ""
+            }
+
+    def test_parent(self):
+        # a name not in the specification is looked up in the parent frame passed to parse()
+        spec = load(decode(spec_unknown))
+        assert spec.children[0].length.slots is None
+        outer = parse(load(decode('{"length": {"_length": 1, "_handler": "#bytes2int_b"}}')), b"\x02")
+        for scaffold in (spec, compile(spec)):
+            assert dict(parse(scaffold, b"abcd", outer)) == {"data": "6162"}
+            with pytest.raises(Exception):
+                parse(scaffold, b"abcd")
+
+    def test_after_array(self):
+        # the first element, like Field.get(), not the last one to write a slot
+        spec = load(decode(spec_after_array))
+        items, tail = spec.children[1:]
+        assert tail.length.slots is None and items.children[1].length.slots is not None
+        raw = bytes.fromhex("0201aa02bbccddee")
+        for scaffold in (spec, compile(spec)):
+            assert parse(scaffold, raw).get("tail") == "dd"
+        assert dict(parse(spec, raw, fields=["tail"]))["tail"] == "dd"
+        with pytest.raises(SpecParseError):
+            compile_frame(spec)
+
+    def test_non_leaf(self):
+        with pytest.raises(SpecParseError):
+            load(decode(spec_non_leaf))
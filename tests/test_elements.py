@@ -0,0 +1,61 @@
+import pytest
+
+from structed import decode, load, parse, compile, compile_frame
+
+spec_array = """{
+    "count": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "@words": {
+        "_size": ["#", "count"],
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "@rest": {
+        "_size": "greedy",
+        "_length": 3,
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+
+def expected(raw: bytes) -> dict:
+    """what parsing one element after another gives"""
+    count = raw[0] if raw else 0
+    used = 1
+    words = {}
+    for i in range(count):
+        b = min(used + 2, len(raw))
+        words[f"words[{i}]"] = int.from_bytes(raw[used:b], "big")
+        used = b
+    rest = {}
+    while used < len(raw):
+        b = min(used + 3, len(raw))
+        rest[f"rest[{len(rest)}]"] = raw[used:b].hex()
+        used = b
+    # an empty structural variable is a leaf without value
+    return {"count": count, "@words": words or None, "@rest": rest or None}
+
+
+class TestElements:
+    @pytest.mark.parametrize("raw", [
+        bytes.fromhex("020102030405060708"),
+        bytes.fromhex("0201020304050607"),
+        bytes.fromhex("03010203"),
+        bytes.fromhex("00aabbccdd"),
+    ])
+    def test_same_as_one_by_one(self, raw):
+        spec = load(decode(spec_array))
+        assert dict(parse(spec, raw)) == expected(raw)
+        assert dict(parse(compile(spec), raw)) == expected(raw)
+        assert dict(parse(compile_frame(spec), raw)) == expected(raw)
+
+    def test_fields(self):
+        spec = load(decode(spec_array))
+        field = parse(spec, bytes.fromhex("02010203040506"))
+        words, rest = field.children[1], field.children[2]
+        assert [x.name for x in words.children] == ["words[0]", "words[1]"]
+        assert [(x.start, x.stop) for x in words.children] == [(1, 3), (3, 5)]
+        assert (words.length, rest.length) == (4, 2)
+        assert spec.children[1].element is spec.children[1].element
@@ -0,0 +1,103 @@
+import pytest
+
+from structed import decode, load, parse, verify, encode, encode_into, encode_many, Encoder
+from structed.encoder import add_inverse_handler
+from structed.exception import FrameEncodeError
+from specs import spec_udp_checksum
+from test_bits import spec_ipv4, bits2bin, ipv4_handlers
+from test_checksum import spec_trailer, trailer
+from test_switch import spec_mac, frames as frames_mac
+
+spec_array = """{
+    "count": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "@items": {
+        "_size": ["#", "count"],
+        "len": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "body": {
+            "_length": ["#", "len"],
+            "_handler": "#"
+        }
+    },
+    "end": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    }
+}"""
+
+
+class TestEncoder:
+    def test_round_trip(self):
+        spec = load(decode(spec_array))
+        raw = bytes.fromhex("0201aa02bbcc0009")
+        assert encode(spec, dict(parse(spec, raw))) == raw
+        spec = load(decode(spec_mac))
+        for raw, value in frames_mac:
+            assert encode(spec, value) == raw
+
+    def test_derived(self):
+        spec = load(decode(spec_array))
+        raw = encode(spec, {"@items": [{"body": b"\xaa"}, {"body": b"\xbb\xcc"}], "end": 9})
+        assert raw == bytes.fromhex("0201aa02bbcc0009")
+        assert encode(spec, {"@items": None, "end": 1}) == bytes.fromhex("000001")
+        spec = load(decode(spec_mac))
+        assert encode(spec, {"body": {"0x01": {"data": "eeff"}}, "tail": 8}) == frames_mac[1][0]
+
+    def test_checksum(self):
+        spec = load(decode(spec_udp_checksum))
+        raw = encode(spec, {"src_port": 1, "dst_port": 2, "data": "aabbcc"})
+        assert dict(parse(spec, raw))["length"] == 3
+        assert verify(spec, raw)
+        spec = load(decode(spec_trailer))
+        assert encode(spec, {"payload": "0102"}) == trailer(b"\x01\x02")
+        # a given checksum is kept, e.g. to test receivers with corrupted frames
+        raw = encode(spec, {"payload": "", "footer": {"mic": "0000", "fcs": "00000000"}})
+        assert raw == bytes(7) and not verify(spec, raw)
+
+    def test_bits(self, ipv4_handlers):
+        add_inverse_handler(bits2bin, lambda x: int(x, 2).to_bytes(1, "big"))
+        spec = load(decode(spec_ipv4))
+        raw = bytes.fromhex("42a001aabb")
+        assert encode(spec, dict(parse(spec, raw))) == raw
+        assert encode(spec, {"first": 0x42, "fragment": 0xa001, "options": "aabb"}) == raw
+
+    def test_many(self):
+        spec = load(decode(spec_array))
+        values = [{"@items": [{"body": bytes(i)}] * i, "end": i} for i in range(5)]
+        buffer, offsets = encode_many(spec, values)
+        assert len(offsets) == 6 and offsets[-1] == len(buffer)
+        encoder = Encoder(spec)
+        for i, value in enumerate(values):
+            raw = bytes(buffer[offsets[i]:offsets[i + 1]])
+            assert raw == encoder.encode(value)
+            assert dict(parse(spec, raw))["end"] == i
+
+    def test_into(self):
+        spec = load(decode(spec_array))
+        buffer = bytearray(b"\xff" * 10)
+        n = encode_into(spec, {"@items": [{"body": b"\xaa"}], "end": 9}, memoryview(buffer), 2)
+        assert buffer == bytes.fromhex("ffff0101aa0009ffffff") and n == 5
+        with pytest.raises(FrameEncodeError):
+            encode_into(spec, {"end": 9}, buffer, 9)
+
+    def test_invalid(self):
+        spec = load(decode(spec_array))
+        with pytest.raises(FrameEncodeError):
+            encode(spec, {"@items": None})
+        with pytest.raises(FrameEncodeError):
+            encode(spec, {"@items": None, "end": 1 << 16})
+        with pytest.raises(FrameEncodeError):
+            encode(spec, {"@items": None, "end": "x"})
+        with pytest.raises(FrameEncodeError):
+            encode(load(decode(spec_mac)), {"body": {"0x07": {}}, "tail": 1})
+        # the length given does not match the value of the field depending on it
+        value = {"@items": [{"len": 3, "body": b"\xaa"}], "end": 1}
+        with pytest.raises(FrameEncodeError):
+            encode(spec, value)
+        with pytest.raises(FrameEncodeError):
+            encode_many(spec, [value])
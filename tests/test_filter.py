@@ -0,0 +1,103 @@
+import pytest
+
+from structed import decode, load, parse_many, parse_stream, compile, add_external_handler, Filter
+from structed.cache import to_bytes
+from structed.exception import SpecParseError
+from structed.filter import Rejected
+
+calls = []
+
+
+def h_filter_count(x: bytes) -> str:
+    calls.append(x)
+    return x.hex()
+
+
+@pytest.fixture(autouse=True)
+def filter_handlers(scoped_handlers):
+    """h_filter_count is registered for each test only"""
+    add_external_handler(h_filter_count)
+
+spec_tlv = """{
+    "header": {
+        "tag": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "len": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        }
+    },
+    "value": {
+        "_length": ["#", "len"],
+        "_handler": "#h_filter_count"
+    }
+}"""
+
+frames = [
+    bytes.fromhex("0102aabb"),
+    bytes.fromhex("0200"),
+    bytes.fromhex("0101cc"),
+]
+
+
+class TestFilter:
+    def test_parse_many(self):
+        calls.clear()
+        where = Filter({"header.tag": 1})
+        results = list(parse_many(load(decode(spec_tlv)), frames, where=where))
+        assert [dict(x)["value"] for x in results] == ["aabb", "cc"]
+        assert (where.hits, where.skips) == (2, 1)
+        assert calls == [b"\xaa\xbb", b"\xcc"]
+
+    def test_early(self):
+        calls.clear()
+        plan = compile(load(decode(spec_tlv)), where=Filter({"header.tag": lambda x: x > 1}))
+        with pytest.raises(Rejected):
+            plan.parse(frames[0])
+        # aborted before value
+        assert calls == []
+
+    def test_predicate(self):
+        where = Filter(["header.tag", "header.len"], lambda tag, n: tag == n)
+        results = list(parse_many(load(decode(spec_tlv)), frames, where=where))
+        assert [dict(x)["header"] for x in results] == [{"tag": 1, "len": 1}]
+        assert (where.hits, where.skips) == (1, 2)
+
+    def test_stream(self):
+        where = Filter({"header.tag": 2})
+        data = b"".join(frames)
+        chunks = [data[i:i + 3] for i in range(0, len(data), 3)]
+        results = list(parse_stream(load(decode(spec_tlv)), chunks, where=where))
+        assert [dict(x)["header"]["tag"] for x in results] == [2]
+        assert (where.hits, where.skips) == (1, 2)
+
+    def test_projection(self):
+        calls.clear()
+        where = Filter({"header.tag": 1})
+        plan = compile(load(decode(spec_tlv)), fields=["header.len"], where=where)
+        results = list(parse_many(plan, frames))
+        assert [dict(x) for x in results] == [{"header": {"tag": 1, "len": 2}}, {"header": {"tag": 1, "len": 1}}]
+        assert calls == []
+
+    def test_shared_spec(self):
+        spec = load(decode(spec_tlv))
+        saved = to_bytes(spec)
+        where = Filter({"header.tag": 1})
+        plan = compile(spec, where=where)
+        # the slot of the filter is given in a copy
+        assert spec.children[0].children[0].slot is None
+        assert plan.spec.children[0].children[0].slot is not None
+        assert to_bytes(spec) == saved
+        assert dict(compile(spec).parse(frames[0])) == dict(plan.parse(frames[0]))
+        field = plan.parse(frames[2])
+        assert field.symbols[plan.mark] is True
+        assert where.count(field, plan.slots, plan.mark) and where.hits == 1
+
+    def test_invalid(self):
+        spec = load(decode(spec_tlv))
+        with pytest.raises(SpecParseError):
+            compile(spec, where=Filter({"header": 1}))
+        with pytest.raises(SpecParseError):
+            compile(spec, where=Filter({"missing": 1}))
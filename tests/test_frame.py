@@ -0,0 +1,47 @@
+from structed import decode, load, parse, compile_frame, FieldView
+from structed.common import LenPolicy
+from specs import spec_array, raw_array
+
+
+def prop(length, handler=None, size=None):
+    return {"_properties": {"length": length, "size": size, "handler": handler}}
+
+
+class TestFrame:
+    def test_same_as_field(self):
+        spec = load(decode(spec_array))
+        field = parse(spec, raw_array)
+        view = parse(compile_frame(spec), raw_array)
+        assert isinstance(view, FieldView)
+        assert dict(view) == dict(field)
+        assert view.length == field.length
+        assert len(view.frame) == 12
+
+    def test_field_api(self):
+        view = parse(compile_frame(load(decode(spec_array))), raw_array)
+        items = view.children[1]
+        assert items.name == "@items" and items.is_virtual and items.raw is None
+        assert items.length == 5
+        second = items.children[1]
+        assert second.name == "items[1]"
+        assert second.raw == bytes.fromhex("02bbcc")
+        assert second.parent == items
+        assert second.get("body") == "bbcc"
+        assert view.get("count") == 2
+
+    def test_fallback(self):
+        # a length decided at runtime is parsed by the specification
+        spec = load({
+            **prop(LenPolicy.auto.value),
+            "kind": prop(1, lambda x: x[0]),
+            "body": {
+                **prop((lambda k: LenPolicy.auto, "kind")),
+                "a": prop(1, lambda x: x[0]),
+                "b": prop(1, lambda x: x[0])
+            },
+            "tail": prop(1, lambda x: x[0])
+        })
+        raw = bytes([0, 1, 2, 3])
+        view = parse(compile_frame(spec), raw)
+        assert dict(view) == dict(parse(spec, raw)) == {"kind": 0, "body": {"a": 1, "b": 2}, "tail": 3}
+        assert view.children[1].length == 2
@@ -0,0 +1,44 @@
+from structed import decode, load, parse, parse_parallel, Status
+from structed.parallel import hex_lines
+from structed.quarantine import Code
+from specs import spec_tlv
+
+frames = [bytes([i % 256, 2, i % 7, i % 5]) for i in range(100)]
+
+# its handler is registered by the workers from this module
+spec_tag = """{
+    "tag": {"_length": 1, "_handler": "#h_parallel_tag"},
+    "value": {"_length": 1, "_handler": "#bytes2int_b"}
+}"""
+
+
+def h_parallel_tag(x: bytes) -> int:
+    if x[0] == 0xff:
+        raise ValueError(x)
+    return x[0]
+
+
+class TestParallel:
+    def test_ordered(self):
+        expected = [dict(parse(load(decode(spec_tlv)), x)) for x in frames]
+        results = parse_parallel(spec_tlv, frames, processes=2, chunk_size=7, max_pending=3)
+        assert list(results) == expected
+
+    def test_unordered(self):
+        expected = [dict(parse(load(decode(spec_tlv)), x)) for x in frames]
+        results = list(parse_parallel(spec_tlv, iter(frames), processes=2, chunk_size=10, ordered=False))
+        assert sorted(x["tag"] for x in results) == sorted(x["tag"] for x in expected)
+
+    def test_bad_frame(self):
+        chunk = [b"\x01\x02", b"\xff\x03", b"\x04\x05"]
+        results = list(parse_parallel(spec_tag, chunk * 3, modules=["test_parallel"], processes=2, chunk_size=2))
+        assert results[::3] == [{"tag": 1, "value": 2}] * 3
+        for status in results[1::3]:
+            assert isinstance(status, Status) and not status
+            assert (status.code, status.path, status.offset) == (Code.handler, "root.tag", 0)
+            assert isinstance(status.error, ValueError)
+
+    def test_hex_lines(self, tmp_path):
+        path = tmp_path / "raw.txt"
+        path.write_text("0102\n\nAABB\n")
+        assert list(hex_lines(str(path))) == [b"\x01\x02", b"\xaa\xbb"]
@@ -0,0 +1,76 @@
+from structed import decode, load, parse, parse_many, compile, Filter, Profile, BatchStats
+from specs import spec_udp, spec_array, raw_udp, raw_array
+from test_switch import spec_mac, frames as frames_mac
+
+
+class TestProfile:
+    def test_same_result(self):
+        profile = Profile()
+        for text, raw in ((spec_udp, raw_udp), (spec_array, raw_array)):
+            spec = load(decode(text))
+            assert dict(parse(spec, raw, profile=profile)) == dict(parse(spec, raw))
+        spec = load(decode(spec_mac))
+        for raw, expected in frames_mac:
+            assert dict(parse(compile(spec), raw, profile=profile)) == expected
+
+    def test_counters(self):
+        spec = load(decode(spec_array))
+        profile = Profile()
+        for _ in range(3):
+            parse(spec, raw_array, profile=profile)
+        root = profile.stats[("root",)]
+        assert root.calls == 3
+        assert root.bytes == 3 * len(raw_array)
+        assert root.total >= profile.stats[("root", "@items")].total
+        count = profile.stats[("root", "count")]
+        assert count.calls == 3 and count.bytes == 3
+        assert list(count.handlers) == ["bytes2int_b"]
+        # the size of @items and the length of each body are looked up
+        assert profile.stats[("root", "@items")].lookups == 3
+        assert profile.stats[("root", "@items", "body")].lookups == 3 * 2
+
+        profile.reset()
+        assert profile.stats[("root",)].calls == 0
+        assert profile.rows() == []
+
+    def test_plan_reused(self):
+        spec = load(decode(spec_udp))
+        profile = Profile()
+        parse(spec, raw_udp, profile=profile)
+        parse(spec, raw_udp, profile=profile)
+        parse(spec, raw_udp, fields=["length"], profile=profile)
+        assert len(profile.plans) == 2
+        assert profile.stats[("root", "data")].calls == 2
+
+    def test_disabled(self):
+        spec = load(decode(spec_udp))
+        plan = compile(spec)
+        assert plan.spec is spec
+        parse(plan, raw_udp)
+        assert spec.projections == {}
+
+    def test_parse_many(self):
+        spec = load(decode(spec_udp))
+        profile = Profile()
+        stats = BatchStats()
+        where = Filter({"src_port": 12345})
+        frames = [raw_udp, b"\x00" + raw_udp[1:], raw_udp]
+        assert len(list(parse_many(spec, frames, stats, where=where, profile=profile))) == 2
+        assert stats.frames == 3
+        assert profile.stats[("root", "src_port")].calls == 3
+        assert profile.stats[("root", "data")].calls == 2
+
+    def test_export(self):
+        spec = load(decode(spec_array))
+        profile = Profile()
+        parse(spec, raw_array, profile=profile)
+        table = profile.table().splitlines()
+        assert table[0].split()[0] == "path"
+        assert {x.split()[0] for x in table[1:]} == {
+            "root", "root.count", "root.@items", "root.@items.tag", "root.@items.body", "root.@rest"
+        }
+        folded = profile.folded().splitlines()
+        assert "root;@items;body;bytes2hex" in {x.rsplit(" ", 1)[0] for x in folded}
+        for line in folded:
+            stack, count = line.rsplit(" ", 1)
+            assert stack.startswith("root") and int(count) >= 0
@@ -0,0 +1,150 @@
+import pytest
+
+from structed import decode, load, parse, compile, add_external_handler
+from structed.compiler import required, project
+from structed.exception import SpecParseError
+
+calls = []
+
+
+def h_projection_count(x: bytes) -> str:
+    calls.append(x)
+    return x.hex()
+
+
+@pytest.fixture(autouse=True)
+def projection_handlers(scoped_handlers):
+    """h_projection_count is registered for each test only"""
+    add_external_handler(h_projection_count)
+
+spec_counted = """{
+    "src_port": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "dst_port": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "length": {
+        "_length": 2,
+        "_handler": "#bytes2int_b"
+    },
+    "checksum": {
+        "_length": 2,
+        "_handler": "#h_projection_count"
+    },
+    "data": {
+        "_length": ["#", "length"],
+        "_handler": "#h_projection_count"
+    },
+    "trailer": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    }
+}"""
+
+spec_nested = """{
+    "header": {
+        "count": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "flags": {
+            "_length": 1,
+            "_handler": "#h_projection_count"
+        }
+    },
+    "@items": {
+        "_size": ["#", "count"],
+        "tag": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "body": {
+            "_length": ["#", "tag"],
+            "_handler": "#h_projection_count"
+        }
+    },
+    "footer": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    }
+}"""
+
+spec_block = """{
+    "block": {
+        "_length": 4,
+        "a": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "b": {
+            "_length": ["#", "a"],
+            "_handler": "#h_projection_count"
+        }
+    },
+    "end": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    }
+}"""
+
+raw_counted = bytes.fromhex("30391f400004d20fdeadbeef07")
+raw_nested = bytes.fromhex("02ff01aa02bbcc09")
+
+
+class TestProjection:
+    def test_fields(self):
+        calls.clear()
+        field = parse(load(decode(spec_counted)), raw_counted, fields=["src_port", "dst_port"])
+        # the root is as long as its children, length is needed to skip over data
+        assert dict(field) == {"src_port": 12345, "dst_port": 8000, "length": 4}
+        assert field.length == len(raw_counted)
+        assert calls == []
+
+    def test_dependencies(self):
+        calls.clear()
+        spec = load(decode(spec_counted))
+        field = parse(spec, raw_counted, fields=["trailer"])
+        # the length of data is needed to find trailer
+        assert dict(field) == {"length": 4, "trailer": 7}
+        assert calls == []
+        assert dict(parse(spec, raw_counted, fields=["data"])) == {"length": 4, "data": "deadbeef"}
+
+    def test_nested(self):
+        calls.clear()
+        spec = load(decode(spec_nested))
+        assert dict(parse(spec, raw_nested, fields=["footer"])) == {
+            "header": {"count": 2}, "@items": {"items[0]": {"tag": 1}, "items[1]": {"tag": 2}}, "footer": 9
+        }
+        assert dict(parse(spec, raw_nested, fields=["header.flags"])) == {
+            "header": {"count": 2, "flags": "ff"}, "@items": {"items[0]": {"tag": 1}, "items[1]": {"tag": 2}}
+        }
+        assert calls == [b"\xff"]
+        full = dict(parse(spec, raw_nested))
+        assert dict(parse(spec, raw_nested, fields=["items.body", "header", "footer"])) == full
+
+    def test_required(self):
+        spec = load(decode(spec_nested))
+        names = {x.name for x in required(spec, ["@items.tag"])}
+        assert names == {"root", "header", "count", "@items", "tag"}
+        # only what the length of the frame depends on
+        assert {x.name for x in required(spec, [])} == {"root", "header", "count", "@items", "tag"}
+        assert {x.name for x in required(load(decode(spec_counted)), [])} == {"root", "length"}
+        spec = load(decode(spec_block))
+        # nothing after the last kept field of a parent of fixed length
+        assert {x.name for x in required(spec, ["block.a"])} == {"root", "block", "a"}
+        assert dict(parse(spec, bytes.fromhex("0102030405"), fields=["block.a", "end"])) == {
+            "block": {"a": 1}, "end": 5
+        }
+
+    def test_plan(self):
+        spec = load(decode(spec_counted))
+        assert project(spec, ["src_port"]) is project(spec, ["src_port"])
+        plan = compile(spec)
+        assert dict(parse(plan, raw_counted, fields=["src_port"])) == {"src_port": 12345, "length": 4}
+
+    def test_unknown(self):
+        with pytest.raises(SpecParseError):
+            parse(load(decode(spec_counted)), raw_counted, fields=["header.src_port"])
@@ -0,0 +1,131 @@
+import logging
+
+import pytest
+
+from structed import (
+    decode, load, parse, parse_many, compile, compile_frame, compile_generated, BatchStats, Quarantine, Status,
+    add_external_handler
+)
+from structed.quarantine import Code, diagnose
+from structed import handler
+from structed.handler import hex2bytes
+from specs import spec_array
+from test_switch import spec_mac
+
+KINDS = {1: 1, 2: 2}
+
+
+def kind(x: bytes) -> int:
+    return KINDS[x[0]]
+
+
+good = hex2bytes("0201aa02bbcc0708")
+bad = hex2bytes("0201aa05bbcc0708")
+
+
+spec_sized = """{
+    "length": {"_length": 1, "_handler": "#bytes2int_b"},
+    "data": {"_length": ["#h_quarantine_length", "length"], "_handler": "#bytes2hex"}
+}"""
+
+
+def h_quarantine_length(x: int) -> int:
+    if x > 0x7f:
+        raise ValueError(x)
+    return "a" if x > 0x3f else x
+
+
+def spec_kinds():
+    spec = load(decode(spec_array))
+    spec.children[1].children[0].handler = kind
+    return spec
+
+
+class TestQuarantine:
+    def test_handler(self):
+        spec = spec_kinds()
+        for scaffold in (spec, compile(spec), compile(spec, table_budget=0), compile_frame(spec)):
+            quarantine = Quarantine()
+            stats = BatchStats()
+            results = list(parse_many(scaffold, [good, bad, good], stats, quarantine=quarantine))
+            assert [bool(x) for x in results] == [True, False, True]
+            status = results[1]
+            assert isinstance(status, Status)
+            assert (status.code, status.path, status.offset) == (Code.handler, "root.@items.items[1].tag", 3)
+            assert isinstance(status.error, KeyError) and status.error.__traceback__ is None
+            assert stats.failures == 1
+            assert quarantine.counts == {Code.handler: 1}
+            assert list(quarantine.frames) == [(bad, status)]
+
+    def test_case(self):
+        spec = load(decode(spec_mac))
+        for scaffold in (spec, compile(spec), compile_frame(spec), compile_generated(spec)):
+            status, = parse_many(scaffold, [bytes.fromhex("05abcd07")], quarantine=Quarantine())
+            assert (status.code, status.path, status.offset) == (Code.case, "root.body", 1)
+
+    def test_malformed(self):
+        spec = load(decode(spec_array))
+        # the length of body is a string
+        spec.children[1].children[0].handler = lambda x: "a"
+        for scaffold in (spec, compile(spec), compile_frame(spec)):
+            status, = parse_many(scaffold, [good], quarantine=Quarantine())
+            assert (status.code, status.path, status.offset) == (Code.malformed, "root.@items.items[0].body", 2)
+
+    def test_dependency(self, scoped_handlers):
+        add_external_handler(h_quarantine_length)
+        spec = load(decode(spec_sized))
+        engines = (spec, compile(spec), compile_frame(spec), compile_generated(spec))
+        for raw, code in ((b"\xf0abc", Code.handler), (b"\x70abc", Code.malformed)):
+            for scaffold in engines:
+                status, = parse_many(scaffold, [raw], quarantine=Quarantine())
+                assert (status.code, status.path, status.offset) == (code, "root.data", 1)
+
+    def test_capacity(self):
+        spec = spec_kinds()
+        quarantine = Quarantine(capacity=2)
+        frames = [bad[:-1] + bytes([i]) for i in range(5)]
+        assert not any(parse_many(spec, frames, quarantine=quarantine))
+        assert len(quarantine) == 5
+        assert [x for x, _ in quarantine.frames] == frames[3:]
+
+    def test_sink(self):
+        spec = spec_kinds()
+        seen = []
+        list(parse_many(spec, [bad, memoryview(bad)], quarantine=lambda raw, status: seen.append(status.path)))
+        assert seen == ["root.@items.items[1].tag"] * 2
+
+    def test_still_raises(self):
+        spec = spec_kinds()
+        with pytest.raises(KeyError):
+            parse(spec, bad)
+        with pytest.raises(KeyError):
+            list(parse_many(spec, [bad]))
+
+    def test_same_path_by_every_engine(self, monkeypatch):
+        # registered, so the generated parser inlines the leaf
+        monkeypatch.setattr(handler, "kind", kind, raising=False)
+        spec = spec_kinds()
+        for scaffold in (spec, compile(spec), compile(spec, lazy=True), compile_frame(spec), compile_generated(spec)):
+            with pytest.raises(KeyError) as info:
+                dict(parse(scaffold, bad))
+            status = diagnose(info.value)
+            assert (status.code, status.path, status.offset) == (Code.handler, "root.@items.items[1].tag", 3)
+            assert not hasattr(info.value, "parse_location")
+
+
+class TestMalformed:
+    def test_unused_bytes_logged(self, caplog, capsys):
+        text = '{"a": {"_length": 4, "b": {"_length": 1, "_handler": "#bytes2int_b"}}}'
+        spec = load(decode(text))
+        for scaffold in (spec, compile(spec), compile_frame(spec), compile_generated(spec)):
+            caplog.clear()
+            with caplog.at_level(logging.WARNING):
+                parse(scaffold, b"1234")
+            assert ["child fields does not used all bytes of field 'a'."] == [x.getMessage() for x in caplog.records]
+        assert capsys.readouterr().out == ""
+
+    def test_greedy_length(self):
+        text = '{"a": {"_length": 1, "_handler": "#bytes2int_b"}, "b": {"_length": "greedy", "_handler": "#bytes2hex"}}'
+        spec = load(decode(text))
+        for scaffold in (spec, compile(spec), compile_frame(spec)):
+            assert dict(parse(scaffold, b"1234")) == {"a": 0x31, "b": "323334"}
@@ -0,0 +1,223 @@
+import random
+
+import pytest
+
+from structed import (
+    decode, load, parse, parse_stream, compile, encode, add_external_handler, BatchStats, StreamParser, Scanner
+)
+from structed.cache import to_bytes, from_bytes
+from structed.exception import SpecParseError
+from structed.handler import pure
+
+spec_sync = """{
+    "preamble": {
+        "_length": 2,
+        "_handler": "#",
+        "_sync": "aa55"
+    },
+    "type": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "body": {
+        "_switch": ["#", "type"],
+        "0x01": {
+            "len": {
+                "_length": 1,
+                "_handler": "#bytes2int_b"
+            },
+            "data": {
+                "_length": ["#", "len"],
+                "_handler": "#bytes2hex"
+            }
+        },
+        "0x02": {
+            "v": {
+                "_length": 4,
+                "_handler": "#bytes2int_b"
+            }
+        }
+    },
+    "crc": {
+        "_length": 2,
+        "_handler": "#bytes2int_b",
+        "_check": "crc16_ccitt"
+    }
+}"""
+
+spec_tlv = """{
+    "tag": {
+        "_length": 1,
+        "_handler": "#h_tag"
+    },
+    "len": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "value": {
+        "_length": ["#", "len"],
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+
+spec_strict = """{
+    "tag": {
+        "_length": 1,
+        "_handler": "#h_tag"
+    },
+    "kind": {
+        "_length": 1,
+        "_handler": "#h_kind"
+    },
+    "value": {
+        "_length": 2,
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+
+@pure
+def h_tag(x: bytes) -> str:
+    return {0x10: "a", 0x11: "b"}[x[0]]
+
+
+def h_kind(x: bytes) -> int:
+    if x[0] > 3:
+        raise ValueError(f"Unknown kind {x[0]}.")
+    return x[0]
+
+
+def values(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {"type": 1, "body": {"0x01": {"data": rng.randbytes(rng.randint(0, 20)).hex()}}} if rng.random() < 0.5
+        else {"type": 2, "body": {"0x02": {"v": rng.getrandbits(32)}}}
+        for _ in range(n)
+    ]
+
+
+def noisy(frames: list[bytes], seed: int = 0) -> tuple[bytes, list[int]]:
+    """frames with garbage between some of them, and their offsets"""
+    rng = random.Random(seed)
+    buffer, offsets = bytearray(), []
+    for f in frames:
+        if rng.random() < 0.3:
+            buffer += rng.randbytes(rng.randint(1, 40))
+        offsets.append(len(buffer))
+        buffer += f
+    return bytes(buffer), offsets
+
+
+class TestScanner:
+    def test_anchors(self, scoped_handlers):
+        scanner = Scanner(load(decode(spec_sync)))
+        assert [(x.path, x.offset, x.word) for x in scanner.syncs] == [("root.preamble", 0, b"\xaa\x55")]
+        # the discriminator of the union only takes the values of its cases
+        guard, = scanner.guards
+        assert (guard.path, guard.offset, guard.valid) == ("root.type", 2, {1, 2})
+        assert not scanner.lookahead  # the checksum is enough
+
+        add_external_handler(h_tag)
+        scanner = Scanner(load(decode(spec_tlv)))
+        assert scanner.syncs == []
+        assert [(x.path, x.valid) for x in scanner.guards] == [("root.tag", {0x10, 0x11})]
+        assert scanner.lookahead
+
+    def test_frames(self):
+        spec = load(decode(spec_sync))
+        frames = [encode(spec, x) for x in values(300)]
+        buffer, offsets = noisy(frames)
+        stats = BatchStats()
+        found = list(Scanner(spec).frames(buffer, stats))
+        assert [x for x, _ in found] == offsets
+        assert [dict(x) for _, x in found] == [dict(parse(spec, x)) for x in frames]
+        assert stats.skipped == len(buffer) - sum(len(x) for x in frames)
+        assert (stats.frames, stats.bytes) == (len(frames), sum(len(x) for x in frames))
+
+    def test_corrupt(self):
+        spec = load(decode(spec_sync))
+        frames = [encode(spec, x) for x in values(100, 1)]
+        buffer, offsets = noisy(frames, 1)
+        buffer = bytearray(buffer)
+        # a wrong length byte, the checksum fails
+        corrupt = next(i for i, x in enumerate(frames) if x[2] == 1)
+        buffer[offsets[corrupt] + 3] ^= 0x04
+        found = [x for x, _ in Scanner(compile(spec)).frames(memoryview(buffer))]
+        assert found == offsets[:corrupt] + offsets[corrupt + 1:]
+
+    def test_lookahead(self, scoped_handlers):
+        add_external_handler(h_tag)
+        spec = load(decode(spec_tlv))
+        frames = [bytes([0x10 + i % 2, 2, i, i]) for i in range(50)]
+        buffer = bytearray(b"".join(frames))
+        # the length of frame 10 reaches into the next frame, after it is not a tag
+        buffer[10 * 4 + 1] = 5
+        found = [x for x, _ in Scanner(spec).frames(bytes(buffer))]
+        assert found == [x for x in range(0, 200, 4) if x != 40]
+        assert [x for x, _ in Scanner(spec, lookahead=False).frames(bytes(buffer))][10] == 40
+
+    def test_none(self):
+        spec = load(decode(spec_sync))
+        stats = BatchStats()
+        assert list(Scanner(spec).frames(bytes(1000), stats)) == []
+        assert stats.skipped == 1000
+
+    def test_stream(self):
+        spec = load(decode(spec_sync))
+        frames = [encode(spec, x) for x in values(200, 2)]
+        buffer, offsets = noisy(frames, 2)
+        for size in (1, 5, 64, 4096):
+            stats = BatchStats()
+            chunks = [buffer[i:i + size] for i in range(0, len(buffer), size)]
+            parsed = list(parse_stream(spec, chunks, max_frame=64, stats=stats, resync=True))
+            assert [x.raw for x in parsed] == frames
+            assert stats.skipped == len(buffer) - sum(len(x) for x in frames)
+
+    def test_stream_garbage(self, scoped_handlers):
+        add_external_handler(h_tag)
+        add_external_handler(h_kind)
+        spec = load(decode(spec_strict))
+        frames = [bytes([0x10 + i % 2, i % 4, i, i]) for i in range(20)]
+        # a plausible tag whose kind fails, it is skipped at once instead of waited for until max_frame
+        buffer = b"".join(b"\x10\xff" + x for x in frames)
+        parser = StreamParser(spec, resync=True)
+        found = []
+        for i in range(0, len(buffer), 5):
+            found += parser.feed(buffer[i:i + 5])
+        assert [x.raw for x in found] == frames
+        assert parser.stats.skipped == 2 * len(frames)
+        parser.feed(frames[0])
+        parser.feed(b"\xf3\x10")
+        assert [x.raw for x in parser.feed(b"\xff" + frames[1])] == [frames[1]]
+
+    def test_no_anchor(self):
+        with pytest.raises(SpecParseError):
+            Scanner(load(decode('{"a": {"_length": 1, "_handler": "#bytes2int_b"}}')))
+
+    def test_stream_gives_up(self):
+        spec = load(decode(spec_sync))
+        frame = encode(spec, values(1)[0])
+        parser = StreamParser(spec, max_frame=16, resync=True)
+        # a preamble whose frame never completes is dropped once more than max_frame bytes wait
+        assert parser.feed(b"\xaa\x55\x01\x40") == []
+        assert parser.feed(bytes(20)) == []
+        assert [x.raw for x in parser.feed(frame)] == [frame]
+        assert parser.stats.skipped == 24
+
+
+class TestSync:
+    def test_invalid(self):
+        with pytest.raises(SpecParseError):
+            load(decode('{"a": {"_length": 1, "_handler": "#", "_sync": "aa55"}}'))
+        with pytest.raises(SpecParseError):
+            load(decode('{"a": {"_sync": "aa55", "b": {"_length": 2, "_handler": "#"}}}'))
+        with pytest.raises(Exception):
+            decode('{"a": {"_length": 2, "_handler": "#", "_sync": "zz"}}')
+
+    def test_cache_and_encode(self):
+        spec = from_bytes(to_bytes(load(decode(spec_sync))))
+        assert spec.children[0].sync == b"\xaa\x55"
+        raw = encode(spec, values(1)[0])
+        assert raw[:2] == b"\xaa\x55"
+        assert Scanner(spec).next(b"\x00" + raw)[0] == 1
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from benchmarks import scaling
+
+
+class TestScaling:
+    def test_exponent(self):
+        sizes = [10, 20, 40]
+        assert abs(scaling.exponent(sizes, [3 * x for x in sizes]) - 1) < 1e-9
+        assert abs(scaling.exponent(sizes, [x * x for x in sizes]) - 2) < 1e-9
+
+    @pytest.mark.skipif(not os.environ.get("STRUCTED_SLOW_TESTS"), reason="timing, set STRUCTED_SLOW_TESTS=1 to run")
+    def test_linear(self):
+        # large enough for quadratic work in the number of elements, children or levels to show
+        results = scaling.run(["elements", "width", "depth"], ["interpreter", "compile"], repeat=3, scale=0.5)
+        exceeded = [(x["sweep"], x["operation"], x["metric"], round(x["exponent"], 2)) for x in results if not x["ok"]]
+        assert exceeded == []
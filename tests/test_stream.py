@@ -0,0 +1,110 @@
+import pytest
+
+from structed import decode, load, parse, add_external_handler, StreamParser, parse_stream, BatchStats
+from structed.exception import FrameParseError
+
+spec_frame = """{
+    "header": {
+        "type": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        },
+        "payload_len": {
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        }
+    },
+    "payload": {
+        "_length": ["#", "payload_len"],
+        "@items": {
+            "_size": "greedy",
+            "_length": 1,
+            "_handler": "#bytes2int_b"
+        }
+    },
+    "mic": {
+        "_length": 2,
+        "_handler": "#bytes2hex"
+    }
+}"""
+
+spec_text = """{
+    "len": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "text": {
+        "_length": ["#", "len"],
+        "_handler": "#h_stream_text"
+    }
+}"""
+
+
+def h_stream_text(x: bytes) -> str:
+    return bytes(x).decode("ascii")
+
+
+frames = [
+    bytes.fromhex("0103010203aabb"),
+    bytes.fromhex("0200ccdd"),
+    bytes.fromhex("0301ffeeee"),
+]
+stream = b"".join(frames)
+
+
+class TestStream:
+    def test_chunks(self):
+        spec = load(decode(spec_frame))
+        expected = [dict(parse(spec, x)) for x in frames]
+        for size in range(1, len(stream) + 1):
+            chunks = [stream[i:i + size] for i in range(0, len(stream), size)]
+            stats = BatchStats()
+            assert [dict(x) for x in parse_stream(spec, chunks, stats=stats)] == expected
+            assert (stats.frames, stats.bytes) == (3, len(stream))
+
+    def test_emit_when_complete(self):
+        parser = StreamParser(load(decode(spec_frame)))
+        assert parser.feed(frames[0][:-1]) == []
+        fields = parser.feed(frames[0][-1:] + frames[1][:2])
+        assert len(fields) == 1 and fields[0].raw == frames[0]
+        assert parser.pending == frames[1][:2]
+
+    def test_wait(self):
+        parser = StreamParser(load(decode(spec_frame)), max_frame=8)
+        op = parser.plan.op
+        calls = []
+        parser.plan.op = lambda *args: calls.append(args[1]) or op(*args)
+        # the length is not known before the header is complete
+        assert parser.feed(frames[0][:1]) == [] and parser.needed == 0
+        assert parser.feed(frames[0][1:3]) == [] and parser.needed == len(frames[0])
+        calls.clear()
+        # not parsed again until the whole frame is received
+        for i in range(3, len(frames[0]) - 1):
+            assert parser.feed(frames[0][i:i + 1]) == []
+        assert calls == []
+        assert [x.raw for x in parser.feed(frames[0][-1:])] == [frames[0]]
+        # a header declaring more than max_frame waits for max_frame + 1 bytes at most
+        assert parser.feed(bytes.fromhex("01ff")) == [] and parser.needed == 9
+        with pytest.raises(FrameParseError):
+            parser.feed(bytes(7))
+
+    def test_bad_frame(self, scoped_handlers):
+        add_external_handler(h_stream_text)
+        parser = StreamParser(load(decode(spec_text)))
+        good, bad = b"\x02ok", b"\x02\xff\xff"
+        # complete by its header, so it is not waited for until max_frame bytes
+        with pytest.raises(FrameParseError):
+            parser.feed(bad + good + good)
+        # only the bad frame is dropped
+        assert [x.raw for x in parser.feed(b"")] == [good, good]
+        # the frames before a bad one are returned first
+        assert [x.raw for x in parser.feed(good + bad)] == [good]
+        with pytest.raises(FrameParseError):
+            parser.feed(b"")
+        assert parser.stats.failures == 2
+
+    def test_max_frame(self):
+        parser = StreamParser(load(decode(spec_frame)), max_frame=8)
+        with pytest.raises(FrameParseError):
+            parser.feed(bytes.fromhex("01ff") + bytes(8))
+        assert parser.pending == b""
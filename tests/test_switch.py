@@ -0,0 +1,73 @@
+import pytest
+
+from structed import decode, load, parse, compile, compile_frame, compile_generated
+from structed.cache import to_bytes, from_bytes
+from structed.exception import FrameParseError, SpecParseError
+
+spec_mac = """{
+    "type": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    },
+    "body": {
+        "_switch": ["#", "type"],
+        "0x00": {
+            "beacon": {
+                "_length": 2,
+                "_handler": "#bytes2hex"
+            }
+        },
+        "0x01": {
+            "len": {
+                "_length": 1,
+                "_handler": "#bytes2int_b"
+            },
+            "data": {
+                "_length": ["#", "len"],
+                "_handler": "#bytes2hex"
+            }
+        }
+    },
+    "tail": {
+        "_length": 1,
+        "_handler": "#bytes2int_b"
+    }
+}"""
+
+frames = [
+    (bytes.fromhex("00abcd07"), {"type": 0, "body": {"0x00": {"beacon": "abcd"}}, "tail": 7}),
+    (bytes.fromhex("0102eeff08"), {"type": 1, "body": {"0x01": {"len": 2, "data": "eeff"}}, "tail": 8}),
+]
+
+
+class TestSwitch:
+    def test_engines(self):
+        spec = load(decode(spec_mac))
+        for scaffold in (
+                spec, compile(spec), compile_frame(spec), compile_generated(spec), from_bytes(to_bytes(spec))
+        ):
+            for raw, expected in frames:
+                assert dict(parse(scaffold, raw)) == expected
+
+    def test_length(self):
+        spec = load(decode(spec_mac))
+        for raw, _ in frames:
+            field = parse(compile(spec), raw)
+            assert field.length == len(raw)
+            assert field.children[1].length == len(raw) - 2
+
+    def test_projection(self):
+        spec = load(decode(spec_mac))
+        for raw, expected in frames:
+            assert dict(parse(spec, raw, fields=["tail"]))["tail"] == expected["tail"]
+        assert dict(parse(spec, frames[1][0], fields=["body.0x01.data"]))["body"] == frames[1][1]["body"]
+
+    def test_unknown_case(self):
+        spec = load(decode(spec_mac))
+        for scaffold in (spec, compile(spec), compile_frame(spec), compile_generated(spec)):
+            with pytest.raises(FrameParseError):
+                parse(scaffold, bytes.fromhex("05aabb"))
+
+    def test_invalid(self):
+        with pytest.raises(SpecParseError):
+            load(decode('{"type": {"_length": 1}, "body": {"_switch": ["#", "type"]}}'))